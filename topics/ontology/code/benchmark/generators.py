@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data Generators for the Ontology Demos
+
+The demo ontologies only hold a few dozen individuals. These generators keep
+each ontology's TBox (classes, properties, restrictions, shapes refer to it
+unchanged) and replicate its ABox until the requested number of instances
+is reached:
+
+    copy 0   the original individuals (diet:Alice, :Computer1, ...), so
+             queries that name an individual still find it
+    copy n   every individual renamed to <iri>_n, with all links between
+             individuals renamed the same way
+
+Each copy is an isomorphic block, so query selectivity and the share of
+inferred triples stay the same at every size.
+
+generate() builds the graph in memory, which limits it to what fits in an
+rdflib Graph. write_ntriples() writes the same triples straight to an
+N-Triples file instead: the ABox is rendered once as a text template and
+every copy is one str.format() of it, so memory stays constant and 10^7
+instances are a matter of disk space.
+
+Usage:
+    g = generate("diet", 10_000)
+    print(len(g), count_instances(g))
+
+    triples, instances = write_ntriples("diet", 10_000_000, "diet.nt")
+"""
+
+import math
+import re
+from pathlib import Path
+
+from rdflib import BNode, Graph, URIRef
+from rdflib.namespace import OWL, RDF, RDFS
+
+CODE_DIR = Path(__file__).resolve().parents[1]
+
+# Dataset name -> source ontology
+SOURCES = {
+    "diet": CODE_DIR / "ontology" / "diet" / "diet.ttl",
+    "computer": CODE_DIR / "ontology" / "computer" / "computers.ttl",
+    "food": CODE_DIR / "food" / "food_safety.ttl",
+}
+
+# rdf:type objects that mark schema resources, not instances
+SCHEMA_TYPES = {
+    OWL.Class, OWL.Restriction, OWL.Ontology, OWL.ObjectProperty,
+    OWL.DatatypeProperty, OWL.AnnotationProperty, OWL.FunctionalProperty,
+    OWL.TransitiveProperty, OWL.SymmetricProperty, OWL.InverseFunctionalProperty,
+    RDFS.Class, RDFS.Datatype, RDF.Property,
+}
+
+
+def individuals(g):
+    """Named resources typed with a domain class (the ABox subjects)."""
+    result = set()
+    for s, cls in g.subject_objects(RDF.type):
+        if isinstance(s, URIRef) and cls not in SCHEMA_TYPES:
+            result.add(s)
+    return result
+
+
+def split(g):
+    """Return (tbox, abox) graphs; abox holds every triple about an individual."""
+    people = individuals(g)
+    tbox, abox = Graph(), Graph()
+    for prefix, ns in g.namespaces():
+        tbox.bind(prefix, ns)
+    for t in g:
+        (abox if t[0] in people else tbox).add(t)
+    return tbox, abox
+
+
+def load_source(dataset):
+    g = Graph()
+    g.parse(SOURCES[dataset], format="turtle")
+    return g
+
+
+def replicate(source, instances):
+    """Graph with the source TBox and at least `instances` ABox individuals."""
+    tbox, abox = split(source)
+    people = individuals(source)
+    copies = max(1, math.ceil(instances / max(len(people), 1)))
+
+    g = Graph()
+    for prefix, ns in source.namespaces():
+        g.bind(prefix, ns)
+    g += tbox
+    triples = list(abox)
+    for n in range(copies):
+        if n == 0:
+            g += abox
+            continue
+        renamed = {}
+
+        def rename(term):
+            if term in people:
+                return URIRef(f"{term}_{n}")
+            if isinstance(term, BNode):
+                return renamed.setdefault(term, BNode())
+            return term
+        for s, p, o in triples:
+            g.add((rename(s), p, rename(o)))
+    return g
+
+
+def generate(dataset, instances):
+    """Synthetic graph for a dataset ("diet", "computer" or "food")."""
+    return replicate(load_source(dataset), instances)
+
+
+# Stand-ins for the terms renamed per copy while the ABox is serialized
+_MARK = "urn:x-replica:"
+_MARKED = re.compile(r"<urn:x-replica:([ib])(\d+)>")
+
+
+def _copy_template(abox, people):
+    """
+    The ABox as N-Triples text with {suffix} after every individual IRI and
+    {n} in every blank node label, for str.format() per copy.
+    """
+    names = {}
+
+    def mark(term):
+        if term in people or isinstance(term, BNode):
+            key = ("i" if term in people else "b", term)
+            if key not in names:
+                names[key] = len(names)
+            return URIRef(f"{_MARK}{key[0]}{names[key]}")
+        return term
+
+    marked = Graph()
+    for s, p, o in abox:
+        marked.add((mark(s), p, mark(o)))
+    # rdflib escapes the literals; braces are doubled so format() keeps them
+    text = marked.serialize(format="nt").replace("{", "{{").replace("}", "}}")
+    iris = {index: str(term) for (kind, term), index in names.items() if kind == "i"}
+
+    def unmark(match):
+        kind, index = match.group(1), int(match.group(2))
+        if kind == "i":
+            return "<" + iris[index].replace("{", "{{").replace("}", "}}") + "{suffix}>"
+        return f"_:r{{n}}b{index}"
+    return _MARKED.sub(unmark, text)
+
+
+def write_ntriples(dataset, instances, path):
+    """
+    Write the synthetic graph of a dataset to an N-Triples file, in constant memory.
+
+    Returns:
+        (triples written, individuals)
+    """
+    source = load_source(dataset)
+    tbox, abox = split(source)
+    people = individuals(source)
+    copies = max(1, math.ceil(instances / max(len(people), 1)))
+    template = _copy_template(abox, people)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(tbox.serialize(format="nt"))
+        for n in range(copies):
+            f.write(template.format(n=n, suffix=f"_{n}" if n else ""))
+    return len(tbox) + copies * len(abox), copies * len(people)
+
+
+def count_instances(g):
+    return len(individuals(g))
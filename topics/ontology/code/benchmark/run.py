@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Ontology Benchmark Suite
+
+Times every phase of the demos on synthetic data scaled from the original
+ontologies (see generators.py):
+
+    parse      Graph.parse of the generated N-Triples file (streamed to disk
+               by generators.write_ntriples, so 10^7 instances can be
+               generated; the parsed graph is used by the later phases)
+    reason     OWL-RL DeductiveClosure expansion
+    query      every .sparql file in ontology/diet and ontology/computer
+               (diet queries on the asserted graph like diet/run.py,
+               computer queries on the reasoned graph like computer/run.py)
+    validate   pyshacl validation of the diet data, as in diet/validate.py,
+               and the same with common/compiled_shacl.py
+
+Results are written as JSON so two versions can be compared:
+
+    python3 run.py --sizes 1000 10000 --output results.json
+    python3 run.py --sizes 1000 10000 --compare results.json
+
+Phases whose graph is larger than --max-triples are recorded as skipped
+(OWL-RL and pyshacl are far slower than parsing at 10^6+ instances).
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import rdflib
+from rdflib import Graph
+
+from generators import CODE_DIR, SOURCES, write_ntriples
+
+# Shared helpers live in topics/ontology/code/common
+sys.path.insert(0, str(CODE_DIR))
+
+QUERY_DIRS = {
+    "diet": CODE_DIR / "ontology" / "diet",
+    "computer": CODE_DIR / "ontology" / "computer",
+}
+
+# Queries run on the reasoned graph (computer/run.py materializes first)
+QUERY_ON_CLOSURE = {"computer"}
+
+SHAPES = CODE_DIR / "ontology" / "diet" / "shacl_shapes.ttl"
+
+# A phase is reported as a regression when it is this much slower
+REGRESSION_RATIO = 1.25
+
+
+def timed(fn, repeat):
+    """Run fn() `repeat` times; return (last result, [seconds])."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, times
+
+
+def record(results, dataset, instances, phase, name, times, **extra):
+    entry = {
+        "dataset": dataset, "instances": instances, "phase": phase, "name": name,
+        "seconds": times, "best": min(times) if times else None,
+        "median": statistics.median(times) if times else None,
+    }
+    entry.update(extra)
+    results.append(entry)
+    best = f"{entry['best']:.4f}s" if times else "skipped"
+    details = ", ".join(f"{k}={v}" for k, v in extra.items())
+    print(f"  {phase:9s} {name:38s} {best:>10s}  {details}")
+
+
+def metadata():
+    versions = {"python": platform.python_version(), "rdflib": rdflib.__version__}
+    for module in ("owlrl", "pyshacl"):
+        try:
+            versions[module] = __import__(module).__version__
+        except (ImportError, AttributeError):
+            versions[module] = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True, cwd=CODE_DIR).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "versions": versions,
+    }
+
+
+def bench_dataset(dataset, instances, args, results):
+    from owlrl import DeductiveClosure, OWLRL_Semantics
+
+    # Parse
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"{dataset}.nt")
+        triples, actual = write_ntriples(dataset, instances, path)
+        print(f"\n{dataset}: {actual} instances, {triples} triples")
+
+        def parse():
+            parsed = Graph()
+            parsed.parse(path, format="nt")
+            return parsed
+        g, times = timed(parse, args.repeat)
+        record(results, dataset, actual, "parse", "ntriples", times,
+               triples=len(g), bytes=os.path.getsize(path))
+
+    too_big = len(g) > args.max_triples
+
+    # Reason
+    closure = None
+    if too_big:
+        record(results, dataset, actual, "reason", "owlrl", [], skipped="max-triples")
+    else:
+        def reason():
+            copy = Graph()
+            copy += g
+            DeductiveClosure(OWLRL_Semantics).expand(copy)
+            return copy
+        closure, times = timed(reason, args.repeat)
+        record(results, dataset, actual, "reason", "owlrl", times,
+               triples_before=len(g), triples_after=len(closure))
+
+    # Query
+    query_dir = QUERY_DIRS.get(dataset)
+    if query_dir is not None:
+        target = closure if dataset in QUERY_ON_CLOSURE else g
+        for query_file in sorted(query_dir.glob("*.sparql")):
+            if target is None:
+                record(results, dataset, actual, "query", query_file.name, [],
+                       skipped="no closure")
+                continue
+            text = query_file.read_text()
+            rows, times = timed(lambda: sum(1 for _ in target.query(text)), args.repeat)
+            record(results, dataset, actual, "query", query_file.name, times, rows=rows)
+
+    # Validate
+    if dataset == "diet":
+        try:
+            from pyshacl import validate
+        except ImportError:
+            record(results, dataset, actual, "validate", "pyshacl", [], skipped="pyshacl missing")
+            return
+        if too_big:
+            record(results, dataset, actual, "validate", "pyshacl", [], skipped="max-triples")
+            return
+        shapes = Graph()
+        shapes.parse(SHAPES, format="turtle")
+
+        def run_validation():
+            return validate(g, shacl_graph=shapes, inference="rdfs",
+                            abort_on_first=False)[0]
+        conforms, times = timed(run_validation, args.repeat)
+        record(results, dataset, actual, "validate", "pyshacl", times, conforms=conforms)
+
+        from common.compiled_shacl import validate_compiled
+        conforms, times = timed(lambda: validate_compiled(g, shapes, inference="rdfs")[0],
+                                args.repeat)
+        record(results, dataset, actual, "validate", "compiled", times, conforms=conforms)
+
+
+def compare(results, baseline_path):
+    """Print best-time ratios against a previous results file; return regressions."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old = {(r["dataset"], r["instances"], r["phase"], r["name"]): r
+           for r in baseline["results"]}
+    print("\n" + "="*70)
+    print(f"Comparison with {baseline_path} ({baseline['meta'].get('commit')})")
+    print("="*70)
+    regressions = []
+    for r in results:
+        before = old.get((r["dataset"], r["instances"], r["phase"], r["name"]))
+        if not before or not before["best"] or not r["best"]:
+            continue
+        ratio = r["best"] / before["best"]
+        flag = ""
+        if ratio > REGRESSION_RATIO:
+            flag = "  ← slower"
+            regressions.append(r)
+        elif ratio < 1 / REGRESSION_RATIO:
+            flag = "  ← faster"
+        print(f"  {r['dataset']:8s} {r['instances']:>8d} {r['phase']:9s} {r['name']:38s} "
+              f"{before['best']:.4f}s → {r['best']:.4f}s  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parse, reason, query and validate")
+    parser.add_argument("--datasets", nargs="+", choices=sorted(SOURCES),
+                        default=sorted(SOURCES), help="ontologies to scale")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000],
+                        help="number of instances per dataset (10^3 .. 10^7)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="timed runs per phase (best and median are reported)")
+    parser.add_argument("--max-triples", type=int, default=200_000,
+                        help="skip reasoning and validation above this graph size")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="where to write the JSON results")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="compare with an earlier results file")
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print("Ontology Benchmark Suite")
+    print("="*70)
+
+    results = []
+    for dataset in args.datasets:
+        for size in args.sizes:
+            bench_dataset(dataset, size, args, results)
+
+    with open(args.output, "w") as f:
+        json.dump({"meta": metadata(), "results": results}, f, indent=2)
+    print(f"\n✓ Results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare)
+        print(f"\n{len(regressions)} regression(s) over x{REGRESSION_RATIO}")
+        if regressions:
+            sys.exit(1)
+    print()
+
+
+if __name__ == "__main__":
+    main()
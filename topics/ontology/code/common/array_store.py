@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Dictionary-Encoded, Array-Backed Triple Store
+
+rdflib's default Memory store indexes every triple in nested dicts of full
+term objects (three dicts of sets per triple pattern), which costs several
+hundred bytes per triple. ArrayStore keeps the same data compactly:
+
+- a term dictionary interns every IRI, blank node and literal to an integer ID
+- three sorted index arrays (SPO, POS, OSP), one contiguous NumPy column per
+  position, answer any triple pattern with binary search
+- additions and removals go to a small delta that is merged into the sorted
+  arrays once it grows past a fraction of the store
+
+It is an rdflib Store plugin, so existing code works unchanged:
+
+    g = Graph(store=ArrayStore())
+    g.parse("computers.ttl")
+    g.query(...), g.value(...), g.subjects(...)
+
+The store holds a single graph (it is not context aware).
+
+Run this file to compare memory use with the default store:
+    python3 array_store.py ../ontology/computer/computers.ttl --copies 1000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from rdflib import Graph, URIRef
+from rdflib.store import Store
+
+# Index name -> positions of (s, p, o) in key order
+ORDERS = {
+    "spo": (0, 1, 2),
+    "pos": (1, 2, 0),
+    "osp": (2, 0, 1),
+}
+
+# Bound positions -> index whose key prefix covers them
+INDEX_FOR = {
+    (): "spo", (0,): "spo", (0, 1): "spo", (0, 1, 2): "spo",
+    (1,): "pos", (1, 2): "pos",
+    (2,): "osp", (0, 2): "osp",
+}
+
+# Merge the delta into the sorted arrays past max(MIN_DELTA, size * DELTA_RATIO)
+MIN_DELTA = 4096
+DELTA_RATIO = 0.25
+
+
+class ArrayStore(Store):
+    """Single-graph rdflib store with interned terms and sorted ID arrays."""
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, configuration=None, identifier=None):
+        super().__init__(configuration)
+        self.identifier = identifier
+        self._ids = {}                  # term -> ID
+        self._terms = []                # ID -> term
+        self._dtype = np.int32
+        empty = np.empty((3, 0), dtype=self._dtype)
+        self._index = {name: empty for name in ORDERS}
+        self._added = set()             # ID triples not yet in the arrays
+        self._removed = set()           # ID triples in the arrays but deleted
+        self._delta = ({}, {}, {})      # position -> ID -> set of added triples
+        self._merged_terms = 0          # terms interned before the last merge
+        self._namespace = {}
+        self._prefix = {}
+
+    # ------------------------------------------------------------------
+    # Term dictionary
+    # ------------------------------------------------------------------
+
+    def _intern(self, term):
+        tid = self._ids.get(term)
+        if tid is None:
+            tid = len(self._terms)
+            self._ids[term] = tid
+            self._terms.append(term)
+            if tid == np.iinfo(self._dtype).max:
+                self._dtype = np.int64
+                self._index = {k: v.astype(np.int64) for k, v in self._index.items()}
+        return tid
+
+    def _encode(self, pattern):
+        """ID pattern with None for wildcards, or None if a term is unknown."""
+        ids = []
+        for term in pattern:
+            if term is None:
+                ids.append(None)
+            else:
+                tid = self._ids.get(term)
+                if tid is None:
+                    return None
+                ids.append(tid)
+        return tuple(ids)
+
+    def _decode(self, ids):
+        terms = self._terms
+        return terms[ids[0]], terms[ids[1]], terms[ids[2]]
+
+    # ------------------------------------------------------------------
+    # Sorted arrays
+    # ------------------------------------------------------------------
+
+    def _base_size(self):
+        return self._index["spo"].shape[1]
+
+    def _base_range(self, name, key):
+        """[lo, hi) rows of an index whose leading columns equal key."""
+        arr = self._index[name]
+        lo, hi = 0, arr.shape[1]
+        for col, value in enumerate(key):
+            column = arr[col, lo:hi]
+            lo, hi = (lo + int(np.searchsorted(column, value, "left")),
+                      lo + int(np.searchsorted(column, value, "right")))
+            if lo == hi:
+                break
+        return arr, lo, hi
+
+    def _in_base(self, ids):
+        if max(ids) >= self._merged_terms:
+            return False    # a term newer than the arrays
+        _, lo, hi = self._base_range("spo", ids)
+        return lo < hi
+
+    def _base_matches(self, ids):
+        bound = tuple(i for i, v in enumerate(ids) if v is not None)
+        name = INDEX_FOR[bound]
+        order = ORDERS[name]
+        key = [ids[pos] for pos in order if ids[pos] is not None]
+        arr, lo, hi = self._base_range(name, key)
+        if lo == hi:
+            return []
+        rows = arr[:, lo:hi].T.tolist()
+        back = [order.index(pos) for pos in range(3)]
+        return [(r[back[0]], r[back[1]], r[back[2]]) for r in rows]
+
+    def _merge(self):
+        """Fold the delta into freshly sorted index arrays."""
+        spo = self._index["spo"]
+        if self._removed:
+            gone = np.array(sorted(self._removed), dtype=self._dtype).T
+            keep = np.ones(spo.shape[1], dtype=bool)
+            for row in gone.T:
+                _, lo, hi = self._base_range("spo", row.tolist())
+                keep[lo:hi] = False
+            spo = spo[:, keep]
+        if self._added:
+            extra = np.array(list(self._added), dtype=self._dtype).T
+            spo = np.concatenate([spo, extra], axis=1)
+        for name, order in ORDERS.items():
+            cols = spo[list(order)]
+            # lexsort sorts by the last key first
+            perm = np.lexsort(cols[::-1])
+            self._index[name] = np.ascontiguousarray(cols[:, perm])
+        self._added.clear()
+        self._removed.clear()
+        self._delta = ({}, {}, {})
+        self._merged_terms = len(self._terms)
+
+    def _maybe_merge(self):
+        pending = len(self._added) + len(self._removed)
+        if pending > max(MIN_DELTA, self._base_size() * DELTA_RATIO):
+            self._merge()
+
+    def _delta_matches(self, ids):
+        bound = [(pos, v) for pos, v in enumerate(ids) if v is not None]
+        if not bound:
+            return list(self._added)
+        candidates = min((self._delta[pos].get(v, ()) for pos, v in bound), key=len)
+        return [t for t in candidates
+                if all(t[pos] == v for pos, v in bound)]
+
+    # ------------------------------------------------------------------
+    # Store API
+    # ------------------------------------------------------------------
+
+    def add(self, triple, context=None, quoted=False):
+        Store.add(self, triple, context, quoted)
+        ids = tuple(self._intern(term) for term in triple)
+        if ids in self._removed:
+            self._removed.discard(ids)
+        elif ids not in self._added and not self._in_base(ids):
+            self._added.add(ids)
+            for pos in range(3):
+                self._delta[pos].setdefault(ids[pos], set()).add(ids)
+            self._maybe_merge()
+
+    def remove(self, triple_pattern, context=None):
+        ids = self._encode(triple_pattern)
+        if ids is None:
+            return
+        for t in self._base_matches(ids) + self._delta_matches(ids):
+            if t in self._added:
+                self._added.discard(t)
+                for pos in range(3):
+                    self._delta[pos][t[pos]].discard(t)
+            elif t not in self._removed:
+                self._removed.add(t)
+        self._maybe_merge()
+
+    def triples(self, triple_pattern, context=None):
+        ids = self._encode(triple_pattern)
+        if ids is None:
+            return
+        # Snapshot the delta: callers may add triples while iterating
+        added = self._delta_matches(ids)
+        removed = self._removed
+        for t in self._base_matches(ids):
+            if t not in removed:
+                yield self._decode(t), iter(())
+        for t in added:
+            yield self._decode(t), iter(())
+
+    def __len__(self, context=None):
+        return self._base_size() - len(self._removed) + len(self._added)
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def bind(self, prefix, namespace, override=True):
+        bound_namespace = self._namespace.get(prefix)
+        bound_prefix = self._prefix.get(namespace)
+        if bound_prefix is None and bound_namespace is not None:
+            bound_prefix = self._prefix.get(bound_namespace)
+        if override:
+            if bound_prefix is not None:
+                del self._namespace[bound_prefix]
+            if bound_namespace is not None:
+                del self._prefix[bound_namespace]
+            self._prefix[namespace] = prefix
+            self._namespace[prefix] = namespace
+        else:
+            self._prefix[bound_namespace or namespace] = bound_prefix or prefix
+            self._namespace[bound_prefix or prefix] = bound_namespace or namespace
+
+    def namespace(self, prefix):
+        return self._namespace.get(prefix)
+
+    def prefix(self, namespace):
+        return self._prefix.get(namespace)
+
+    def namespaces(self):
+        return iter(list(self._namespace.items()))
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+
+    def compact(self):
+        """Merge pending changes now (e.g. before a read-heavy phase)."""
+        if self._added or self._removed:
+            self._merge()
+
+    def index_bytes(self):
+        """Bytes used by the three sorted index arrays."""
+        return sum(arr.nbytes for arr in self._index.values())
+
+
+# ----------------------------------------------------------------------
+# Memory comparison
+# ----------------------------------------------------------------------
+
+def _replicate(source, copies):
+    """Yield the source triples `copies` times with renamed subjects and objects."""
+    subjects = set(source.subjects())
+    for n in range(copies):
+        def rename(term):
+            return URIRef(f"{term}_{n}") if term in subjects else term
+        for s, p, o in source:
+            yield rename(s), p, rename(o)
+
+
+def measure(make_graph, triples):
+    """Build a graph from triples; return (graph, bytes allocated, seconds)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    g = make_graph()
+    for t in triples:
+        g.add(t)
+    if isinstance(g.store, ArrayStore):
+        g.store.compact()
+    seconds = time.perf_counter() - start
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return g, used, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ArrayStore with rdflib's Memory store")
+    parser.add_argument("file", help="RDF file to load")
+    parser.add_argument("--copies", type=int, default=100,
+                        help="replicate the data this many times")
+    args = parser.parse_args()
+
+    source = Graph()
+    source.parse(args.file)
+    triples = list(_replicate(source, args.copies))
+    print(f"{len(triples)} triples ({len(source)} x {args.copies})")
+
+    results = {}
+    for name, make in (("Memory (default)", Graph),
+                       ("ArrayStore", lambda: Graph(store=ArrayStore()))):
+        g, used, seconds = measure(make, triples)
+        results[name] = g
+        print(f"  {name:18s} {used / 1e6:8.1f} MB  "
+              f"{used / max(len(g), 1):6.0f} B/triple  load {seconds:.2f}s")
+        del g
+
+    memory, array = results.values()
+    same = len(memory) == len(array) and all(t in array for t in memory)
+    print(f"  Same triples: {same}")
+
+
+if __name__ == "__main__":
+    main()
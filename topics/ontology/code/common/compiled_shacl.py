@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Compiled SHACL Fast Path
+
+The shapes in diet/shacl_shapes.ttl and ontology_tools/code/pyshacl/ex3 only
+use a handful of constraint kinds:
+
+    sh:minCount  sh:maxCount  sh:datatype  sh:minLength  sh:class
+    sh:not [ sh:class ... ]
+
+compile_shapes() turns each property shape built from these into a list of
+checks over direct lookups in the data graph (values of the path, types of a
+value), and validate_compiled() runs them. With inference='rdfs', pyshacl
+first copies the whole data graph and materializes its RDFS closure; here
+the closure is answered on demand by RDFSIndex instead:
+
+- superclass / subproperty closures of the schema, computed once
+- rdfs:domain / rdfs:range of each predicate (inherited through
+  rdfs:subPropertyOf)
+- a node's types: asserted types, domains of its predicates and ranges of
+  the predicates pointing at it, closed over rdfs:subClassOf (cached)
+
+Shapes using anything else (other constraint kinds, complex paths, sh:node,
+classes from the RDF/RDFS vocabulary, ...) are validated by pyshacl: only
+those shapes if they are IRIs (use_shapes), otherwise the whole run. The
+result is the same report pyshacl would produce (see shacl_report.Report).
+Default messages for shapes without sh:message reuse pyshacl's wording, but
+a blank node in them is printed with its asserted triples only (pyshacl
+prints the inferred ones too).
+
+Data graphs whose schema extends the RDF/RDFS vocabulary itself (see
+RDFSIndex.extends_vocabulary) are also left to pyshacl.
+
+Usage:
+    conforms, results_graph, results_text = validate_compiled(
+        data, shapes, inference="rdfs")
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from pyshacl import validate
+from rdflib import BNode, Literal, URIRef
+from rdflib.namespace import RDF, RDFS, XSD
+
+from .shacl_report import SH, Report, ValidationResult
+
+TARGETS = {SH.targetClass, SH.targetNode, SH.targetSubjectsOf, SH.targetObjectsOf}
+
+# Predicates a compiled shape may carry besides its constraints
+DESCRIPTIVE = {RDF.type, SH.message, SH.severity, SH.deactivated, SH.name,
+               SH.description, SH.order, SH.group, RDFS.label, RDFS.comment}
+
+PROPERTY_CONSTRAINTS = {SH.path, SH.minCount, SH.maxCount, SH.datatype,
+                        SH.minLength, SH["class"], SH["not"]}
+
+SCHEMA_PREDICATES = {RDFS.subClassOf, RDFS.subPropertyOf, RDFS.domain, RDFS.range}
+
+# Paths whose values RDFS inference changes beyond rdfs:subPropertyOf
+INFERRED_PATHS = SCHEMA_PREDICATES | {RDF.type, RDFS.member}
+
+INFERENCE_MODES = {None, "none", "rdfs"}
+
+
+def _builtin(term):
+    """Terms of the RDF/RDFS vocabulary, whose RDFS axioms are not modelled."""
+    return str(term).startswith((str(RDF), str(RDFS)))
+
+
+class RDFSIndex:
+    """Type and value lookups that answer as if the data graph were RDFS-expanded."""
+
+    def __init__(self, data, rdfs=True):
+        """rdfs=False only follows rdfs:subClassOf, like pyshacl without inference."""
+        self.data = data
+        self.rdfs = rdfs
+        self._superclasses = {}
+        self._subclasses = {}
+        self._subproperties = {}
+        self._types = {}
+        self.domains = {}
+        self.ranges = {}
+        if rdfs:
+            for schema, table in ((RDFS.domain, self.domains), (RDFS.range, self.ranges)):
+                for prop, cls in data.subject_objects(schema):
+                    for sub in self.subproperties(prop):
+                        table.setdefault(sub, set()).add(cls)
+
+    def extends_vocabulary(self):
+        """
+        True if the data's schema talks about RDF/RDFS terms themselves
+        (e.g. an rdfs:range for rdfs:label, rdfs:Resource as a subclass):
+        the RDFS axioms then type user nodes, which this index does not model.
+        """
+        for predicate in SCHEMA_PREDICATES:
+            for subject, obj in self.data.subject_objects(predicate):
+                if _builtin(subject):
+                    return True
+                if predicate == RDFS.subPropertyOf and obj in SCHEMA_PREDICATES:
+                    return True
+        return False
+
+    def superclasses(self, cls):
+        if cls not in self._superclasses:
+            self._superclasses[cls] = frozenset(self.data.transitive_objects(cls, RDFS.subClassOf))
+        return self._superclasses[cls]
+
+    def subclasses(self, cls):
+        if cls not in self._subclasses:
+            self._subclasses[cls] = frozenset(self.data.transitive_subjects(RDFS.subClassOf, cls))
+        return self._subclasses[cls]
+
+    def subproperties(self, prop):
+        if not self.rdfs:
+            return (prop,)
+        if prop not in self._subproperties:
+            self._subproperties[prop] = frozenset(
+                self.data.transitive_subjects(RDFS.subPropertyOf, prop))
+        return self._subproperties[prop]
+
+    def values(self, node, path):
+        found = set()
+        for prop in self.subproperties(path):
+            found.update(self.data.objects(node, prop))
+        return found
+
+    def types(self, node):
+        """All classes of node, including inferred ones and superclasses."""
+        if node not in self._types:
+            direct = set(self.values(node, RDF.type))
+            if self.rdfs:
+                for prop in set(self.data.predicates(node, None)):
+                    direct |= self.domains.get(prop, set())
+                for prop in set(self.data.predicates(None, node)):
+                    direct |= self.ranges.get(prop, set())
+            types = set()
+            for cls in direct:
+                types |= self.superclasses(cls)
+            self._types[node] = frozenset(types)
+        return self._types[node]
+
+    def instances(self, cls):
+        found = set()
+        for sub in self.subclasses(cls):
+            for prop in self.subproperties(RDF.type):
+                found.update(self.data.subjects(prop, sub))
+        if self.rdfs:
+            for prop, classes in self.domains.items():
+                if any(cls in self.superclasses(c) for c in classes):
+                    found.update(self.data.subjects(prop, None))
+            for prop, classes in self.ranges.items():
+                if any(cls in self.superclasses(c) for c in classes):
+                    found.update(self.data.objects(None, prop))
+        return found
+
+    def subjects_of(self, path):
+        found = set()
+        for prop in self.subproperties(path):
+            found.update(self.data.subjects(prop, None))
+        return found
+
+    def objects_of(self, path):
+        found = set()
+        for prop in self.subproperties(path):
+            found.update(self.data.objects(None, prop))
+        return found
+
+
+def _stringify(graph, node):
+    from pyshacl.rdfutil import stringify_node
+    try:
+        return stringify_node(graph, node)
+    except (LookupError, ValueError):
+        return str(node)
+
+
+# Python types a well-formed literal of these datatypes converts to
+DATATYPE_VALUES = {
+    XSD.string: (str, bytes), RDF.langString: (str, bytes), XSD.integer: int,
+    XSD.float: float, XSD.decimal: Decimal, XSD.boolean: bool,
+    XSD.date: date, XSD.time: time, XSD.dateTime: datetime,
+}
+
+
+def _datatype_matches(value, datatype):
+    """pyshacl's sh:datatype test (SPARQL datatype(), ill-typed literals fail)."""
+    if not isinstance(value, Literal):
+        return False
+    if value.datatype == datatype:
+        if getattr(value, "ill_typed", None) is True:
+            return False
+    elif datatype == RDFS.Literal:
+        return True
+    elif datatype == RDFS.Datatype and value.datatype:
+        return True
+    elif value.datatype is None and value.language is None and datatype == XSD.string:
+        pass
+    elif not (datatype == RDF.langString and value.language):
+        return False
+    expected = DATATYPE_VALUES.get(datatype)
+    return expected is None or isinstance(value.value, expected)
+
+
+def _string(value):
+    if isinstance(value, Literal) and value.value is not None and \
+            value.datatype in (None, RDF.langString, XSD.string):
+        return str(value.value)
+    return str(value)
+
+
+@dataclass
+class PropertyProgram:
+    """One compiled property shape: a path and its checks."""
+    shape: object
+    path: URIRef
+    severity: URIRef
+    messages: tuple
+    min_count: int = None
+    max_count: int = None
+    datatype: URIRef = None
+    min_lengths: list = field(default_factory=list)
+    classes: list = field(default_factory=list)
+    not_classes: list = field(default_factory=list)     # (not shape, class)
+
+    def run(self, focus, index, shapes, data):
+        """Yield ValidationResults for one focus node."""
+        values = index.values(focus, self.path)
+
+        def result(component, value=None, generic=None):
+            messages = self.messages or (Literal(generic()),)
+            return ValidationResult(focus, self.path, value, self.shape, component,
+                                    self.severity, tuple(sorted(messages)))
+
+        path = lambda: _stringify(shapes, self.path)
+        if self.min_count is not None and len(values) < self.min_count:
+            yield result(SH.MinCountConstraintComponent, generic=lambda: (
+                f"Less than {self.min_count} values on {_stringify(data, focus)}->{path()}"))
+        if self.max_count is not None and len(values) > self.max_count:
+            yield result(SH.MaxCountConstraintComponent, generic=lambda: (
+                f"More than {self.max_count} values on {_stringify(data, focus)}->{path()}"))
+        for value in values:
+            if self.datatype is not None and not _datatype_matches(value, self.datatype):
+                yield result(SH.DatatypeConstraintComponent, value, lambda: (
+                    f"Value is not Literal with datatype {_stringify(shapes, self.datatype)}"))
+            for rule in self.min_lengths:
+                if rule.value == 0:
+                    continue
+                if isinstance(value, BNode) or len(_string(value)) < rule.value:
+                    yield result(SH.MinLengthConstraintComponent, value, lambda: (
+                        f"String length not >= {_stringify(data, self.min_lengths[0])}"))
+            is_literal = isinstance(value, Literal)
+            for cls in self.classes:
+                if is_literal or cls not in index.types(value):
+                    if len(self.classes) < 2:
+                        generic = lambda: f"Value does not have class {_stringify(shapes, cls)}"
+                    else:
+                        generic = lambda: "Value class is not in classes ({})".format(
+                            ", ".join(_stringify(shapes, c) for c in self.classes))
+                    yield result(SH.ClassConstraintComponent, value, generic)
+            for not_shape, cls in self.not_classes:
+                if not is_literal and cls in index.types(value):
+                    if len(self.not_classes) == 1:
+                        generic = lambda: (f"Node {_stringify(data, value)} must not conform "
+                                           f"to shape {_stringify(shapes, not_shape)}")
+                    else:
+                        generic = lambda: (f"Node {_stringify(data, value)} must not conform "
+                                           "to any shapes in " + " , ".join(
+                                               _stringify(shapes, s) for s, _ in self.not_classes))
+                    yield result(SH.NotConstraintComponent, value, generic)
+
+
+@dataclass
+class ShapeProgram:
+    """A compiled shape with targets: how to find its focus nodes, what to check."""
+    shape: object
+    target_classes: list
+    target_nodes: list
+    subjects_of: list
+    objects_of: list
+    properties: list
+
+    def focus_nodes(self, index):
+        found = set(self.target_nodes)
+        for cls in self.target_classes:
+            found |= index.instances(cls)
+        for path in self.subjects_of:
+            found |= index.subjects_of(path)
+        for path in self.objects_of:
+            found |= index.objects_of(path)
+        return found
+
+
+def _is_true(shapes, node, predicate):
+    value = shapes.value(node, predicate)
+    return value is not None and value.toPython() is True
+
+
+def _compile_property(shapes, prop):
+    """A PropertyProgram, or None if prop uses anything not compiled here."""
+    predicates = set(shapes.predicates(prop, None))
+    if predicates - PROPERTY_CONSTRAINTS - DESCRIPTIVE:
+        return None
+    paths = list(shapes.objects(prop, SH.path))
+    if len(paths) != 1 or not isinstance(paths[0], URIRef) or paths[0] in INFERRED_PATHS:
+        return None
+    single = {}
+    for predicate in (SH.minCount, SH.maxCount, SH.datatype, SH.severity):
+        found = list(shapes.objects(prop, predicate))
+        if len(found) > 1:
+            return None
+        single[predicate] = found[0] if found else None
+    program = PropertyProgram(
+        shape=prop, path=paths[0],
+        severity=single[SH.severity] or SH.Violation,
+        messages=tuple(Literal(str(m)) for m in shapes.objects(prop, SH.message)),
+        min_count=int(single[SH.minCount]) if single[SH.minCount] is not None else None,
+        max_count=int(single[SH.maxCount]) if single[SH.maxCount] is not None else None,
+        datatype=single[SH.datatype],
+        min_lengths=list(shapes.objects(prop, SH.minLength)),
+        classes=list(shapes.objects(prop, SH["class"])),
+    )
+    for not_shape in shapes.objects(prop, SH["not"]):
+        if set(shapes.predicates(not_shape, None)) - {SH["class"]} - DESCRIPTIVE:
+            return None
+        classes = list(shapes.objects(not_shape, SH["class"]))
+        if len(classes) != 1:
+            return None
+        program.not_classes.append((not_shape, classes[0]))
+    if any(_builtin(c) for c in program.classes + [c for _, c in program.not_classes]):
+        return None
+    return program
+
+
+def _compile_shape(shapes, node):
+    """A ShapeProgram, or None if the shape has to go to pyshacl."""
+    if set(shapes.predicates(node, None)) - TARGETS - {SH.property} - DESCRIPTIVE:
+        return None
+    target_classes = list(shapes.objects(node, SH.targetClass))
+    if (node, RDF.type, RDFS.Class) in shapes:
+        target_classes.append(node)     # implicit class target
+    if any(_builtin(c) for c in target_classes):
+        return None
+    properties = []
+    for prop in shapes.objects(node, SH.property):
+        if _is_true(shapes, prop, SH.deactivated):
+            continue
+        program = _compile_property(shapes, prop)
+        if program is None:
+            return None
+        properties.append(program)
+    return ShapeProgram(
+        shape=node,
+        target_classes=target_classes,
+        target_nodes=list(shapes.objects(node, SH.targetNode)),
+        subjects_of=list(shapes.objects(node, SH.targetSubjectsOf)),
+        objects_of=list(shapes.objects(node, SH.targetObjectsOf)),
+        properties=properties,
+    )
+
+
+def targeted_shapes(shapes):
+    """Shapes with target declarations (explicit or implicit class targets)."""
+    found = set()
+    for predicate in TARGETS:
+        found.update(shapes.subjects(predicate, None))
+    for shape_class in (SH.NodeShape, SH.PropertyShape):
+        for node in shapes.subjects(RDF.type, shape_class):
+            if (node, RDF.type, RDFS.Class) in shapes:
+                found.add(node)
+    return sorted(found, key=str)
+
+
+def compile_shapes(shapes):
+    """
+    Split the shapes graph into compiled programs and shapes left to pyshacl.
+
+    Returns:
+        (programs, fallback): ShapeProgram list, list of shape nodes
+    """
+    programs, fallback = [], []
+    for node in targeted_shapes(shapes):
+        if _is_true(shapes, node, SH.deactivated):
+            continue
+        program = _compile_shape(shapes, node)
+        if program is None:
+            fallback.append(node)
+        else:
+            programs.append(program)
+    return programs, fallback
+
+
+def _plan(data_graph, shacl_graph, inference):
+    """(programs, fallback shapes, index), or None if pyshacl has to do it all."""
+    programs, fallback = compile_shapes(shacl_graph)
+    if inference not in INFERENCE_MODES or any(not isinstance(s, URIRef) for s in fallback):
+        return None
+    index = RDFSIndex(data_graph, rdfs=inference == "rdfs")
+    if index.rdfs and index.extends_vocabulary():
+        return None
+    return programs, fallback, index
+
+
+def _pyshacl(data_graph, shacl_graph, inference, options, **extra):
+    return validate(data_graph, shacl_graph=shacl_graph, inference=inference,
+                    abort_on_first=False, **options, **extra)
+
+
+def _iter_plan(plan, data_graph, shacl_graph, inference, options, budget):
+    programs, fallback, index = plan
+    for program in programs:
+        for focus in program.focus_nodes(index):
+            if budget is not None and budget.exhausted():
+                return
+            for prop in program.properties:
+                if budget is None or not budget.capped(prop.shape):
+                    yield from prop.run(focus, index, shacl_graph, data_graph)
+    if fallback and (budget is None or not budget.exhausted()):
+        _, results_graph, _ = _pyshacl(data_graph, shacl_graph, inference, options,
+                                       use_shapes=[str(s) for s in fallback])
+        yield from Report.from_graph(results_graph).results()
+
+
+def iter_results(data_graph, shacl_graph, inference="rdfs", budget=None, **options):
+    """
+    Yield ValidationResults as they are found.
+
+    Compiled shapes yield one result at a time; results of shapes left to
+    pyshacl arrive together, after its run.
+
+    Args:
+        budget: optional object with exhausted() (stop validating) and
+            capped(shape) (skip a property shape), asked between focus nodes
+    """
+    plan = _plan(data_graph, shacl_graph, inference)
+    if plan is None:
+        if budget is None or not budget.exhausted():
+            _, results_graph, _ = _pyshacl(data_graph, shacl_graph, inference, options)
+            yield from Report.from_graph(results_graph).results()
+        return
+    yield from _iter_plan(plan, data_graph, shacl_graph, inference, options, budget)
+
+
+def validate_compiled(data_graph, shacl_graph, inference="rdfs", **options):
+    """
+    Validate with compiled checks, falling back to pyshacl where needed.
+
+    Args:
+        data_graph, shacl_graph: rdflib Graphs
+        inference: "none" or "rdfs" (anything else runs pyshacl)
+        **options: passed on to pyshacl.validate for fallback shapes
+
+    Returns:
+        (conforms, results_graph, results_text) like pyshacl.validate
+    """
+    plan = _plan(data_graph, shacl_graph, inference)
+    if plan is None:
+        return _pyshacl(data_graph, shacl_graph, inference, options)
+    report = Report(_iter_plan(plan, data_graph, shacl_graph, inference, options, None))
+    return report.conforms, report.to_graph(), report.text(data_graph.namespace_manager)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Incremental SHACL Re-Validation
+
+pyshacl.validate(data, inference='rdfs') copies and RDFS-expands the whole
+data graph and checks every target of every shape. After a small edit only a
+handful of focus nodes can change their results. IncrementalValidator keeps
+the previous report (see shacl_report.Report) and, for a triple delta:
+
+1. marks the subject and object of every changed triple as touched
+   (except the class of an rdf:type triple: gaining an instance does not
+   change what a class node itself looks like)
+2. adds every node that links to a touched node (F --p--> X): its value
+   nodes' types feed sh:class checks, and RDFS domain/range typing of X
+   depends on those links
+3. validates the neighbourhood subgraph that holds everything RDFS
+   inference and the constraints can see for those nodes (plus the schema
+   triples), keeping only their results (other targets in the subgraph may
+   be incomplete there)
+4. replaces their entries in the previous report
+
+pyshacl's own focus_nodes option is not used: it only accepts IRIs, while
+blank nodes and (through rdfs:range) literals can be focus nodes too.
+
+Deltas that change the schema (rdfs:subClassOf, rdfs:subPropertyOf,
+rdfs:domain, rdfs:range) or shapes whose constraints reach further than one
+hop (sh:node, nested sh:property, qualified shapes, complex paths) fall back
+to a full validation.
+
+Usage:
+    v = IncrementalValidator(data, shapes)
+    v.validate_full()
+    delta = v.apply(added=[...], removed=[...])
+    print(delta.describe(), v.report.conforms)
+"""
+
+import time
+from dataclasses import dataclass
+
+from pyshacl import validate
+from rdflib import Graph, URIRef
+from rdflib.namespace import RDF, RDFS
+
+from .shacl_report import SH, Report
+
+SCHEMA_PREDICATES = {RDFS.subClassOf, RDFS.subPropertyOf, RDFS.domain, RDFS.range}
+
+# Constraints whose evaluation looks beyond a focus node's direct values
+DEEP_CONSTRAINTS = {SH.node, SH.qualifiedValueShape, SH.sparql,
+                    SH["and"], SH["or"], SH.xone}
+
+
+@dataclass
+class DeltaStats:
+    """What one apply() call did."""
+    mode: str               # "incremental" or "full"
+    changed: int            # triples added + removed
+    rechecked: int          # focus nodes re-validated
+    subgraph: int           # triples handed to pyshacl
+    seconds: float
+    reason: str = ""
+
+    def describe(self):
+        if self.mode == "full":
+            return (f"full re-validation ({self.reason}) of {self.subgraph} triples "
+                    f"in {self.seconds:.3f}s")
+        return (f"{self.changed} changed triple(s) → re-checked {self.rechecked} "
+                f"focus node(s) on {self.subgraph} triples in {self.seconds:.3f}s")
+
+
+def one_hop_shapes(shapes):
+    """True if every constraint only looks at a focus node's direct values."""
+    for path in shapes.objects(None, SH.path):
+        if not isinstance(path, URIRef):
+            return False
+    for predicate in DEEP_CONSTRAINTS:
+        if (None, predicate, None) in shapes:
+            return False
+    # sh:property inside a property shape nests one level deeper
+    for prop in shapes.objects(None, SH.property):
+        if (prop, SH.property, None) in shapes:
+            return False
+    return True
+
+
+def neighbourhood(data, focus_nodes):
+    """
+    Schema triples plus every triple touching a focus node or its values.
+
+    For one-hop shapes this is everything RDFS inference and the
+    constraints can see when validating focus_nodes.
+    """
+    nodes = set(focus_nodes)
+    for node in focus_nodes:
+        nodes.update(data.objects(node, None))
+    sub = Graph()
+    for prefix, ns in data.namespaces():
+        sub.bind(prefix, ns)
+    for predicate in SCHEMA_PREDICATES:
+        for t in data.triples((None, predicate, None)):
+            sub.add(t)
+    for node in nodes:
+        for t in data.triples((node, None, None)):
+            sub.add(t)
+        for t in data.triples((None, None, node)):
+            sub.add(t)
+    return sub
+
+
+class IncrementalValidator:
+    """Maintains a SHACL report for a data graph that changes in small steps."""
+
+    def __init__(self, data_graph, shapes_graph, inference="rdfs", report=None, **options):
+        """report: the current Report of data_graph, if already validated."""
+        self.data = data_graph
+        self.shapes = shapes_graph
+        self.inference = inference
+        self.options = options
+        self.one_hop = one_hop_shapes(shapes_graph)
+        self.report = report
+
+    def _validate(self, graph):
+        _, results_graph, _ = validate(graph, shacl_graph=self.shapes,
+                                       inference=self.inference,
+                                       abort_on_first=False, **self.options)
+        return Report.from_graph(results_graph)
+
+    def validate_full(self):
+        """Validate the whole data graph and keep the report."""
+        self.report = self._validate(self.data)
+        return self.report
+
+    # ------------------------------------------------------------------
+    # Delta handling
+    # ------------------------------------------------------------------
+
+    def affected_nodes(self, changed):
+        """Focus-node candidates whose results may differ after the change."""
+        touched = set()
+        for s, p, o in changed:
+            touched.add(s)
+            # Literals too: rdfs:range can type a literal into a target class
+            if p != RDF.type:
+                touched.add(o)
+        affected = set(touched)
+        for node in touched:
+            affected.update(self.data.subjects(None, node))
+        return affected
+
+    def neighbourhood(self, focus_nodes):
+        return neighbourhood(self.data, focus_nodes)
+
+    def apply(self, added=(), removed=()):
+        """
+        Change the data graph and update the report.
+
+        Args:
+            added: triples to add
+            removed: triples to remove
+
+        Returns:
+            DeltaStats
+        """
+        start = time.perf_counter()
+        added = [t for t in added if t not in self.data]
+        removed = [t for t in removed if t in self.data]
+        changed = added + removed
+
+        for t in removed:
+            self.data.remove(t)
+        for t in added:
+            self.data.add(t)
+
+        reason = ""
+        if self.report is None:
+            reason = "no previous report"
+        elif not self.one_hop:
+            reason = "shapes look beyond direct values"
+        elif any(p in SCHEMA_PREDICATES for _, p, _ in changed):
+            reason = "schema triple changed"
+        if reason:
+            self.validate_full()
+            return DeltaStats("full", len(changed), len(self.report.by_focus),
+                              len(self.data), time.perf_counter() - start, reason)
+
+        affected = self.affected_nodes(changed)
+        sub = self.neighbourhood(affected)
+        partial = self._validate(sub)
+        self.report.replace(affected, [r for r in partial.results() if r.focus in affected])
+        return DeltaStats("incremental", len(changed), len(affected), len(sub),
+                          time.perf_counter() - start)
+
+    def matches_full(self):
+        """Re-validate everything and compare with the maintained report."""
+        return self._validate(self.data) == self.report
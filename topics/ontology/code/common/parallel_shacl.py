@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Sharded Parallel SHACL Validation
+
+pyshacl validates every target of every shape in one thread, after RDFS
+expansion of a copy of the whole data graph. For shapes whose constraints
+only look at a focus node's direct values (all shapes in
+diet/shacl_shapes.ttl and the pyshacl examples), both steps can be split
+over the focus nodes:
+
+1. every node of the data graph is a focus-node candidate; candidates are
+   ordered by asserted rdf:type (so each target class stays together) and
+   cut into contiguous ranges, the shards
+2. a worker process builds the shard's subgraph (shard_graph) and runs
+   pyshacl on it with the requested inference, keeping only results whose
+   focus node belongs to the shard
+3. the shard reports are merged into one Report
+
+Workers are forked after the graphs are loaded, so they share one read-only
+copy (copy-on-write) instead of receiving pickles. pyshacl's focus_nodes
+option is not used: it only accepts IRIs and checks each target against the
+list (quadratic for shard-sized lists); filtering the results is cheaper.
+
+Shapes that reach further than one hop are validated in a single pyshacl
+call.
+
+Usage:
+    conforms, results_graph, results_text = validate_parallel(
+        data, shapes, workers=4)
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from pyshacl import validate
+from rdflib.namespace import RDF
+
+from .incremental_shacl import neighbourhood, one_hop_shapes
+from .shacl_report import Report
+
+# Read-only graphs shared with the workers (set before the pool starts)
+_DATA = None
+_SHAPES = None
+_OPTIONS = {}
+
+
+def _init_worker(data, shapes, options):
+    global _DATA, _SHAPES, _OPTIONS
+    if data is not None:
+        _DATA, _SHAPES = data, shapes
+    _OPTIONS = options
+
+
+def _validate_shard(nodes):
+    _, results_graph, _ = validate(shard_graph(_DATA, nodes), shacl_graph=_SHAPES,
+                                   abort_on_first=False, **_OPTIONS)
+    nodes = set(nodes)
+    return [r for r in Report.from_graph(results_graph).results() if r.focus in nodes]
+
+
+def _add_one_per_predicate(sub, triples):
+    seen = set()
+    for t in triples:
+        if t[1] not in seen:
+            seen.add(t[1])
+            sub.add(t)
+
+
+def shard_graph(data, focus_nodes):
+    """
+    The part of the data graph that validating focus_nodes depends on.
+
+    Focus nodes keep all their outgoing triples; their value nodes only
+    need their types (sh:class): the asserted ones, and one triple per
+    predicate for rdfs:domain/rdfs:range typing, which depends on the
+    predicate and not on the other end. Schema triples are always kept.
+
+    Unlike incremental_shacl.neighbourhood this does not pull in every
+    subject linking to a value, so a popular value node (a food in many
+    meals) does not copy its whole fan-in into every shard.
+    """
+    focus_nodes = set(focus_nodes)
+    values = set()
+    sub = neighbourhood(data, ())      # schema triples only
+    for node in focus_nodes:
+        for t in data.triples((node, None, None)):
+            sub.add(t)
+            values.add(t[2])
+        _add_one_per_predicate(sub, data.triples((None, None, node)))
+    for node in values - focus_nodes:
+        for t in data.triples((node, RDF.type, None)):
+            sub.add(t)
+        _add_one_per_predicate(sub, data.triples((node, None, None)))
+        _add_one_per_predicate(sub, data.triples((None, None, node)))
+    return sub
+
+
+def candidate_nodes(data):
+    """All nodes of the data graph, ordered by asserted type, then by node."""
+    nodes = set(data.subjects()) | set(data.objects())
+
+    def key(node):
+        types = sorted(str(t) for t in data.objects(node, RDF.type))
+        return (types[0] if types else "", type(node).__name__, str(node))
+    return sorted(nodes, key=key)
+
+
+def make_shards(nodes, count, weight=None):
+    """
+    Cut an ordered node list into `count` contiguous ranges.
+
+    weight: node -> cost (default 1); ranges get about equal total weight
+    """
+    count = max(1, min(count, len(nodes)))
+    weights = [weight(n) if weight else 1 for n in nodes]
+    target = sum(weights) / count
+    shards, current, total = [], [], 0
+    for node, w in zip(nodes, weights):
+        current.append(node)
+        total += w
+        if total >= target * (len(shards) + 1) and len(shards) < count - 1:
+            shards.append(current)
+            current = []
+    shards.append(current)
+    return [shard for shard in shards if shard]
+
+
+def validate_parallel(data_graph, shacl_graph, workers=None, shards=None,
+                      inference="rdfs", **options):
+    """
+    Validate in worker processes and merge the shard reports.
+
+    Args:
+        data_graph, shacl_graph: rdflib Graphs
+        workers: process count (default: CPU count)
+        shards: number of node ranges (default: 2 per worker)
+        inference, **options: passed on to pyshacl.validate
+
+    Returns:
+        (conforms, results_graph, results_text) like pyshacl.validate
+    """
+    global _DATA, _SHAPES
+    if not one_hop_shapes(shacl_graph):
+        return validate(data_graph, shacl_graph=shacl_graph, inference=inference,
+                        abort_on_first=False, **options)
+
+    options = dict(options, inference=inference)
+    workers = workers or os.cpu_count() or 1
+    # A shard costs about as much as the triples it validates
+    shard_list = make_shards(candidate_nodes(data_graph), shards or workers * 2,
+                             weight=lambda n: 1 + sum(1 for _ in data_graph.triples((n, None, None))))
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        # Children inherit the graphs; nothing large is pickled
+        context = multiprocessing.get_context("fork")
+        _DATA, _SHAPES = data_graph, shacl_graph
+        initargs = (None, None, options)
+    else:
+        context = None
+        initargs = (data_graph, shacl_graph, options)
+
+    report = Report()
+    try:
+        with ProcessPoolExecutor(workers, mp_context=context,
+                                 initializer=_init_worker, initargs=initargs) as pool:
+            for results in pool.map(_validate_shard, shard_list):
+                report.merge(Report(results))
+    finally:
+        _DATA = _SHAPES = None
+    return report.conforms, report.to_graph(), report.text(data_graph.namespace_manager)
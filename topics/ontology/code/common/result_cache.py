@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Graph-Version-Aware SPARQL Result Cache
+
+The diet demo runs the same .sparql files, and show_menu()/show_people()
+the same inline queries, over a graph that almost never changes, and
+evaluates every one of them again on every run. ResultCache remembers
+SELECT answers instead:
+
+- the key is the normalized query text (comments and extra whitespace
+  removed outside strings and IRIs), the bound parameters, and the
+  graph's version
+- VersionedGraph bumps an epoch counter on every add/remove made through
+  it, so an edit makes all earlier answers unreachable (they are dropped
+  from memory at the next lookup)
+- tier 1: an in-memory LRU bounded by the total number of cached rows
+- tier 2 (optional): a SQLite file keyed by a hash of the graph content
+  instead of the epoch, so a restarted process with the same data serves
+  repeated queries with no evaluation; an edit that is undone again
+  hashes the same as before
+
+The content hash is computed once per epoch and includes blank node
+labels, which differ between parses: a graph with blank nodes gets no
+disk hits after a restart (but never wrong ones).
+
+Usage:
+    g = VersionedGraph()
+    g.parse("diet.ttl", format="turtle")
+    cache = ResultCache(g, directory=".query_cache")
+    rows = cache.select(query_text)                          # [ResultRow]
+    rows = cache.select(text, {"person": DIET.Alice}, prepared=prepared_query)
+    print(cache.stats.describe())
+"""
+
+import hashlib
+import pickle
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from rdflib import Graph, Variable
+from rdflib.query import ResultRow
+
+DEFAULT_CACHE_DIR = ".query_cache"
+
+# Bump when the stored layout changes so old entries are ignored
+CACHE_VERSION = 1
+
+# Graph versions whose answers are kept on disk
+KEEP_GRAPHS = 8
+
+
+class VersionedGraph(Graph):
+    """rdflib Graph with an epoch counter bumped by every add or remove through it."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.epoch = 0
+        self._content_hash = None      # (epoch, hash)
+
+    def add(self, triple):
+        self.epoch += 1
+        return super().add(triple)
+
+    def addN(self, quads):
+        self.epoch += 1
+        return super().addN(quads)
+
+    def remove(self, triple):
+        self.epoch += 1
+        return super().remove(triple)
+
+    def content_hash(self):
+        """Order-independent SHA-256 over the triples; recomputed once per epoch."""
+        if self._content_hash is None or self._content_hash[0] != self.epoch:
+            total = 0
+            for triple in self:
+                line = " ".join(term.n3() for term in triple).encode("utf-8")
+                total += int.from_bytes(hashlib.sha256(line).digest(), "big")
+            self._content_hash = (self.epoch, f"{total % (1 << 256):064x}")
+        return self._content_hash[1]
+
+
+# Strings and IRIs are kept as they are; runs of whitespace and comments
+# between them become one space
+_QUERY_TOKENS = re.compile(
+    r'("""(?:[^"\\]|\\.|"(?!""))*"""'
+    r"|'''(?:[^'\\]|\\.|'(?!''))*'''"
+    r'|"(?:[^"\\\n]|\\.)*"'
+    r"|'(?:[^'\\\n]|\\.)*'"
+    r'|<[^<>"{}|^`\\\s]*>)'
+    r'|((?:\s|#[^\n]*)+)')
+
+
+def normalize_query(text):
+    return _QUERY_TOKENS.sub(lambda m: m.group(1) or " ", text).strip()
+
+
+def cache_key(text, bindings=None):
+    """Hash of the normalized query text and the bound parameters."""
+    parts = [normalize_query(text)]
+    for name, value in sorted((bindings or {}).items()):
+        parts.append(f"{name}={value.n3()}")
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    eval_seconds: float = 0.0
+
+    def describe(self):
+        hits = self.memory_hits + self.disk_hits
+        return (f"{hits} hit(s) ({self.memory_hits} memory, {self.disk_hits} disk), "
+                f"{self.misses} evaluated in {self.eval_seconds:.3f}s")
+
+
+class _DiskTier:
+    """SQLite table: (graph content hash, query key) -> pickled answer."""
+
+    def __init__(self, directory):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / "results.sqlite"
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute("""CREATE TABLE IF NOT EXISTS results (
+                               graph TEXT,
+                               key TEXT,
+                               answer BLOB,
+                               used REAL,
+                               PRIMARY KEY (graph, key))""")
+        self.db.commit()
+        self.written = set()       # graph hashes written by this process
+
+    def get(self, graph, key):
+        row = self.db.execute("SELECT answer FROM results WHERE graph = ? AND key = ?",
+                              (graph, key)).fetchone()
+        if row is None:
+            return None
+        version, vars_, rows = pickle.loads(row[0])
+        return (vars_, rows) if version == CACHE_VERSION else None
+
+    def put(self, graph, key, entry):
+        answer = pickle.dumps((CACHE_VERSION, *entry), protocol=pickle.HIGHEST_PROTOCOL)
+        self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                        (graph, key, answer, time.time()))
+        if graph not in self.written:
+            self.written.add(graph)
+            self._prune()
+        self.db.commit()
+
+    def _prune(self):
+        """Keep the answers of the KEEP_GRAPHS most recently written graph versions."""
+        self.db.execute("""DELETE FROM results WHERE graph NOT IN (
+                               SELECT graph FROM results GROUP BY graph
+                               ORDER BY MAX(used) DESC LIMIT ?)""", (KEEP_GRAPHS,))
+
+    def close(self):
+        self.db.close()
+
+
+class ResultCache:
+    """SELECT answers of one VersionedGraph, in memory and optionally on disk."""
+
+    def __init__(self, graph, max_rows=100_000, directory=None):
+        """
+        Args:
+            graph: VersionedGraph to query
+            max_rows: rows kept in memory over all cached answers
+            directory: directory of the persistent tier (default: memory only)
+        """
+        if not hasattr(graph, "epoch"):
+            raise TypeError("ResultCache needs a VersionedGraph: its epoch tells when answers go stale")
+        self.graph = graph
+        self.max_rows = max_rows
+        self.memory = OrderedDict()    # (epoch, key) -> (vars, rows)
+        self.rows = 0
+        self.epoch = graph.epoch
+        self.disk = _DiskTier(directory) if directory is not None else None
+        self.stats = CacheStats()
+
+    def _remember(self, key, entry):
+        size = len(entry[1])
+        if size > self.max_rows // 4:      # one answer may not flush the cache
+            return
+        self.memory[key] = entry
+        self.rows += size
+        while self.rows > self.max_rows:
+            _, (_, evicted) = self.memory.popitem(last=False)
+            self.rows -= len(evicted)
+
+    @staticmethod
+    def _result_rows(entry):
+        vars_, rows = entry
+        return [ResultRow(dict(zip(vars_, row)), vars_) for row in rows]
+
+    def select(self, text, bindings=None, prepared=None):
+        """
+        Answer a SELECT query, from the cache if possible.
+
+        Args:
+            text: query text (the cache key; evaluated unless prepared is given)
+            bindings: variable name -> RDF term, e.g. {"person": DIET.Alice}
+            prepared: the query prepared from text, to skip parsing on a miss
+
+        Returns:
+            list of rdflib ResultRow (row.foodName, row["foodName"], row.labels)
+        """
+        bindings = bindings or {}
+        if self.graph.epoch != self.epoch:
+            # The graph changed: no cached answer in memory can be used again
+            self.memory.clear()
+            self.rows = 0
+            self.epoch = self.graph.epoch
+        digest = cache_key(text, bindings)
+        key = (self.epoch, digest)
+
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.memory.move_to_end(key)
+            self.stats.memory_hits += 1
+            return self._result_rows(entry)
+
+        if self.disk is not None:
+            entry = self.disk.get(self.graph.content_hash(), digest)
+            if entry is not None:
+                self.stats.disk_hits += 1
+                self._remember(key, entry)
+                return self._result_rows(entry)
+
+        start = time.perf_counter()
+        init = {Variable(name): value for name, value in bindings.items()}
+        result = self.graph.query(prepared if prepared is not None else text, initBindings=init)
+        if result.type != "SELECT":
+            raise ValueError(f"ResultCache only caches SELECT queries, not {result.type}")
+        entry = ([Variable(str(var)) for var in result.vars], [tuple(row) for row in result])
+        self.stats.eval_seconds += time.perf_counter() - start
+        self.stats.misses += 1
+
+        self._remember(key, entry)
+        if self.disk is not None:
+            self.disk.put(self.graph.content_hash(), digest, entry)
+        return self._result_rows(entry)
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
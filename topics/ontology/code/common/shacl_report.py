@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+SHACL Validation Reports Keyed by Focus Node
+
+pyshacl returns a report as an RDF graph plus a formatted text. To combine
+reports from several runs (re-validating a few nodes, merging shards) the
+results need a plain form: Report keeps each sh:ValidationResult as a
+hashable ValidationResult grouped by focus node, so
+
+- replace(nodes, results) swaps in a re-check of some focus nodes
+- merge(other) combines reports over disjoint focus nodes
+- report == other compares two runs regardless of blank node labels
+
+and to_graph() / text() rebuild pyshacl's outputs.
+
+Usage:
+    conforms, graph, text = pyshacl.validate(...)
+    report = Report.from_graph(graph)
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+
+from rdflib import BNode, Graph, Literal, Namespace
+from rdflib.namespace import RDF
+
+SH = Namespace("http://www.w3.org/ns/shacl#")
+
+
+@dataclass(frozen=True)
+class ValidationResult:
+    """One sh:ValidationResult, reduced to comparable terms."""
+    focus: object
+    path: object
+    value: object
+    shape: object
+    component: object
+    severity: object
+    messages: tuple
+
+    @classmethod
+    def from_graph(cls, g, node):
+        return cls(
+            focus=g.value(node, SH.focusNode),
+            path=g.value(node, SH.resultPath),
+            value=g.value(node, SH.value),
+            shape=g.value(node, SH.sourceShape),
+            component=g.value(node, SH.sourceConstraintComponent),
+            severity=g.value(node, SH.resultSeverity),
+            messages=tuple(sorted(g.objects(node, SH.resultMessage))),
+        )
+
+    def sort_key(self):
+        return (str(self.focus), str(self.path), str(self.component),
+                str(self.value), self.messages)
+
+    def add_to(self, g, report):
+        node = BNode()
+        g.add((report, SH.result, node))
+        g.add((node, RDF.type, SH.ValidationResult))
+        for predicate, obj in ((SH.focusNode, self.focus), (SH.resultPath, self.path),
+                               (SH.value, self.value), (SH.sourceShape, self.shape),
+                               (SH.sourceConstraintComponent, self.component),
+                               (SH.resultSeverity, self.severity)):
+            if obj is not None:
+                g.add((node, predicate, obj))
+        for message in self.messages:
+            g.add((node, SH.resultMessage, message))
+        return node
+
+    def describe(self, namespace_manager=None):
+        def short(term):
+            if term is None:
+                return ""
+            if namespace_manager is not None and not isinstance(term, Literal):
+                return term.n3(namespace_manager)
+            return str(term)
+        component = str(self.component)
+        lines = [
+            f"Constraint Violation in {component.split('#')[-1]} ({component}):",
+            f"\tSeverity: {short(self.severity)}",
+            f"\tFocus Node: {short(self.focus)}",
+        ]
+        if self.value is not None:
+            lines.append(f"\tValue Node: {short(self.value)}")
+        if self.path is not None:
+            lines.append(f"\tResult Path: {short(self.path)}")
+        for message in self.messages:
+            lines.append(f"\tMessage: {message}")
+        return "\n".join(lines)
+
+
+class Report:
+    """Validation results grouped by focus node."""
+
+    def __init__(self, results=()):
+        self.by_focus = defaultdict(set)
+        for result in results:
+            self.by_focus[result.focus].add(result)
+
+    @classmethod
+    def from_graph(cls, results_graph):
+        """Build from a pyshacl results graph."""
+        return cls(ValidationResult.from_graph(results_graph, node)
+                   for node in results_graph.subjects(RDF.type, SH.ValidationResult))
+
+    @property
+    def conforms(self):
+        return not any(self.by_focus.values())
+
+    def __len__(self):
+        return sum(len(results) for results in self.by_focus.values())
+
+    def __eq__(self, other):
+        return isinstance(other, Report) and set(self.results()) == set(other.results())
+
+    def results(self):
+        """All results, in a stable order."""
+        found = [r for results in self.by_focus.values() for r in results]
+        return sorted(found, key=ValidationResult.sort_key)
+
+    def replace(self, focus_nodes, results):
+        """Drop the results of focus_nodes and add their re-checked results."""
+        for node in focus_nodes:
+            self.by_focus.pop(node, None)
+        for result in results:
+            self.by_focus[result.focus].add(result)
+
+    def merge(self, other):
+        for focus, results in other.by_focus.items():
+            self.by_focus[focus] |= results
+        return self
+
+    def to_graph(self):
+        g = Graph()
+        g.bind("sh", SH)
+        report = BNode()
+        g.add((report, RDF.type, SH.ValidationReport))
+        g.add((report, SH.conforms, Literal(self.conforms)))
+        for result in self.results():
+            result.add_to(g, report)
+        return g
+
+    def text(self, namespace_manager=None):
+        lines = ["Validation Report", f"Conforms: {self.conforms}"]
+        if not self.conforms:
+            lines.append(f"Results ({len(self)}):")
+            lines.extend(r.describe(namespace_manager) for r in self.results())
+        return "\n".join(lines)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Streaming SHACL Validation Output
+
+pyshacl.validate() returns a results graph and a formatted text only after
+every shape has been checked, and both grow with the number of violations.
+stream_validation() writes each violation as one JSON line as soon as it is
+found and keeps only counters:
+
+    {"focus": "diet:Alice", "path": "diet:hasName", "component": "MinCount",
+     "severity": "Violation", "shape": "diet:PersonShape[diet:hasName]",
+     "message": "..."}
+    ...
+    {"summary": {"violations": 2, "conforms": false, "stopped": null, ...}}
+
+Budgets stop the run early:
+
+- max_total: stop after this many violations
+- max_per_shape: stop checking a property shape after this many of its
+  violations (the remaining focus nodes are skipped, not counted)
+- time_budget: stop after this many seconds
+
+Results come from compiled_shacl.iter_results: compiled shapes stream one
+result at a time and honour the budgets between focus nodes; shapes left to
+pyshacl arrive as one batch at the end, trimmed to the same caps.
+
+Scripts exit with exit_status(summary): 0 if the data conforms, 1 if any
+violation was found, 2 if a budget stopped the run before any was.
+
+Usage:
+    with open("violations.jsonl", "w") as out:
+        summary = stream_validation(data, shapes, out, max_per_shape=100)
+    sys.exit(exit_status(summary))
+"""
+
+import json
+import time
+from collections import Counter
+
+from rdflib import BNode
+
+from .compiled_shacl import iter_results
+from .shacl_report import SH
+
+
+def _local_name(term):
+    text = str(term)
+    return text.rsplit("#", 1)[-1].rsplit("/", 1)[-1]
+
+
+def shape_labels(shapes, namespace_manager=None):
+    """Readable names for blank property shapes: "diet:FoodShape[diet:foodName]"."""
+    nsm = namespace_manager or shapes.namespace_manager
+    labels = {}
+    for node, prop in shapes.subject_objects(SH.property):
+        path = shapes.value(prop, SH.path)
+        if isinstance(prop, BNode) and path is not None:
+            labels[prop] = f"{node.n3(nsm)}[{path.n3(nsm)}]"
+    return labels
+
+
+class ViolationStream:
+    """Writes ValidationResults as JSON lines; keeps only counts."""
+
+    def __init__(self, out, namespace_manager=None, max_total=None,
+                 max_per_shape=None, time_budget=None, labels=None):
+        """labels: term -> display name (see shape_labels)"""
+        self.out = out
+        self.namespace_manager = namespace_manager
+        self.labels = labels or {}
+        self.max_total = max_total
+        self.max_per_shape = max_per_shape
+        self.time_budget = time_budget
+        self.start = time.monotonic()
+        self.total = 0
+        self.dropped = 0
+        self.stopped = None
+        self.by_shape = Counter()
+        self.by_component = Counter()
+        self.by_severity = Counter()
+
+    def _term(self, term):
+        if term is None:
+            return None
+        if term in self.labels:
+            return self.labels[term]
+        if self.namespace_manager is not None:
+            return term.n3(self.namespace_manager)
+        return term.n3()
+
+    # Budget protocol used by compiled_shacl.iter_results
+
+    def exhausted(self):
+        if self.stopped is None:
+            if self.max_total is not None and self.total >= self.max_total:
+                self.stopped = "max-violations"
+            elif self.time_budget is not None and \
+                    time.monotonic() - self.start >= self.time_budget:
+                self.stopped = "time-budget"
+        return self.stopped is not None
+
+    def capped(self, shape):
+        return self.max_per_shape is not None and self.by_shape[shape] >= self.max_per_shape
+
+    def write(self, result):
+        """Emit one result unless a cap is reached; returns whether it was written."""
+        if self.exhausted() or self.capped(result.shape):
+            self.dropped += 1
+            return False
+        record = {
+            "focus": self._term(result.focus),
+            "path": self._term(result.path),
+            "value": self._term(result.value),
+            "component": _local_name(result.component).replace("ConstraintComponent", ""),
+            "severity": _local_name(result.severity),
+            "shape": self._term(result.shape),
+            "message": " / ".join(str(m) for m in result.messages) or None,
+        }
+        self.out.write(json.dumps({k: v for k, v in record.items() if v is not None},
+                                  ensure_ascii=False) + "\n")
+        self.out.flush()
+        self.total += 1
+        self.by_shape[result.shape] += 1
+        self.by_component[record["component"]] += 1
+        self.by_severity[record["severity"]] += 1
+        return True
+
+    def summary(self):
+        if self.total:
+            conforms = False
+        else:
+            conforms = True if self.stopped is None else None
+        return {
+            "violations": self.total,
+            "conforms": conforms,
+            "stopped": self.stopped,
+            "capped_shapes": sum(1 for shape in self.by_shape if self.capped(shape)),
+            "dropped": self.dropped,
+            "seconds": round(time.monotonic() - self.start, 3),
+            "by_component": dict(self.by_component.most_common()),
+            "by_severity": dict(self.by_severity.most_common()),
+            "by_shape": {self._term(shape): n for shape, n in self.by_shape.most_common()},
+        }
+
+
+def stream_validation(data_graph, shacl_graph, out, inference="rdfs", max_total=None,
+                      max_per_shape=None, time_budget=None, **options):
+    """
+    Validate and write violations to `out` as JSON lines, then a summary line.
+
+    Args:
+        data_graph, shacl_graph: rdflib Graphs
+        out: text file object
+        max_total, max_per_shape, time_budget: early-exit budgets (None: no limit)
+        inference, **options: as for compiled_shacl.iter_results
+
+    Returns:
+        the summary dict (also written as the last line)
+    """
+    stream = ViolationStream(out, data_graph.namespace_manager, max_total=max_total,
+                             max_per_shape=max_per_shape, time_budget=time_budget,
+                             labels=shape_labels(shacl_graph, data_graph.namespace_manager))
+    results = iter_results(data_graph, shacl_graph, inference=inference,
+                           budget=stream, **options)
+    try:
+        for result in results:
+            stream.write(result)
+            if stream.exhausted():
+                break
+    finally:
+        results.close()
+    summary = stream.summary()
+    out.write(json.dumps({"summary": summary}, ensure_ascii=False) + "\n")
+    out.flush()
+    return summary
+
+
+def exit_status(summary):
+    """Process exit code: 0 conforms, 1 violations, 2 stopped early without any."""
+    if summary["violations"]:
+        return 1
+    return 0 if summary["conforms"] else 2
@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+"""
+Local SPARQL Endpoint for the Demo Ontologies
+
+diet/run.py, computer/run.py and food/reason.py each parse their ontology,
+and the latter two re-derive its OWL-RL closure, on every run. This server
+does both once at start-up and then answers SPARQL 1.1 Protocol requests
+over HTTP:
+
+- every repository is parsed and (optionally) materialized once; the
+  graphs are read-only afterwards
+- every connection gets a light thread that only reads requests and
+  writes answers; the queries themselves run on a fixed pool of worker
+  threads, so idle keep-alive connections (dropped after a few seconds)
+  never hold a worker
+- each query text is parsed and translated to algebra once (rdflib's
+  parser is not thread-safe, so this step is serialized); evaluation runs
+  in the workers
+- serialized answers are kept in a byte-bounded LRU keyed by repository,
+  query text and result format; the graphs never change, so entries never
+  go stale
+- request latencies, from reading the request line to the answer and so
+  including the wait for a worker, are recorded and reported as
+  percentiles (GET /stats, and on shutdown)
+
+URLs follow the GraphDB / RDF4J layout, so the server can stand in for the
+GraphDB endpoint of ontology_tools/code/run.py:
+
+    GET  /repositories                      list (SPARQL JSON results)
+    GET  /repositories/NAME?query=...       query
+    POST /repositories/NAME                 form-encoded query=... or
+                                            application/sparql-query body
+    GET  /stats                             cache and latency statistics
+
+SELECT and ASK answer in SPARQL JSON (default), XML, CSV or TSV; CONSTRUCT
+and DESCRIBE in Turtle (default), N-Triples, RDF/XML or JSON-LD, chosen by
+the Accept header.
+
+The default repositories:
+
+    diet         ontology/diet/diet.ttl               as asserted
+    computers    ontology/computer/computers.ttl      OWL-RL closure
+    food_safety  food/food_safety.ttl                 OWL-RL closure
+    food         ontology_tools/code/food.rdf         OWL-RL closure
+
+diet/run.py never reasons and its queries are written for the asserted
+graph (several answer differently on the closure), so diet is served as
+asserted.
+
+Command line:
+    python3 sparql_server.py                          # port 7200, as GraphDB
+    python3 sparql_server.py --port 8080 --workers 16 --cache-mb 128
+    python3 sparql_server.py mine=data.ttl --reasoner rdfs
+
+    python3 ../../../ontology_tools/code/run.py --endpoint http://localhost:7200/repositories/food
+"""
+
+import argparse
+import json
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from rdflib import Graph
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.results.jsonresults import termToJSON
+from rdflib.util import guess_format
+
+CODE_DIR = Path(__file__).resolve().parents[1]
+
+# name -> (file, reasoner)
+DEFAULT_REPOSITORIES = {
+    "diet": (CODE_DIR / "ontology" / "diet" / "diet.ttl", "none"),
+    "computers": (CODE_DIR / "ontology" / "computer" / "computers.ttl", "owlrl"),
+    "food_safety": (CODE_DIR / "food" / "food_safety.ttl", "owlrl"),
+    "food": (CODE_DIR.parents[1] / "ontology_tools" / "code" / "food.rdf", "owlrl"),
+}
+
+REASONERS = ("owlrl", "rdfs", "none")
+
+# Media type -> rdflib serializer, in order of preference
+RESULT_FORMATS = {
+    "application/sparql-results+json": "json",
+    "application/json": "json",
+    "application/sparql-results+xml": "xml",
+    "application/xml": "xml",
+    "text/csv": "csv",
+    "text/tab-separated-values": "tsv",
+}
+GRAPH_FORMATS = {
+    "text/turtle": "turtle",
+    "application/n-triples": "nt",
+    "text/plain": "nt",
+    "application/rdf+xml": "xml",
+    "application/ld+json": "json-ld",
+}
+
+# Parsed queries kept for reuse
+PREPARED_QUERIES = 256
+
+# Idle keep-alive connections are closed after this many seconds
+IDLE_TIMEOUT = 5.0
+
+
+class QueryError(ValueError):
+    """The request is not a valid query (answered with 400)."""
+
+
+# ----------------------------------------------------------------------
+# Repositories
+# ----------------------------------------------------------------------
+
+@dataclass
+class Repository:
+    name: str
+    path: Path
+    reasoner: str
+    graph: Graph
+    asserted: int           # triples before reasoning
+    parse_seconds: float
+    reason_seconds: float
+
+    def describe(self):
+        inferred = len(self.graph) - self.asserted
+        return (f"{self.name:12s} {len(self.graph):>7,} triples ({inferred:,} inferred, "
+                f"{self.reasoner}); parsed in {self.parse_seconds:.2f}s, "
+                f"reasoned in {self.reason_seconds:.2f}s  [{self.path.name}]")
+
+
+def load_repository(name, path, reasoner="owlrl"):
+    """Parse a file and materialize its closure once."""
+    if reasoner not in REASONERS:
+        raise ValueError(f"unknown reasoner {reasoner!r} (expected one of {', '.join(REASONERS)})")
+    path = Path(path)
+    g = Graph()
+    start = time.perf_counter()
+    g.parse(str(path), format=guess_format(str(path)) or "turtle")
+    parsed = time.perf_counter()
+    asserted = len(g)
+    if reasoner != "none":
+        from owlrl import DeductiveClosure, OWLRL_Semantics, RDFS_Semantics
+        semantics = OWLRL_Semantics if reasoner == "owlrl" else RDFS_Semantics
+        DeductiveClosure(semantics).expand(g)
+    reasoned = time.perf_counter()
+    return Repository(name, path, reasoner, g, asserted,
+                      parsed - start, reasoned - parsed)
+
+
+# ----------------------------------------------------------------------
+# Statistics
+# ----------------------------------------------------------------------
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an ascending list (None if empty)."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+class LatencyStats:
+    """Request latencies of the last `window` requests, plus running totals."""
+
+    def __init__(self, window=100_000):
+        self.samples = deque(maxlen=window)     # (seconds, cache hit)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.errors = 0
+
+    def record(self, seconds, hit, error=False):
+        with self.lock:
+            self.samples.append((seconds, hit))
+            self.requests += 1
+            self.hits += hit
+            self.errors += error
+
+    @staticmethod
+    def _summary(seconds):
+        ordered = sorted(seconds)
+        summary = {f"p{p}": percentile(ordered, p) for p in (50, 90, 99)}
+        summary["max"] = ordered[-1] if ordered else None
+        return {k: None if v is None else round(v * 1000, 3) for k, v in summary.items()}
+
+    def summary(self):
+        with self.lock:
+            samples = list(self.samples)
+            totals = {"requests": self.requests, "cache_hits": self.hits, "errors": self.errors}
+        return {**totals,
+                "latency_ms": self._summary(s for s, _ in samples),
+                "hit_latency_ms": self._summary(s for s, hit in samples if hit),
+                "miss_latency_ms": self._summary(s for s, hit in samples if not hit)}
+
+    def describe(self):
+        s = self.summary()
+        ms = s["latency_ms"]
+        if not s["requests"]:
+            return "no requests"
+        return (f"{s['requests']:,} requests ({s['cache_hits']:,} cache hits, "
+                f"{s['errors']:,} errors); latency p50 {ms['p50']} ms, p90 {ms['p90']} ms, "
+                f"p99 {ms['p99']} ms, max {ms['max']} ms")
+
+
+# ----------------------------------------------------------------------
+# Query execution
+# ----------------------------------------------------------------------
+
+def negotiate(accept, formats, default):
+    """(media type, serializer) for an Accept header, by q-value then order."""
+    offered = []
+    for i, part in enumerate((accept or "").split(",")):
+        media, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    pass
+        offered.append((-q, i, media.lower()))
+    for q, _, media in sorted(offered):
+        if q < 0 and media in formats:
+            return media, formats[media]
+        if q < 0 and media in ("*/*", "application/*", "text/*"):
+            break
+    return default, formats[default]
+
+
+def serialize_select_json(result):
+    """SPARQL JSON with the head first (rdflib writes it last), so that
+    streaming clients know the variables before the first row."""
+    bindings = [{str(var): termToJSON(None, term) for var, term in zip(result.vars, row)
+                 if term is not None}
+                for row in result]
+    return json.dumps({"head": {"vars": [str(var) for var in result.vars]},
+                       "results": {"bindings": bindings}},
+                      ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _tsv_field(term):
+    return "" if term is None else term.n3().replace("\t", "\\t")
+
+
+def serialize_tsv(result):
+    lines = ["\t".join(f"?{var}" for var in result.vars)]
+    for row in result:
+        lines.append("\t".join(_tsv_field(term) for term in row))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class ResultCache:
+    """Serialized answers in an LRU bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()    # key -> (media type, body)
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, media, body):
+        if len(body) > self.max_bytes // 4:     # one answer may not flush the cache
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self.entries[key] = (media, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def info(self):
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.size, "max_bytes": self.max_bytes}
+
+
+class SPARQLService:
+    """Answers queries over loaded repositories, with prepared-query and result caches."""
+
+    def __init__(self, repositories, cache_bytes=64 * 1024 * 1024):
+        self.repositories = {r.name: r for r in repositories}
+        self.cache = ResultCache(cache_bytes)
+        self.stats = LatencyStats()
+        self.prepared = OrderedDict()
+        self.parse_lock = threading.Lock()
+
+    def _prepare(self, query):
+        with self.parse_lock:
+            prepared = self.prepared.get(query)
+            if prepared is not None:
+                self.prepared.move_to_end(query)
+                return prepared
+            try:
+                prepared = prepareQuery(query)
+            except Exception as e:      # pyparsing ParseException, bad prefixes, ...
+                raise QueryError(f"MALFORMED QUERY: {e}") from None
+            self.prepared[query] = prepared
+            if len(self.prepared) > PREPARED_QUERIES:
+                self.prepared.popitem(last=False)
+            return prepared
+
+    def execute(self, name, query, accept=None):
+        """
+        Answer one query.
+
+        Returns:
+            (media type, body bytes, True if served from the result cache)
+
+        Raises:
+            KeyError for an unknown repository, QueryError for a bad query
+        """
+        repository = self.repositories[name]
+        prepared = self._prepare(query)
+        kind = prepared.algebra.name
+        if kind in ("SelectQuery", "AskQuery"):
+            media, fmt = negotiate(accept, RESULT_FORMATS, "application/sparql-results+json")
+            if kind == "AskQuery" and fmt in ("csv", "tsv"):
+                media, fmt = "application/sparql-results+json", "json"
+        else:
+            media, fmt = negotiate(accept, GRAPH_FORMATS, "text/turtle")
+
+        key = (name, query, fmt)
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry[0], entry[1], True
+
+        result = repository.graph.query(prepared)
+        if fmt == "tsv":
+            body = serialize_tsv(result)
+        elif fmt == "json" and kind == "SelectQuery":
+            body = serialize_select_json(result)
+        else:
+            body = result.serialize(format=fmt, encoding="utf-8")
+        self.cache.put(key, media, body)
+        return media, body, False
+
+    def repository_list(self):
+        """The repositories as SPARQL JSON results, as RDF4J lists them."""
+        bindings = [{"id": {"type": "literal", "value": r.name},
+                     "title": {"type": "literal", "value": f"{r.path.name} ({r.reasoner})"},
+                     "readable": {"type": "literal", "value": "true"},
+                     "writable": {"type": "literal", "value": "false"}}
+                    for r in self.repositories.values()]
+        return {"head": {"vars": ["id", "title", "readable", "writable"]},
+                "results": {"bindings": bindings}}
+
+
+# ----------------------------------------------------------------------
+# HTTP
+# ----------------------------------------------------------------------
+
+class SPARQLHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "OntologySPARQL/1.0"
+    timeout = IDLE_TIMEOUT
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def parse_request(self):
+        # Called as soon as the request line has been read
+        self.received = time.perf_counter()
+        return super().parse_request()
+
+    def _send(self, status, media, body):
+        self.send_response(status)
+        self.send_header("Content-Type", f"{media}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_json(self, status, data):
+        self._send(status, "application/json", json.dumps(data, indent=2).encode())
+
+    def _error(self, status, message):
+        self._send(status, "text/plain", (message + "\n").encode())
+
+    def _answer(self, path, query):
+        service = self.server.service
+        hit = error = False
+        try:
+            if not path.startswith("/repositories/"):
+                error = True
+                return self._error(404, f"no such resource: {path}")
+            name = path[len("/repositories/"):].strip("/")
+            if name not in service.repositories:
+                error = True
+                return self._error(404, f"unknown repository: {name}")
+            if not query:
+                error = True
+                return self._error(400, "missing query parameter")
+            try:
+                media, body, hit = self.server.pool.submit(
+                    service.execute, name, query, self.headers.get("Accept")).result()
+            except QueryError as e:
+                error = True
+                return self._error(400, str(e))
+            except Exception as e:
+                error = True
+                return self._error(500, f"query evaluation failed: {e}")
+            self._send(200, media, body)
+        finally:
+            service.stats.record(time.perf_counter() - self.received, hit, error)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/stats":
+            service = self.server.service
+            return self._send_json(200, {**service.stats.summary(), "cache": service.cache.info()})
+        if url.path.rstrip("/") == "/repositories":
+            return self._send_json(200, self.server.service.repository_list())
+        params = parse_qs(url.query)
+        if "update" in params:
+            return self._error(403, "repositories are read-only")
+        self._answer(url.path, params.get("query", [None])[0])
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8")
+        media = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if media == "application/sparql-query":
+            query = body
+        elif media == "application/x-www-form-urlencoded":
+            params = parse_qs(body)
+            if "update" in params:
+                return self._error(403, "repositories are read-only")
+            query = params.get("query", [None])[0]
+        elif media == "application/sparql-update":
+            return self._error(403, "repositories are read-only")
+        else:
+            return self._error(415, f"unsupported content type: {media or '(none)'}")
+        self._answer(url.path, query)
+
+
+class PooledHTTPServer(ThreadingHTTPServer):
+    """Thread per connection for the HTTP exchange; queries run on a fixed pool of workers."""
+
+    def __init__(self, address, service, workers=8, verbose=False):
+        super().__init__(address, SPARQLHandler)
+        self.service = service
+        self.verbose = verbose
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="sparql")
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def serve(repositories, host="127.0.0.1", port=7200, workers=8, cache_bytes=64 * 1024 * 1024,
+          verbose=False):
+    """A PooledHTTPServer for the given repositories (call serve_forever() on it)."""
+    service = SPARQLService(repositories, cache_bytes)
+    return PooledHTTPServer((host, port), service, workers, verbose)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve pre-loaded, pre-reasoned ontologies over SPARQL")
+    parser.add_argument("repositories", nargs="*", metavar="NAME=FILE",
+                        help="repositories to serve (default: diet, computers, food_safety, food)")
+    parser.add_argument("--reasoner", choices=REASONERS, default="owlrl",
+                        help="closure materialized for NAME=FILE repositories (default: %(default)s)")
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=7200, help="port (default: %(default)s, as GraphDB)")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="threads evaluating queries (default: %(default)s)")
+    parser.add_argument("--cache-mb", type=float, default=64, help="result cache size (default: %(default)s)")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    specs = {}
+    for spec in args.repositories:
+        name, sep, path = spec.partition("=")
+        if not sep or not name or not path:
+            parser.error(f"expected NAME=FILE, got {spec!r}")
+        specs[name] = (Path(path), args.reasoner)
+    specs = specs or DEFAULT_REPOSITORIES
+
+    print("Loading repositories...")
+    repositories = []
+    for name, (path, reasoner) in specs.items():
+        repository = load_repository(name, path, reasoner)
+        print(f"  {repository.describe()}")
+        repositories.append(repository)
+
+    server = serve(repositories, args.host, args.port, args.workers,
+                   int(args.cache_mb * 1024 * 1024), args.verbose)
+    print(f"\nServing on http://{args.host}:{args.port}/repositories/NAME "
+          f"({args.workers} workers; statistics at /stats). Ctrl-C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n{server.service.stats.describe()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Streaming SPARQL Result Iteration
+
+list(graph.query(q)) holds every row in memory before the first one is
+printed, and even iterating an rdflib Result keeps a copy of each row it has
+produced. For a compatibility matrix over a large population that means
+millions of rows in memory.
+
+stream_rows() evaluates the query algebra directly and yields rows lazily:
+
+- offset / limit select a page without materializing the earlier rows
+- first_row_timeout raises FirstRowTimeout if evaluation has not produced a
+  row (after the offset) in time, including the sort of an ORDER BY;
+  evaluation runs in a worker thread behind a bounded queue, and the
+  worker stops at its next triple lookup once the caller times out or
+  stops iterating
+- write_rows() prints each row as soon as it arrives
+
+Peak memory is flat for queries without ORDER BY / DISTINCT / GROUP BY;
+those operators need their own buffer inside rdflib, but the rows are
+still never copied into a result list.
+
+Usage:
+    for row in stream_rows(g, query_text, limit=100):
+        print(row.foodName)
+"""
+
+import itertools
+import queue
+import sys
+import threading
+import time
+
+from rdflib import ConjunctiveGraph, Graph, Variable
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.evaluate import evalQuery
+from rdflib.query import ResultRow
+
+_DONE = object()
+
+
+class FirstRowTimeout(TimeoutError):
+    """The query did not produce its first row within the budget."""
+
+
+class _Cancelled(Exception):
+    """Raised inside evaluation to stop an abandoned worker thread."""
+
+
+class _CancellableGraph(Graph):
+    """The same store and triples as graph; lookups stop once cancelled is set."""
+
+    def __init__(self, graph, cancelled):
+        super().__init__(store=graph.store, identifier=graph.identifier,
+                         namespace_manager=graph.namespace_manager)
+        self.cancelled = cancelled
+
+    def triples(self, pattern):
+        for triple in super().triples(pattern):
+            if self.cancelled.is_set():
+                raise _Cancelled()
+            yield triple
+
+
+def _prepare(query):
+    return prepareQuery(query) if isinstance(query, str) else query
+
+
+def _evaluate(graph, query, init_bindings):
+    init = {Variable(str(k)): v for k, v in (init_bindings or {}).items()}
+    result = evalQuery(graph, query, init)
+    if result.get("type_") != "SELECT":
+        raise ValueError("stream_rows() only supports SELECT queries")
+    return result["bindings"], result["vars_"]
+
+
+def _page(bindings, offset, limit):
+    bindings = (b for b in bindings if b)
+    stop = offset + limit if limit is not None else None
+    return itertools.islice(bindings, offset, stop)
+
+
+def _rows(graph, query, init_bindings, offset, limit):
+    """Evaluate on the first next(), so a worker thread also runs evalQuery."""
+    bindings, variables = _evaluate(graph, query, init_bindings)
+    for b in _page(bindings, offset, limit):
+        yield ResultRow(b, variables)
+
+
+def _threaded(rows, cancelled, first_row_timeout, buffer_size):
+    """Run the row generator in a worker thread behind a bounded queue."""
+    buffer = queue.Queue(maxsize=buffer_size)
+
+    def produce():
+        try:
+            for row in rows:
+                while not cancelled.is_set():
+                    try:
+                        buffer.put(row, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if cancelled.is_set():
+                    return
+            buffer.put(_DONE)
+        except _Cancelled:
+            return
+        except BaseException as e:  # re-raised in the consumer
+            buffer.put(e)
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        try:
+            item = buffer.get(timeout=first_row_timeout)
+        except queue.Empty:
+            raise FirstRowTimeout(
+                f"no row within {first_row_timeout:.3f}s") from None
+        while item is not _DONE:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+            item = buffer.get()
+    finally:
+        cancelled.set()
+
+
+def stream_rows(graph, query, init_bindings=None, offset=0, limit=None,
+                first_row_timeout=None, buffer_size=256):
+    """
+    Yield SELECT result rows lazily.
+
+    Args:
+        graph: rdflib Graph
+        query: query text or a prepared query (prepareQuery / QueryRegistry)
+        init_bindings: variable name -> RDF term
+        offset, limit: page of rows to return (like OFFSET / LIMIT)
+        first_row_timeout: seconds to wait for the first row of the page, or None
+        buffer_size: rows buffered between the worker thread and the caller
+
+    Yields:
+        rdflib ResultRow objects (row.var and row[var] both work)
+    """
+    query = _prepare(query)
+    if first_row_timeout is None:
+        yield from _rows(graph, query, init_bindings, offset, limit)
+        return
+
+    cancelled = threading.Event()
+    if not isinstance(graph, ConjunctiveGraph):
+        # Datasets are evaluated as they are and stop only between rows
+        graph = _CancellableGraph(graph, cancelled)
+    # evalQuery itself runs in the worker: ORDER BY sorts every row before
+    # producing one, and that sort counts against the budget. Rows skipped
+    # for the offset are consumed there too, so the budget runs until the
+    # first row the caller actually gets
+    yield from _threaded(_rows(graph, query, init_bindings, offset, limit),
+                         cancelled, first_row_timeout, buffer_size)
+
+
+def pages(graph, query, page_size, init_bindings=None, **kwargs):
+    """Yield lists of at most page_size rows, one page at a time."""
+    rows = stream_rows(graph, query, init_bindings, **kwargs)
+    while True:
+        page = list(itertools.islice(rows, page_size))
+        if not page:
+            return
+        yield page
+
+
+def write_rows(rows, out=None, fmt="text", start=1):
+    """
+    Write rows as they arrive and return (count, seconds to first row).
+
+    fmt "text" prints "  n. var: value, ..." lines; "tsv" prints a header
+    followed by tab-separated values.
+    """
+    out = out or sys.stdout
+    started = time.perf_counter()
+    first_row = None
+    count = 0
+    for count, row in enumerate(rows, start):
+        if first_row is None:
+            first_row = time.perf_counter() - started
+            if fmt == "tsv":
+                out.write("\t".join(str(v) for v in row.labels) + "\n")
+        if fmt == "tsv":
+            out.write("\t".join("" if v is None else str(v) for v in row) + "\n")
+        else:
+            parts = [f"{var}: {row[var]}" for var in row.labels]
+            out.write(f"  {count}. {', '.join(parts)}\n")
+        out.flush()
+    return count - start + 1 if first_row is not None else 0, first_row
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Per-Phase Timing and Counters
+
+The demo scripts print banners but no numbers. Wrapping each phase in a span
+records where the time goes:
+
+    with span("parse", graph=g, file="diet.ttl"):
+        g.parse("diet.ttl")
+
+    with span("query", name="query_alice.sparql") as s:
+        rows = list(g.query(text))
+        s.rows = len(rows)
+
+Each span records wall and CPU time, the process's resident memory when it
+starts and ends and at its peak, the graph size before and after (if a graph
+is given), rows returned (if set) and any extra attributes. Spans nest; each
+one knows its parent. Spans may be opened from several threads (or asyncio
+tasks): each keeps its own stack of open spans, so a span's parent is the
+innermost open span of the same thread.
+
+The peak comes from the kernel's high-water mark (VmHWM), which a span
+resets through /proc/self/clear_refs when it starts. The mark reached so far
+is credited to every open span before each reset, so an inner span does not
+hide a spike from the spans around it. Memory is per process, so spans open
+at the same time in other threads share each other's peaks. Where the mark
+cannot be reset (not Linux, or clear_refs is not writable) peak_rss_kb is
+null.
+
+Tracing is off unless enabled, and a disabled span() is a shared no-op
+object. Enable it with an environment variable or a CLI flag:
+
+    ONTOLOGY_TRACE=trace.json python3 run.py
+    python3 run.py --trace trace.json        (scripts call enable(path))
+
+The JSON trace is written when the process exits (or on write_trace()).
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+ENV_VAR = "ONTOLOGY_TRACE"
+
+_path = None
+_spans = []
+_spans_lock = threading.Lock()
+_stack = contextvars.ContextVar("trace_stack", default=())   # open spans, innermost last
+_started = None
+_open = set()                   # open spans of every thread, for peak RSS
+_peak_lock = threading.Lock()
+_peak_resettable = True
+
+
+def _rss_kb():
+    """Current resident set size (Linux /proc), or None where it is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def _hwm_kb():
+    """Peak resident set size since the last reset (VmHWM), or None."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def _reset_hwm():
+    """Restart VmHWM at the current RSS; False where that is not possible."""
+    global _peak_resettable
+    if _peak_resettable:
+        try:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+        except OSError:
+            _peak_resettable = False
+    return _peak_resettable
+
+
+def _credit_peak():
+    """Raise the peak of every open span to the high-water mark reached so far."""
+    hwm = _hwm_kb()
+    if hwm is not None:
+        for s in _open:
+            if s.peak is not None:
+                s.peak = max(s.peak, hwm)
+
+
+class _NoSpan:
+    """Returned by span() while tracing is off: every operation is a no-op."""
+
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Span:
+    """One timed phase; becomes a dict in the trace."""
+
+    def __init__(self, name, graph=None, **attrs):
+        self.name = name
+        self.graph = graph
+        self.attrs = attrs
+        self.rows = None
+
+    def set(self, **attrs):
+        """Attach attributes discovered while the span runs."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = _stack.get()
+        self.parent = stack[-1].id if stack else None
+        with _spans_lock:
+            self.id = len(_spans)
+            _spans.append(None)     # reserve the slot so ids follow start order
+        self.token = _stack.set(stack + (self,))
+        self.triples_before = len(self.graph) if self.graph is not None else None
+        self.rss_start = _rss_kb()
+        with _peak_lock:
+            _credit_peak()
+            self.peak = self.rss_start if _reset_hwm() else None
+            _open.add(self)
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.start
+        cpu = time.process_time() - self.cpu_start
+        _stack.reset(self.token)
+        with _peak_lock:
+            _credit_peak()
+            _open.discard(self)
+        record = {
+            "id": self.id,
+            "parent": self.parent,
+            "name": self.name,
+            "start": round(self.start - _started, 6),
+            "wall_seconds": round(wall, 6),
+            # process_time() counts every thread of the process
+            "cpu_seconds": round(cpu, 6),
+            "rss_start_kb": self.rss_start,
+            "rss_end_kb": _rss_kb(),
+            "peak_rss_kb": self.peak,
+        }
+        if self.graph is not None:
+            record["triples_before"] = self.triples_before
+            record["triples_after"] = len(self.graph)
+        if self.rows is not None:
+            record["rows"] = self.rows
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if self.attrs:
+            record["attrs"] = {k: str(v) if not isinstance(v, (int, float, bool)) else v
+                               for k, v in self.attrs.items()}
+        _spans[self.id] = record
+        return False
+
+
+def enabled():
+    return _path is not None
+
+
+def enable(path):
+    """Turn tracing on; the trace is written to path ("-" for stderr) at exit."""
+    global _path, _started
+    if _path is None:
+        atexit.register(write_trace)
+        _started = time.perf_counter()
+    _path = path
+
+
+def span(name, graph=None, **attrs):
+    """Context manager timing one phase (a no-op unless tracing is enabled)."""
+    if _path is None:
+        return _NO_SPAN
+    return Span(name, graph, **attrs)
+
+
+def write_trace():
+    """Write the collected spans as JSON."""
+    if _path is None:
+        return
+    trace = {
+        "argv": sys.argv,
+        "pid": os.getpid(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "total_seconds": round(time.perf_counter() - _started, 6),
+        "spans": [s for s in list(_spans) if s is not None],
+    }
+    if _path == "-":
+        json.dump(trace, sys.stderr, indent=2)
+        sys.stderr.write("\n")
+    else:
+        with open(_path, "w") as f:
+            json.dump(trace, f, indent=2)
+
+
+def enable_from_env():
+    """Enable tracing if ONTOLOGY_TRACE names an output file."""
+    path = os.environ.get(ENV_VAR)
+    if path:
+        enable(path)
+
+
+enable_from_env()
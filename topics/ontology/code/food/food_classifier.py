@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Rule-Compiled Food Safety Classifier
+
+reason.py only needs two kinds of inferences from food_safety.ttl:
+1. Subclass typing (a Mushroom is a Food, an UnsafeFood is a Food, ...)
+2. "Food AND (isPoisonous = true)" → UnsafeFood (same for isSmelly)
+
+Running the complete OWL-RL rule set for that adds hundreds of triples
+(owl:sameAs, datatype typing, ...). This module reads only the relevant
+axioms from the ontology and compiles them into a small forward-chaining
+program that classifies every instance in one pass over the data:
+
+    rules = compile_rules(g)
+    inferred = classify(g, rules)   # adds only rdf:type triples
+
+check_against_owlrl() runs full OWL-RL on a copy of the same input and
+compares the resulting UnsafeFood / SafeFood sets.
+"""
+
+from dataclasses import dataclass
+
+from rdflib import Graph, BNode, Namespace
+from rdflib.namespace import OWL, RDF, RDFS
+from owlrl import DeductiveClosure, OWLRL_Semantics
+
+FOOD = Namespace("http://example.org/food#")
+
+
+@dataclass(frozen=True)
+class Rule:
+    """IF x has all `classes` and all `values` (p, v) THEN x rdf:type `target`."""
+    classes: frozenset
+    values: frozenset
+    target: object
+
+
+@dataclass
+class CompiledRules:
+    superclasses: dict      # class -> set of all (transitive) superclasses
+    domains: dict           # property -> set of classes
+    ranges: dict            # object property -> set of classes
+    rules: list             # [Rule]
+
+
+def _superclass_closure(direct):
+    closure = {}
+
+    def visit(c, seen):
+        for d in direct.get(c, ()):
+            if d not in seen:
+                seen.add(d)
+                visit(d, seen)
+        return seen
+
+    for c in direct:
+        closure[c] = visit(c, set())
+    return closure
+
+
+def compile_rules(g):
+    """
+    Compile the classification axioms of an ontology graph.
+
+    Supported: rdfs:subClassOf between named classes, rdfs:domain/range,
+    and anonymous owl:intersectionOf classes made of named classes and
+    owl:hasValue restrictions that are rdfs:subClassOf a named class.
+
+    Raises:
+        ValueError: if an intersection uses a construct not listed above
+    """
+    direct = {}
+    rules = []
+    for c1, c2 in g.subject_objects(RDFS.subClassOf):
+        if isinstance(c1, BNode):
+            head = g.value(c1, OWL.intersectionOf)
+            if head is None:
+                raise ValueError(f"unsupported anonymous class {c1}")
+            classes, values = set(), set()
+            for member in g.items(head):
+                if not isinstance(member, BNode):
+                    classes.add(member)
+                    continue
+                prop = g.value(member, OWL.onProperty)
+                value = g.value(member, OWL.hasValue)
+                if prop is None or value is None:
+                    raise ValueError(f"unsupported restriction {member}")
+                values.add((prop, value))
+            rules.append(Rule(frozenset(classes), frozenset(values), c2))
+        elif not isinstance(c2, BNode):
+            direct.setdefault(c1, set()).add(c2)
+
+    domains, ranges = {}, {}
+    for p, c in g.subject_objects(RDFS.domain):
+        domains.setdefault(p, set()).add(c)
+    for p, c in g.subject_objects(RDFS.range):
+        if (p, RDF.type, OWL.ObjectProperty) in g:
+            ranges.setdefault(p, set()).add(c)
+
+    return CompiledRules(_superclass_closure(direct), domains, ranges, rules)
+
+
+def _with_superclasses(types, compiled):
+    expanded = set(types)
+    for t in types:
+        expanded |= compiled.superclasses.get(t, set())
+    return expanded
+
+
+def classify(g, compiled=None):
+    """
+    Add the inferred rdf:type triples to g and return them.
+
+    Every subject is visited once: its asserted types, domain/range typing
+    and the compiled rules are applied until its type set stops growing.
+    """
+    if compiled is None:
+        compiled = compile_rules(g)
+
+    types = {}
+    values = {}
+    for s, p, o in g:
+        if isinstance(s, BNode):
+            continue
+        if p == RDF.type:
+            types.setdefault(s, set()).add(o)
+        else:
+            values.setdefault(s, set()).add((p, o))
+            for c in compiled.domains.get(p, ()):
+                types.setdefault(s, set()).add(c)
+            for c in compiled.ranges.get(p, ()):
+                types.setdefault(o, set()).add(c)
+
+    inferred = []
+    for s, asserted in types.items():
+        # Only instances of user classes are classified, not the schema itself
+        if all(str(t).startswith((str(OWL), str(RDFS))) for t in asserted):
+            continue
+        current = _with_superclasses(asserted, compiled)
+        props = values.get(s, set())
+        changed = True
+        while changed:
+            changed = False
+            for rule in compiled.rules:
+                if rule.target in current:
+                    continue
+                if rule.classes <= current and rule.values <= props:
+                    current |= _with_superclasses({rule.target}, compiled)
+                    changed = True
+        for t in current:
+            if (s, RDF.type, t) not in g:
+                inferred.append((s, RDF.type, t))
+
+    for t in inferred:
+        g.add(t)
+    return inferred
+
+
+def food_status(g):
+    """Return (unsafe, safe) sets of food instances in a classified graph."""
+    foods = set(g.subjects(RDF.type, FOOD.Food))
+    unsafe = set(g.subjects(RDF.type, FOOD.UnsafeFood))
+    return unsafe, foods - unsafe
+
+
+def check_against_owlrl(g):
+    """
+    Classify copies of g with the compiled rules and with full OWL-RL.
+
+    Returns:
+        (matches, compiled_status, owlrl_status) with (unsafe, safe) tuples
+    """
+    compiled_graph = Graph()
+    owlrl_graph = Graph()
+    for t in g:
+        compiled_graph.add(t)
+        owlrl_graph.add(t)
+
+    classify(compiled_graph)
+    DeductiveClosure(OWLRL_Semantics).expand(owlrl_graph)
+
+    compiled_status = food_status(compiled_graph)
+    owlrl_status = food_status(owlrl_graph)
+    return compiled_status == owlrl_status, compiled_status, owlrl_status
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Parsed-Graph Snapshot Cache
+
+Parsing a large Turtle or RDF/XML file is usually the slowest part of
+starting a reasoning demo. This module keeps a pickled snapshot of the
+parsed rdflib Graph (store + indexes) next to the source file, in a
+.graph_cache directory beside it (wherever the script is started from):
+
+1. The cache key is the SHA-256 of the file content plus the parse format
+2. On a hit the snapshot is unpickled instead of re-parsing the source
+3. When the file changes, the key changes and the snapshot is rebuilt
+4. Snapshot names carry a hash of the source's absolute path, so sources
+   with the same base name in different directories share one cache_dir
+
+Usage:
+    from graph_cache import load_graph
+    g, stats = load_graph("food_safety.ttl", "turtle")
+    print(stats.describe())
+"""
+
+import hashlib
+import os
+import pickle
+import re
+import time
+from dataclasses import dataclass
+
+import rdflib
+from rdflib import Graph
+
+# Created in the source file's directory unless load_graph() gets cache_dir
+DEFAULT_CACHE_DIR = ".graph_cache"
+
+# Bump when the snapshot layout changes so old files are ignored
+SNAPSHOT_VERSION = 1
+
+
+@dataclass
+class CacheStats:
+    """What happened during one load_graph() call."""
+    filename: str
+    key: str
+    hit: bool
+    load_seconds: float
+    parse_seconds: float
+
+    @property
+    def saved_seconds(self):
+        """Parse time avoided by loading the snapshot (0 on a miss)."""
+        if not self.hit:
+            return 0.0
+        return max(self.parse_seconds - self.load_seconds, 0.0)
+
+    def describe(self):
+        if self.hit:
+            return (f"snapshot hit ({self.key[:12]}): loaded in "
+                    f"{self.load_seconds:.3f}s, saved {self.saved_seconds:.3f}s "
+                    f"vs. parsing ({self.parse_seconds:.3f}s)")
+        return (f"snapshot miss ({self.key[:12]}): parsed in "
+                f"{self.parse_seconds:.3f}s, snapshot written")
+
+
+def snapshot_key(filename, format_type):
+    """Hash the file content together with its format and rdflib version."""
+    digest = hashlib.sha256()
+    digest.update(f"v{SNAPSHOT_VERSION}|{rdflib.__version__}|{format_type}|".encode())
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_id(filename):
+    """Base name plus a hash of the absolute path: one per source file."""
+    source = os.path.abspath(filename)
+    digest = hashlib.sha256(source.encode("utf-8", "surrogateescape")).hexdigest()
+    return f"{os.path.basename(source)}.{digest[:12]}"
+
+
+def _snapshot_path(cache_dir, filename, key):
+    return os.path.join(cache_dir, f"{_source_id(filename)}.{key[:16]}.pickle")
+
+
+def _remove_stale(cache_dir, filename, keep):
+    """Drop snapshots of older versions of the same source file."""
+    pattern = re.compile(re.escape(_source_id(filename)) + r"\.[0-9a-f]{16}\.pickle")
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if pattern.fullmatch(name) and path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def load_graph(filename, format_type, cache_dir=None):
+    """
+    Load a graph, using a parsed snapshot when the source is unchanged.
+
+    Args:
+        filename: RDF source file
+        format_type: rdflib parser name ("turtle", "xml", "nt", ...)
+        cache_dir: directory holding the snapshots (default: DEFAULT_CACHE_DIR
+            in the directory of filename)
+
+    Returns:
+        (Graph, CacheStats)
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(filename)),
+                                 DEFAULT_CACHE_DIR)
+    key = snapshot_key(filename, format_type)
+    path = _snapshot_path(cache_dir, filename, key)
+
+    if os.path.exists(path):
+        start = time.perf_counter()
+        try:
+            with open(path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            snapshot = None
+        load_seconds = time.perf_counter() - start
+        if snapshot is not None and snapshot.get("key") == key:
+            stats = CacheStats(filename, key, True, load_seconds,
+                               snapshot["parse_seconds"])
+            return snapshot["graph"], stats
+
+    start = time.perf_counter()
+    g = Graph()
+    g.parse(filename, format=format_type)
+    parse_seconds = time.perf_counter() - start
+
+    os.makedirs(cache_dir, exist_ok=True)
+    snapshot = {"key": key, "parse_seconds": parse_seconds, "graph": g}
+    # Write to a temp file first so a crash never leaves a half snapshot
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    _remove_stale(cache_dir, filename, keep=path)
+
+    return g, CacheStats(filename, key, False, parse_seconds, parse_seconds)
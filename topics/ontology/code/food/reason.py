@@ -6,25 +6,60 @@ This script demonstrates OWL reasoning to infer that:
 2. Eating smelly meat is unsafe (because meat is smelly)
 """
 
+import argparse
+import sys
+from pathlib import Path
+
 from rdflib import Graph, Namespace, RDF, RDFS, OWL
 from owlrl import DeductiveClosure, OWLRL_Semantics
 
-def load_and_reason(filename, format_type):
-    """Load ontology and perform reasoning"""
+from graph_cache import load_graph
+from food_classifier import classify, check_against_owlrl
+
+# Shared helpers live in topics/ontology/code/common
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.ingest import ingest
+from common import trace
+from common.trace import span
+
+def load_and_reason(filename, format_type, use_cache=False, reasoner="owlrl",
+                    check=False, graph=None):
+    """Load ontology (unless an already parsed graph is given) and perform reasoning"""
     print(f"\n{'='*70}")
     print(f"Processing: {filename}")
     print(f"Format: {format_type}")
     print(f"{'='*70}\n")
     
     # Create a graph and load the ontology
-    g = Graph()
-    g.parse(filename, format=format_type)
+    if graph is not None:
+        g = graph
+    elif use_cache:
+        with span("parse", file=filename, cache=True) as timing:
+            g, stats = load_graph(filename, format_type)
+            timing.set(cache_hit=stats.hit, triples=len(g))
+        print(f"Cache: {stats.describe()}")
+    else:
+        g = Graph()
+        with span("parse", graph=g, file=filename):
+            g.parse(filename, format=format_type)
     
     print(f"Original triples: {len(g)}")
     
-    # Perform OWL-RL reasoning
-    print("\nPerforming OWL-RL reasoning...")
-    DeductiveClosure(OWLRL_Semantics).expand(g)
+    if check:
+        matches, _, _ = check_against_owlrl(g)
+        status = "MATCHES" if matches else "DIFFERS FROM"
+        print(f"Check: compiled classifier {status} full OWL-RL (UnsafeFood/SafeFood)")
+    
+    if reasoner == "compiled":
+        # Only the food-safety rules, compiled from the ontology
+        print("\nPerforming compiled food-safety classification...")
+        with span("reason", graph=g, file=filename, reasoner=reasoner):
+            classify(g)
+    else:
+        # Perform OWL-RL reasoning
+        print("\nPerforming OWL-RL reasoning...")
+        with span("reason", graph=g, file=filename, reasoner=reasoner):
+            DeductiveClosure(OWLRL_Semantics).expand(g)
     
     print(f"After reasoning: {len(g)} triples")
     
@@ -97,6 +132,22 @@ def load_and_reason(filename, format_type):
     print()
 
 def main():
+    parser = argparse.ArgumentParser(description="Food safety OWL reasoning demo")
+    parser.add_argument("--cache", action="store_true",
+                        help="load parsed graph snapshots from .graph_cache/ next to the sources")
+    parser.add_argument("--reasoner", choices=["owlrl", "compiled"], default="owlrl",
+                        help="full OWL-RL closure or the compiled food-safety rules")
+    parser.add_argument("--check", action="store_true",
+                        help="compare compiled classification with full OWL-RL")
+    parser.add_argument("--parallel", action="store_true",
+                        help="parse both files up front in a process pool")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write per-phase timings as JSON (or set ONTOLOGY_TRACE)")
+    args = parser.parse_args()
+    
+    if args.trace:
+        trace.enable(args.trace)
+    
     print("\n" + "="*70)
     print("FOOD SAFETY ONTOLOGY - OWL REASONING DEMONSTRATION")
     print("="*70)
@@ -105,11 +156,29 @@ def main():
     print("  2. Eating smelly meat is UNSAFE (because it's smelly)")
     print()
     
+    files = ["food_safety.ttl", "food_safety.rdf"]
+    graphs = {}
+    if args.parallel:
+        with span("ingest", files=len(files)) as timing:
+            dataset, stats = ingest(files, named_graphs=True)
+            timing.set(triples=sum(s.triples for s in stats))
+        print("Parallel ingest:")
+        for s in stats:
+            print(f"  {s.describe()}")
+        for filename in files:
+            named = dataset.graph(Path(filename).resolve().as_uri())
+            graphs[filename] = Graph()
+            graphs[filename] += named
+    
     # Process Turtle format
-    load_and_reason("food_safety.ttl", "turtle")
+    load_and_reason("food_safety.ttl", "turtle", use_cache=args.cache,
+                    reasoner=args.reasoner, check=args.check,
+                    graph=graphs.get("food_safety.ttl"))
     
     # Process RDF/XML format
-    load_and_reason("food_safety.rdf", "xml")
+    load_and_reason("food_safety.rdf", "xml", use_cache=args.cache,
+                    reasoner=args.reasoner, check=args.check,
+                    graph=graphs.get("food_safety.rdf"))
     
     print("\n" + "="*70)
     print("SUMMARY")
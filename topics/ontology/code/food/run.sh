@@ -79,6 +79,9 @@ echo "Files created:"
 echo "  - food_safety.ttl    : Ontology in Turtle format"
 echo "  - food_safety.rdf    : Ontology in RDF/XML format"
 echo "  - reason.py          : Python reasoning script"
+echo "  - graph_cache.py     : Parsed-graph snapshot cache (reason.py --cache)"
+echo "  - food_classifier.py : Compiled food-safety rules (reason.py --reasoner compiled)"
+echo "  - ../common/ingest.py: Parallel multi-file parsing (reason.py --parallel)"
 echo "  - run.sh             : This runner script"
 echo "  - venv/              : Virtual environment (auto-created)"
 echo ""
@@ -5,10 +5,17 @@ Visual demonstration of OWL reasoning step-by-step
 Shows how the reasoner infers AffordableComputer and GamingComputer
 """
 
-from rdflib import Graph, Namespace
+import sys
+from pathlib import Path
+
+from rdflib import Graph, Literal, Namespace
 from rdflib.namespace import RDF
 from owlrl import DeductiveClosure, OWLRL_Semantics
 
+# Shared helpers live in topics/ontology/code/common
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from common.incremental import IncrementalReasoner
+
 def main():
     print("\n" + "="*80)
     print("Step-by-Step Ontology Reasoning Demo")
@@ -142,6 +149,28 @@ def main():
         print(f"   RAM: {row.ram}GB")
         print(f"   ✓ Affordable (< $1000) AND Gaming (≥16GB + Dedicated GPU)")
     
+    # Add a new laptop without re-running the whole closure
+    print("\n" + "="*80)
+    print("Step 6: Add a new laptop incrementally")
+    print("="*80)
+    print("\nOnly the consequences of the new triples are derived;")
+    print("the rest of the closed graph is left untouched.")
+    
+    reasoner = IncrementalReasoner(g)
+    stats = reasoner.add([
+        (ex.Computer6, RDF.type, ex.Laptop),
+        (ex.Computer6, ex.hasBrand, Literal("Lenovo")),
+        (ex.Computer6, ex.hasModel, Literal("Legion 5")),
+        (ex.Computer6, ex.hasPrice, Literal(979)),
+        (ex.Computer6, ex.hasRAM, Literal(16)),
+        (ex.Computer6, ex.hasGPU, ex.RTX4060),
+    ])
+    print(f"\n✓ {stats.describe()}")
+    print(f"  Graph now has {len(g)} triples")
+    new_types = sorted(str(t).split('#')[-1] for t in g.objects(ex.Computer6, RDF.type)
+                       if str(t).startswith(str(ex)))
+    print(f"  Computer6 is a: {', '.join(new_types)}")
+    
     print("\n" + "="*80)
     print("Summary: The Power of Ontology Reasoning")
     print("="*80)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Query Rewriting for Defined Classes (Backward Chaining)
+
+run.py materializes the whole OWL-RL closure so that a query can simply ask
+for "?computer rdf:type :AffordableComputer". This module answers the same
+question WITHOUT materializing anything: it reads the owl:equivalentClass
+definitions in the ontology and rewrites every "?x rdf:type :DefinedClass"
+pattern into the graph pattern + FILTER that the definition stands for.
+
+    AffordableComputer ≡ Computer ⊓ ∃hasPrice.integer[< 1000]
+
+becomes (for the variable ?computer)
+
+    { SELECT DISTINCT ?computer WHERE {
+        { ?computer rdf:type/rdfs:subClassOf* :AffordableComputer }
+        UNION
+        { ?computer rdf:type/rdfs:subClassOf* :Computer .
+          ?computer :hasPrice ?_rw1 .
+          FILTER(datatype(?_rw1) IN (xsd:integer, xsd:int, ...) && ?_rw1 < 1000) }
+    } }
+
+The datatype test follows owl:onDatatype: xsd:integer and xsd:decimal accept
+the XSD types derived from them, any other datatype only itself.
+
+Plain class patterns such as "?x rdf:type :Computer" are rewritten to
+"?x rdf:type/rdfs:subClassOf* :Computer" so subclass instances are found too.
+A constant subject (":Computer1 a :AffordableComputer") is bound to a fresh
+variable with VALUES and that variable is expanded.
+
+A definition that cannot be compiled (an unsupported class expression or
+facet) is listed in `skipped` and falls back to materialization: at every
+rewrite the OWL-RL closure of a copy of the ontology plus the graph being
+queried is computed, and "?x rdf:type" that class becomes a VALUES block of
+its instances. The queried graph itself is never changed.
+
+The DISTINCT sub-select keeps the "one row per typed instance" semantics of a
+materialized rdf:type triple, even if several values satisfy the restriction.
+
+Usage:
+    rewriter = QueryRewriter(g)
+    results = rewriter.query(g, open("query.sparql").read())
+"""
+
+from itertools import count
+
+from rdflib import BNode, Graph, URIRef, Variable
+from rdflib.namespace import OWL, RDF, RDFS, XSD
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.algebra import BGP, Join, traverse
+from rdflib.plugins.sparql.parserutils import CompValue
+from rdflib.paths import ZeroOrMore
+
+FACET_OPERATORS = {
+    XSD.minInclusive: ">=",
+    XSD.maxInclusive: "<=",
+    XSD.minExclusive: ">",
+    XSD.maxExclusive: "<",
+}
+
+INTEGER_TYPES = [
+    XSD.integer, XSD.nonPositiveInteger, XSD.negativeInteger, XSD.long, XSD.int,
+    XSD.short, XSD.byte, XSD.nonNegativeInteger, XSD.unsignedLong, XSD.unsignedInt,
+    XSD.unsignedShort, XSD.unsignedByte, XSD.positiveInteger,
+]
+
+# owl:onDatatype -> literal datatypes in its value space (default: itself)
+DERIVED_DATATYPES = {
+    XSD.integer: INTEGER_TYPES,
+    XSD.decimal: [XSD.decimal] + INTEGER_TYPES,
+}
+
+TYPE_PATH = f"<{RDF.type}>/<{RDFS.subClassOf}>*"
+TYPE_PATH_ALGEBRA = RDF.type / (RDFS.subClassOf * ZeroOrMore)
+
+
+class QueryRewriter:
+    """Rewrites rdf:type patterns over defined classes into their definitions."""
+
+    def __init__(self, ontology):
+        self.ontology = ontology
+        self.definitions = {}   # class -> list of conditions
+        self.superclasses = set(ontology.objects(None, RDFS.subClassOf))
+        self.skipped = {}       # class -> reason it could not be compiled
+        self._fresh = count(1)
+        self._load_definitions()
+
+    # ------------------------------------------------------------------
+    # Reading the ontology
+    # ------------------------------------------------------------------
+
+    def _load_definitions(self):
+        g = self.ontology
+        for cls, definition in g.subject_objects(OWL.equivalentClass):
+            if not isinstance(cls, URIRef) or not isinstance(definition, BNode):
+                continue
+            try:
+                self.definitions[cls] = self._conditions(definition)
+            except ValueError as e:
+                self.skipped[cls] = str(e)
+
+    def materialize(self, graph=None):
+        """
+        Instances of the skipped classes in the OWL-RL closure of graph.
+
+        Computed on every call, so edits to graph (or to the ontology) are
+        always seen; the closure is built on a copy.
+
+        Returns:
+            dict of skipped class -> sorted list of its instances
+        """
+        if not self.skipped:
+            return {}
+        from owlrl import DeductiveClosure, OWLRL_Semantics
+
+        closure = Graph()
+        closure += self.ontology
+        if graph is not None and graph is not self.ontology:
+            closure += graph
+        DeductiveClosure(OWLRL_Semantics).expand(closure)
+        return {cls: sorted(closure.subjects(RDF.type, cls)) for cls in self.skipped}
+
+    def _conditions(self, node):
+        g = self.ontology
+        head = g.value(node, OWL.intersectionOf)
+        members = list(g.items(head)) if head is not None else [node]
+        conditions = []
+        for member in members:
+            if isinstance(member, URIRef):
+                conditions.append(("class", member))
+                continue
+            prop = g.value(member, OWL.onProperty)
+            if prop is None:
+                raise ValueError(f"unsupported class expression {member}")
+            value = g.value(member, OWL.hasValue)
+            filler = g.value(member, OWL.someValuesFrom)
+            if value is not None:
+                conditions.append(("value", prop, value))
+            elif isinstance(filler, URIRef):
+                conditions.append(("some", prop, filler))
+            elif isinstance(filler, BNode) and g.value(filler, OWL.onDatatype) is not None:
+                facets = []
+                for restriction in g.items(g.value(filler, OWL.withRestrictions)):
+                    for facet, bound in g.predicate_objects(restriction):
+                        if facet not in FACET_OPERATORS:
+                            raise ValueError(f"unsupported facet {facet} on {prop}")
+                        facets.append((FACET_OPERATORS[facet], bound))
+                conditions.append(("range", prop, g.value(filler, OWL.onDatatype), facets))
+            else:
+                raise ValueError(f"unsupported restriction on {prop}")
+        return conditions
+
+    # ------------------------------------------------------------------
+    # Building the expansion
+    # ------------------------------------------------------------------
+
+    def _type_pattern(self, var, cls, depth):
+        """Group pattern text that holds when var is an instance of cls."""
+        if cls not in self.definitions or depth > 8:
+            return f"{var} {TYPE_PATH} {cls.n3()} ."
+        return self.expansion(var, cls, depth + 1)
+
+    def expansion(self, var, cls, depth=0):
+        """SPARQL text equivalent to '?var rdf:type cls' for a defined class."""
+        parts = []
+        for condition in self.definitions[cls]:
+            kind = condition[0]
+            if kind == "class":
+                parts.append(self._type_pattern(var, condition[1], depth))
+            elif kind == "value":
+                _, prop, value = condition
+                parts.append(f"{var} {prop.n3()} {value.n3()} .")
+            elif kind == "some":
+                _, prop, filler = condition
+                v = f"?_rw{next(self._fresh)}"
+                parts.append(f"{var} {prop.n3()} {v} .")
+                if filler != OWL.Thing and not str(filler).startswith(str(XSD)):
+                    parts.append(self._type_pattern(v, filler, depth))
+            else:
+                _, prop, datatype, facets = condition
+                v = f"?_rw{next(self._fresh)}"
+                parts.append(f"{var} {prop.n3()} {v} .")
+                types = DERIVED_DATATYPES.get(datatype, [datatype])
+                tests = [f"datatype({v}) IN ({', '.join(t.n3() for t in types)})"]
+                tests += [f"{v} {op} {bound.n3()}" for op, bound in facets]
+                parts.append(f"FILTER({' && '.join(tests)})")
+        definition = "\n        ".join(parts)
+        return (f"{{ SELECT DISTINCT {var} WHERE {{\n"
+                f"    {{ {var} {TYPE_PATH} {cls.n3()} }}\n"
+                f"    UNION\n"
+                f"    {{ {definition} }}\n"
+                f"}} }}")
+
+    @staticmethod
+    def _values(var, terms):
+        """VALUES block binding var to each of terms."""
+        if not terms:
+            # rdflib cannot evaluate an empty VALUES block, and drops a
+            # constant FILTER(false) while translating the query
+            return f"BIND(<{OWL.Nothing}> AS {var.n3()}) FILTER(1 = 0)"
+        return f"VALUES {var.n3()} {{ {' '.join(term.n3() for term in terms)} }}"
+
+    def _expansion_algebra(self, var, cls, bound=None):
+        expansion = self.expansion(var.n3(), cls)
+        if bound is not None:
+            expansion = f"{self._values(var, [bound])}\n{expansion}"
+        # Project -> ToMultiSet(sub-select), or the join with the VALUES block
+        return prepareQuery(f"SELECT * WHERE {{ {expansion} }}").algebra.p.p
+
+    def _materialized_algebra(self, var, instances, bound=None):
+        if bound is not None:
+            instances = [bound] if bound in instances else []
+        # Project -> pattern
+        return prepareQuery(f"SELECT * WHERE {{ {self._values(var, instances)} }}").algebra.p.p
+
+    # ------------------------------------------------------------------
+    # Rewriting queries
+    # ------------------------------------------------------------------
+
+    def _rewrite_bgp(self, node, materialized):
+        if not (isinstance(node, CompValue) and node.name == "BGP"):
+            return None
+        kept, expansions = [], []
+        rewritten = False
+        for s, p, o in node.triples:
+            if p == RDF.type and (o in self.definitions or o in materialized):
+                # A constant subject is bound to a fresh variable first
+                var, bound = (s, None) if isinstance(s, Variable) else \
+                    (Variable(f"_rw{next(self._fresh)}"), s)
+                if o in self.definitions:
+                    expansions.append(self._expansion_algebra(var, o, bound))
+                else:
+                    expansions.append(self._materialized_algebra(var, materialized[o], bound))
+            elif p == RDF.type and o in self.superclasses:
+                # rdfs:subClassOf entailment, e.g. a :Laptop is a :Computer
+                kept.append((s, TYPE_PATH_ALGEBRA, o))
+                rewritten = True
+            else:
+                kept.append((s, p, o))
+        if not expansions:
+            return BGP(kept) if rewritten else None
+        part = expansions[0]
+        for other in expansions[1:]:
+            part = Join(part, other)
+        if kept:
+            part = Join(part, BGP(kept))
+        return part
+
+    def rewrite(self, query_text, graph=None):
+        """
+        Return a prepared query with every defined-class pattern expanded.
+
+        graph is the data the query will run over (default: the ontology);
+        the instances of skipped classes are taken from its closure.
+        """
+        query = prepareQuery(query_text)
+        materialized = self.materialize(graph)
+        query.algebra = traverse(query.algebra,
+                                 visitPost=lambda node: self._rewrite_bgp(node, materialized))
+        return query
+
+    def query(self, graph, query_text):
+        """Evaluate query_text over the (un-reasoned) graph via rewriting."""
+        return graph.query(self.rewrite(query_text, graph))
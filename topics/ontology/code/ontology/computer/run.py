@@ -9,10 +9,23 @@ Demonstrates the difference between:
 This shows the power of ontology reasoning!
 """
 
+import argparse
+import os
+import sys
+from pathlib import Path
+
 from rdflib import Graph
 from owlrl import DeductiveClosure, OWLRL_Semantics
 
-def run_query(graph, query_file, title):
+from query_rewriter import QueryRewriter
+
+# Shared helpers live in topics/ontology/code/common
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from common.streaming import FirstRowTimeout, stream_rows
+from common import trace
+from common.trace import span
+
+def run_query(graph, query_file, title, rewriter=None, stream=None):
     """Run a SPARQL query and display results."""
     print("\n" + "="*70)
     print(title)
@@ -33,45 +46,134 @@ def run_query(graph, query_file, title):
     print("\nResults:")
     print("-"*70)
     
-    results = list(graph.query(query))
+    with span("query", file=query_file) as timing:
+        if stream is not None:
+            # Rows are printed as they are produced, never collected
+            prepared = rewriter.rewrite(query, graph) if rewriter is not None else query
+            results = stream_rows(graph, prepared, **stream)
+        elif rewriter is not None:
+            results = list(rewriter.query(graph, query))
+        else:
+            results = list(graph.query(query))
+        
+        count = 0
+        try:
+            for count, row in enumerate(results, 1):
+                print(f"\n  {count}. {row.brand} {row.model}")
+                print(f"     Price: ${row.price}")
+                print(f"     RAM:   {row.ram}GB")
+        except FirstRowTimeout as e:
+            print(f"  Query abandoned: {e}")
+        timing.rows = count
     
-    if len(results) == 0:
+    if count == 0:
         print("  No results found.")
-    else:
-        for i, row in enumerate(results, 1):
-            print(f"\n  {i}. {row.brand} {row.model}")
-            print(f"     Price: ${row.price}")
-            print(f"     RAM:   {row.ram}GB")
     
-    print(f"\n  Total: {len(results)} computer(s) found")
-    return len(results)
+    print(f"\n  Total: {count} computer(s) found")
+    return count
+
+def closure_is_fresh(path, source="computers.ttl"):
+    """True if the closure file exists, is newer than the ontology and readable."""
+    if not (os.path.exists(path)
+            and os.path.getmtime(path) >= os.path.getmtime(source)):
+        return False
+    from common.closure_file import ClosureFile, ClosureFileError
+    try:
+        ClosureFile(path).close()   # written by an older format version?
+    except ClosureFileError:
+        return False
+    return True
 
 def main():
+    parser = argparse.ArgumentParser(description="Ontology reasoning demo")
+    parser.add_argument("--engine", choices=["materialize", "rewrite"],
+                        default="materialize",
+                        help="materialize the OWL-RL closure, or rewrite queries "
+                             "over defined classes at query time")
+    parser.add_argument("--stream", action="store_true",
+                        help="print query rows as they are produced")
+    parser.add_argument("--offset", type=int, default=0,
+                        help="with --stream: skip this many rows")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="with --stream: print at most this many rows")
+    parser.add_argument("--first-row-timeout", type=float, default=None,
+                        help="with --stream: give up if no row arrives in time (seconds)")
+    parser.add_argument("--store", choices=["memory", "array"], default="memory",
+                        help="rdflib's default store, or the compact array-backed store")
+    parser.add_argument("--closure", metavar="FILE",
+                        help="reuse a memory-mapped closure file (written on first run)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write per-phase timings as JSON (or set ONTOLOGY_TRACE)")
+    args = parser.parse_args()
+    
+    if args.trace:
+        trace.enable(args.trace)
+    
+    stream = None
+    if args.stream:
+        stream = {"offset": args.offset, "limit": args.limit,
+                  "first_row_timeout": args.first_row_timeout}
+    
     print("\n" + "="*70)
     print("Ontology Reasoning Demo: Find Affordable Gaming Computers")
     print("="*70)
     
-    # Load ontology
-    print("\n1. Loading ontology...")
-    g = Graph()
-    g.parse("computers.ttl", format="turtle")
-    print(f"   ✓ Loaded {len(g)} triples")
-    
-    # Apply OWL reasoning
-    print("\n2. Applying OWL reasoning...")
-    print("   This infers which computers are AffordableComputer and GamingComputer")
-    print("   based on the OWL class definitions...")
-    
-    DeductiveClosure(OWLRL_Semantics).expand(g)
-    print(f"   ✓ After reasoning: {len(g)} triples (inferred new facts!)")
+    rewriter = None
+    if args.closure and args.engine == "materialize" and closure_is_fresh(args.closure):
+        # The reasoned graph was exported earlier: map it instead of re-deriving it
+        from common.closure_file import open_graph
+        print("\n1-2. Opening materialized closure...")
+        with span("open_closure", file=args.closure):
+            g = open_graph(args.closure)
+        print(f"   ✓ Mapped {len(g)} triples from {args.closure} (no parsing or reasoning)")
+    else:
+        # Load ontology
+        print("\n1. Loading ontology...")
+        if args.store == "array":
+            # Interned term IDs in sorted NumPy arrays (needs numpy)
+            from common.array_store import ArrayStore
+            g = Graph(store=ArrayStore())
+        else:
+            g = Graph()
+        with span("parse", graph=g, file="computers.ttl", store=args.store):
+            g.parse("computers.ttl", format="turtle")
+        print(f"   ✓ Loaded {len(g)} triples")
+        
+        if args.engine == "rewrite":
+            # Backward chaining: expand defined classes inside each query
+            print("\n2. Compiling class definitions for query rewriting...")
+            with span("compile_rewriter"):
+                rewriter = QueryRewriter(g)
+            for cls in rewriter.definitions:
+                print(f"   ✓ {str(cls).split('#')[1]} will be rewritten at query time")
+            for cls, reason in rewriter.skipped.items():
+                print(f"   ! {str(cls).split('#')[1]} taken from a materialized closure ({reason})")
+            print(f"   ✓ Graph stays at {len(g)} triples (nothing materialized)")
+        else:
+            # Apply OWL reasoning
+            print("\n2. Applying OWL reasoning...")
+            print("   This infers which computers are AffordableComputer and GamingComputer")
+            print("   based on the OWL class definitions...")
+            
+            with span("reason", graph=g, reasoner="owlrl"):
+                DeductiveClosure(OWLRL_Semantics).expand(g)
+            print(f"   ✓ After reasoning: {len(g)} triples (inferred new facts!)")
+            
+            if args.closure:
+                from common.closure_file import write_closure
+                with span("write_closure", file=args.closure):
+                    size = write_closure(g, args.closure)
+                print(f"   ✓ Closure exported to {args.closure} ({size:,} bytes)")
     
     # Run semantic query
     count1 = run_query(g, "query.sparql", 
-                       "METHOD 1: Semantic Query (using defined classes)")
+                       "METHOD 1: Semantic Query (using defined classes)",
+                       rewriter, stream)
     
     # Run manual query
     count2 = run_query(g, "query_manual.sparql",
-                       "METHOD 2: Manual Filter (traditional approach)")
+                       "METHOD 2: Manual Filter (traditional approach)",
+                       rewriter, stream)
     
     # Summary
     print("\n" + "="*70)
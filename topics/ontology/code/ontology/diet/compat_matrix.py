@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Vectorized Compatibility Matrix for the Diet Ontology
+
+query_compatibility_matrix.sparql and query_safe_for_all.sparql evaluate a
+FILTER NOT EXISTS sub-pattern for every person × food row. Here the same
+answers come from a few boolean matrix operations:
+
+    contains[food, ingredient]       food contains ingredient
+    typed[ingredient, category]      ingredient rdf:type category
+    forbids[restriction, category]   restriction incompatibleWith category
+
+    food_cats = contains @ typed                     (food × category)
+    conflict  = food_cats @ forbids.T                (food × restriction)
+
+A person can eat a food if none of their restrictions conflicts with it.
+The rows produced (including duplicates and ORDER BY) are the same as the
+SPARQL queries, so the matrix engine can replace them one-for-one.
+
+Usage:
+    m = CompatibilityMatrix.from_graph(g)
+    rows = m.compatibility_rows()        # [(personName, foodName), ...]
+"""
+
+import numpy as np
+from rdflib import Namespace
+from rdflib.namespace import RDF
+
+DIET = Namespace("http://example.org/diet#")
+
+
+def _index(items):
+    return {item: i for i, item in enumerate(items)}
+
+
+class CompatibilityMatrix:
+    """Boolean food/restriction matrices built once from a diet graph."""
+
+    def __init__(self, foods, restrictions, food_names, people,
+                 person_restrictions, person_names, conflict):
+        self.foods = foods                  # [food IRI]
+        self.restrictions = restrictions    # [restriction IRI]
+        self.food_names = food_names        # [(food index, foodName literal)]
+        self.people = people                # {IRI typed diet:Person}
+        self.person_restrictions = person_restrictions  # [(person, restriction index)]
+        self.person_names = person_names    # {person: [personName literal]}
+        self.conflict = conflict            # bool array, food × restriction
+
+    @classmethod
+    def from_graph(cls, g):
+        foods = sorted(set(g.subjects(RDF.type, DIET.Food)))
+        food_idx = _index(foods)
+
+        ingredients = sorted(set(g.objects(None, DIET.containsIngredient)))
+        ingredient_idx = _index(ingredients)
+
+        categories = sorted(set(g.objects(None, DIET.incompatibleWith)))
+        category_idx = _index(categories)
+
+        restrictions = sorted(set(g.subjects(DIET.incompatibleWith, None))
+                              | set(g.objects(None, DIET.hasRestriction)))
+        restriction_idx = _index(restrictions)
+
+        # 0/1 matrices in float32, so the products below run as BLAS sgemm
+        # without copies; sums of ones never round to 0, so "> 0" is exact
+        contains = np.zeros((len(foods), len(ingredients)), dtype=np.float32)
+        for food, ingredient in g.subject_objects(DIET.containsIngredient):
+            if food in food_idx:
+                contains[food_idx[food], ingredient_idx[ingredient]] = 1
+
+        # Direct rdf:type only, exactly like "?ingredient rdf:type ?category"
+        typed = np.zeros((len(ingredients), len(categories)), dtype=np.float32)
+        for ingredient in ingredients:
+            for category in g.objects(ingredient, RDF.type):
+                if category in category_idx:
+                    typed[ingredient_idx[ingredient], category_idx[category]] = 1
+
+        forbids = np.zeros((len(restrictions), len(categories)), dtype=np.float32)
+        for restriction, category in g.subject_objects(DIET.incompatibleWith):
+            forbids[restriction_idx[restriction], category_idx[category]] = 1
+
+        food_cats = (contains @ typed) > 0
+        conflict = (food_cats.astype(np.float32) @ forbids.T) > 0
+
+        food_names = [(food_idx[f], name) for f in foods
+                      for name in g.objects(f, DIET.foodName)]
+        person_restrictions = [(person, restriction_idx[restriction])
+                               for person, restriction
+                               in g.subject_objects(DIET.hasRestriction)]
+        people = set(g.subjects(RDF.type, DIET.Person))
+        person_names = {p: list(g.objects(p, DIET.hasName)) for p in people}
+
+        return cls(foods, restrictions, food_names, people,
+                   person_restrictions, person_names, conflict)
+
+    # ------------------------------------------------------------------
+    # Query equivalents
+    # ------------------------------------------------------------------
+
+    def compatible(self):
+        """food × restriction matrix: True where the food is allowed."""
+        return ~self.conflict
+
+    def compatibility_rows(self):
+        """Rows of query_compatibility_matrix.sparql: (personName, foodName)."""
+        allowed = self.compatible()
+        rows = []
+        for person, r in self.person_restrictions:
+            if person not in self.people:
+                continue
+            column = allowed[:, r]
+            for person_name in self.person_names[person]:
+                rows.extend((person_name, name) for f, name in self.food_names if column[f])
+        return sorted(rows, key=lambda row: (str(row[0]), str(row[1])))
+
+    def safe_for_all_rows(self):
+        """Rows of query_safe_for_all.sparql: (foodName,)."""
+        columns = sorted({r for p, r in self.person_restrictions if p in self.people})
+        if columns:
+            unsafe = self.conflict[:, columns].any(axis=1)
+        else:
+            unsafe = np.zeros(len(self.foods), dtype=bool)
+        rows = [(name,) for f, name in self.food_names if not unsafe[f]]
+        return sorted(rows, key=lambda row: str(row[0]))
+
+    def menu_rows(self, person):
+        """Rows of query_person_menu.sparql with ?person bound: (foodName,)."""
+        allowed = self.compatible()
+        rows = []
+        for p, r in self.person_restrictions:
+            if p == person:
+                rows.extend((name,) for f, name in self.food_names if allowed[f, r])
+        return sorted(rows, key=lambda row: str(row[0]))
+
+
+def verify_against_sparql(g, registry):
+    """
+    Compare the matrix engine with the SPARQL queries on the same graph.
+
+    Args:
+        g: diet graph
+        registry: prepared_queries.QueryRegistry for the .sparql files
+
+    Returns:
+        dict of check name -> bool
+    """
+    m = CompatibilityMatrix.from_graph(g)
+
+    def sparql_rows(query_file, **bindings):
+        return [tuple(row) for row in registry.run(g, query_file, **bindings)]
+
+    checks = {
+        "compatibility matrix":
+            m.compatibility_rows() == sparql_rows("query_compatibility_matrix.sparql"),
+        "safe for all":
+            m.safe_for_all_rows() == sparql_rows("query_safe_for_all.sparql"),
+    }
+    for person in sorted(set(g.subjects(DIET.hasRestriction, None))):
+        checks[f"menu {str(person).split('#')[-1]}"] = (
+            m.menu_rows(person) == sparql_rows("query_person_menu.sparql", person=person))
+    return checks
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Inverted Menu Index for the Diet Ontology
+
+Answering "what can Alice eat?" with SPARQL scans every diet:Food and probes
+its ingredients. MenuIndex keeps an inverted index instead:
+
+    category -> foods containing an ingredient of that category
+                (including rdfs:subClassOf ancestors: Beef -> Meat -> Ingredient)
+    restriction -> forbidden categories
+    person -> restrictions
+
+so a menu is a set difference:
+
+    menu(person) = all foods - ∪ foods_by_category[c]
+                               for c forbidden by any restriction of person
+
+All edits go through MenuIndex.add() / remove(), which update the graph and
+patch the index in place; it never has to be rebuilt.
+
+Note: because subclass ancestors are indexed, a vegetarian cannot eat a
+Beef Burger here (beef is a meat), unlike the plain SPARQL queries, which
+only match an ingredient's direct rdf:type.
+
+Usage:
+    index = MenuIndex(g)
+    index.menu(DIET.Alice)                    # set of food IRIs
+    index.add((DIET.TofuBowl, RDF.type, DIET.Food))
+"""
+
+from collections import Counter, defaultdict
+
+from rdflib import Namespace
+from rdflib.namespace import RDF, RDFS
+
+DIET = Namespace("http://example.org/diet#")
+
+
+class MenuIndex:
+    """Incrementally maintained food/category/restriction index over a graph."""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.foods = set()
+        self.food_ingredients = defaultdict(set)
+        self.ingredient_foods = defaultdict(set)
+        self.types = defaultdict(set)            # resource -> direct rdf:types
+        self.instances = defaultdict(set)        # class -> resources typed with it
+        self.parents = defaultdict(set)          # class -> direct superclasses
+        self.children = defaultdict(set)         # class -> direct subclasses
+        self.forbids = defaultdict(set)          # restriction -> categories
+        self.restrictions = defaultdict(set)     # person -> restrictions
+        # category -> Counter(food -> number of its ingredients in the category)
+        self.foods_by_category = defaultdict(Counter)
+        self._ancestors = {}
+
+        for t in graph:
+            self._apply(t, +1)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def add(self, triple):
+        """Add a triple to the graph and update the index."""
+        if triple not in self.graph:
+            self.graph.add(triple)
+            self._apply(triple, +1)
+
+    def remove(self, triple):
+        """Remove a triple from the graph and update the index."""
+        if triple in self.graph:
+            self.graph.remove(triple)
+            self._apply(triple, -1)
+
+    def foods_in(self, category):
+        """Foods containing at least one ingredient of the category."""
+        return set(self.foods_by_category.get(category, ()))
+
+    def forbidden_foods(self, person):
+        forbidden = set()
+        for restriction in self.restrictions.get(person, ()):
+            for category in self.forbids.get(restriction, ()):
+                forbidden |= self.foods_in(category)
+        return forbidden
+
+    def menu(self, person):
+        """Foods the person can eat."""
+        return self.foods - self.forbidden_foods(person)
+
+    def menu_names(self, person):
+        """Sorted diet:foodName values of the person's menu."""
+        names = [str(name) for food in self.menu(person)
+                 for name in self.graph.objects(food, DIET.foodName)]
+        return sorted(names)
+
+    # ------------------------------------------------------------------
+    # Class hierarchy
+    # ------------------------------------------------------------------
+
+    def ancestors(self, cls):
+        """cls and all of its rdfs:subClassOf ancestors."""
+        cached = self._ancestors.get(cls)
+        if cached is not None:
+            return cached
+        result, stack = {cls}, [cls]
+        while stack:
+            for parent in self.parents.get(stack.pop(), ()):
+                if parent not in result:
+                    result.add(parent)
+                    stack.append(parent)
+        self._ancestors[cls] = frozenset(result)
+        return self._ancestors[cls]
+
+    def descendants(self, cls):
+        result, stack = {cls}, [cls]
+        while stack:
+            for child in self.children.get(stack.pop(), ()):
+                if child not in result:
+                    result.add(child)
+                    stack.append(child)
+        return result
+
+    def categories(self, ingredient):
+        """All categories an ingredient belongs to (types + ancestors)."""
+        cats = set()
+        for t in self.types.get(ingredient, ()):
+            cats |= self.ancestors(t)
+        return cats
+
+    # ------------------------------------------------------------------
+    # Index maintenance
+    # ------------------------------------------------------------------
+
+    def _count(self, food, categories, sign):
+        for c in categories:
+            counter = self.foods_by_category[c]
+            counter[food] += sign
+            if counter[food] <= 0:
+                del counter[food]
+                if not counter:
+                    del self.foods_by_category[c]
+
+    def _recategorize(self, ingredients, change):
+        """Apply a type/hierarchy change and patch the counts of affected foods."""
+        before = {i: self.categories(i) for i in ingredients}
+        change()
+        for i in ingredients:
+            after = self.categories(i)
+            gained, lost = after - before[i], before[i] - after
+            for food in self.ingredient_foods.get(i, ()):
+                self._count(food, gained, +1)
+                self._count(food, lost, -1)
+
+    def _apply(self, triple, sign):
+        s, p, o = triple
+        if p == DIET.containsIngredient:
+            if sign > 0:
+                self.food_ingredients[s].add(o)
+                self.ingredient_foods[o].add(s)
+            else:
+                self.food_ingredients[s].discard(o)
+                self.ingredient_foods[o].discard(s)
+            self._count(s, self.categories(o), sign)
+        elif p == RDF.type:
+            if o == DIET.Food:
+                (self.foods.add if sign > 0 else self.foods.discard)(s)
+
+            def change():
+                if sign > 0:
+                    self.types[s].add(o)
+                    self.instances[o].add(s)
+                else:
+                    self.types[s].discard(o)
+                    self.instances[o].discard(s)
+            self._recategorize([s], change)
+        elif p == RDFS.subClassOf:
+            affected = set()
+            for cls in self.descendants(s):
+                affected |= self.instances.get(cls, set())
+
+            def change():
+                if sign > 0:
+                    self.parents[s].add(o)
+                    self.children[o].add(s)
+                else:
+                    self.parents[s].discard(o)
+                    self.children[o].discard(s)
+                self._ancestors.clear()
+            self._recategorize(affected, change)
+        elif p == DIET.incompatibleWith:
+            (self.forbids[s].add if sign > 0 else self.forbids[s].discard)(o)
+        elif p == DIET.hasRestriction:
+            (self.restrictions[s].add if sign > 0 else self.restrictions[s].discard)(o)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Prepared, Parameterized SPARQL Queries
+
+run_query() used to read a .sparql file and let rdflib parse and translate
+it to algebra on every call. query_alice.sparql and query_bob.sparql are
+even the same query with a different person hard-coded.
+
+QueryRegistry parses and algebra-compiles each .sparql file once and keeps
+the prepared query. Callers bind variables at run time instead of editing
+the query text:
+
+    registry = QueryRegistry()
+    registry.run(g, "query_person_menu.sparql", person=DIET.Alice)
+    registry.run(g, "query_person_menu.sparql", person=DIET.Bob)   # no re-parse
+
+A file is re-prepared only if it changes on disk.
+"""
+
+import os
+
+from rdflib import Variable
+from rdflib.plugins.sparql import prepareQuery
+
+
+class QueryRegistry:
+    """Cache of prepared queries keyed by file path."""
+
+    def __init__(self, directory="."):
+        self.directory = directory
+        self._prepared = {}   # path -> (mtime, text, prepared query)
+        self.parses = 0
+
+    def _path(self, query_file):
+        return os.path.join(self.directory, query_file)
+
+    def _entry(self, query_file):
+        path = self._path(query_file)
+        mtime = os.stat(path).st_mtime_ns
+        entry = self._prepared.get(path)
+        if entry is None or entry[0] != mtime:
+            with open(path, 'r') as f:
+                text = f.read()
+            entry = (mtime, text, prepareQuery(text))
+            self._prepared[path] = entry
+            self.parses += 1
+        return entry
+
+    def get(self, query_file):
+        """Return the prepared query for a .sparql file."""
+        return self._entry(query_file)[2]
+
+    def text(self, query_file):
+        """Return the source text of a .sparql file (cached with the query)."""
+        return self._entry(query_file)[1]
+
+    def run(self, graph, query_file, **bindings):
+        """
+        Evaluate a prepared query with optional bound variables.
+
+        Args:
+            graph: rdflib Graph to query
+            query_file: .sparql file name (relative to the registry directory)
+            **bindings: variable name -> RDF term, e.g. person=DIET.Alice
+
+        Returns:
+            rdflib query Result
+        """
+        init = {Variable(name): value for name, value in bindings.items()}
+        return graph.query(self.get(query_file), initBindings=init)
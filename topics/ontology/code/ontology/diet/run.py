@@ -6,43 +6,83 @@ Demonstrates how ontologies can solve the problem of matching
 foods with people's dietary restrictions.
 """
 
-from rdflib import Graph, Namespace
+import argparse
+import sys
+from pathlib import Path
+
+from rdflib import Literal, Namespace
 from rdflib.namespace import RDF, RDFS
 
-def load_ontology():
-    """Load the diet ontology."""
-    g = Graph()
-    g.parse("diet.ttl", format="turtle")
+from prepared_queries import QueryRegistry
+from menu_index import MenuIndex
+
+# Shared helpers live in topics/ontology/code/common
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from common.streaming import FirstRowTimeout, stream_rows
+from common.result_cache import DEFAULT_CACHE_DIR, ResultCache, VersionedGraph
+from common import trace
+from common.trace import span
+
+DIET = Namespace("http://example.org/diet#")
+
+# Each .sparql file is parsed once and reused by every run_query() call
+QUERIES = QueryRegistry()
+
+# Set by --stream: rows are printed as they are produced, never collected
+STREAM_OPTIONS = None
+
+# Set by --result-cache: SELECT answers are reused until the graph changes
+RESULTS = None
+
+def load_ontology(store="memory"):
+    """Load the diet ontology (store: "memory" or the compact "array" store)."""
+    # A VersionedGraph counts its edits, so cached answers know when they are stale
+    if store == "array":
+        # Interned term IDs in sorted NumPy arrays (needs numpy)
+        from common.array_store import ArrayStore
+        g = VersionedGraph(store=ArrayStore())
+    else:
+        g = VersionedGraph()
+    with span("parse", graph=g, file="diet.ttl", store=store):
+        g.parse("diet.ttl", format="turtle")
     return g
 
-def run_query(graph, query_file, title):
-    """Run a SPARQL query and display results."""
+def run_query(graph, query_file, title, **bindings):
+    """Run a prepared SPARQL query (with optional bound variables) and display results."""
     print("\n" + "="*70)
     print(title)
     print("="*70)
     
-    # Read query
-    with open(query_file, 'r') as f:
-        query = f.read()
+    with span("query", file=query_file, **bindings) as timing:
+        # Run query
+        if STREAM_OPTIONS is not None:
+            results = stream_rows(graph, QUERIES.get(query_file), bindings, **STREAM_OPTIONS)
+        elif RESULTS is not None:
+            results = RESULTS.select(QUERIES.text(query_file), bindings,
+                                     prepared=QUERIES.get(query_file))
+        else:
+            results = list(QUERIES.run(graph, query_file, **bindings))
+        
+        count = 0
+        try:
+            for count, row in enumerate(results, 1):
+                if hasattr(row, 'foodName'):
+                    print(f"  {count}. {row.foodName}")
+                else:
+                    # Print all columns
+                    parts = []
+                    for var in row.labels:
+                        parts.append(f"{var}: {row[var]}")
+                    print(f"  {count}. {', '.join(parts)}")
+        except FirstRowTimeout as e:
+            print(f"  Query abandoned: {e}")
+        timing.rows = count
     
-    # Run query
-    results = list(graph.query(query))
-    
-    if len(results) == 0:
+    if count == 0:
         print("  No results found.")
-    else:
-        for i, row in enumerate(results, 1):
-            if hasattr(row, 'foodName'):
-                print(f"  {i}. {row.foodName}")
-            else:
-                # Print all columns
-                parts = []
-                for var in results.bindings[0].keys():
-                    parts.append(f"{var}: {row[var]}")
-                print(f"  {i}. {', '.join(parts)}")
-    
-    print(f"\n  Total: {len(results)} result(s)")
-    return len(results)
+    
+    print(f"\n  Total: {count} result(s)")
+    return count
 
 def show_menu(graph):
     """Display all foods in the menu."""
@@ -64,7 +104,7 @@ def show_menu(graph):
     ORDER BY ?foodName ?ingredient
     """
     
-    results = list(graph.query(query))
+    results = RESULTS.select(query) if RESULTS is not None else list(graph.query(query))
     
     current_food = None
     for row in results:
@@ -95,13 +135,102 @@ def show_people(graph):
     ORDER BY ?name
     """
     
-    results = list(graph.query(query))
+    results = RESULTS.select(query) if RESULTS is not None else list(graph.query(query))
     
     for row in results:
         print(f"  • {row.name}: {row.restrictionLabel}")
 
+def show_matrix(graph):
+    """Compute the compatibility matrix with NumPy and check it against SPARQL."""
+    try:
+        from compat_matrix import CompatibilityMatrix, verify_against_sparql
+    except ImportError:
+        print("\nERROR: numpy is required for --matrix")
+        print("Install it with: pip install numpy")
+        return
+    
+    print("\n" + "="*70)
+    print("Matrix Engine: Person × Food Compatibility (boolean matrices)")
+    print("="*70)
+    
+    with span("build_matrix"):
+        m = CompatibilityMatrix.from_graph(graph)
+    allowed = m.compatible()
+    names = {f: name for f, name in m.food_names}
+    people = sorted(m.people, key=lambda p: graph_name(graph, p))
+    for person in people:
+        columns = [r for p, r in m.person_restrictions if p == person]
+        row = allowed[:, columns].all(axis=1)
+        foods = sorted(str(names[f]) for f in names if row[f])
+        print(f"  {graph_name(graph, person):<14} {', '.join(foods)}")
+    
+    print("\n  Same rows as SPARQL?")
+    for check, ok in verify_against_sparql(graph, QUERIES).items():
+        print(f"    {'✓' if ok else '✗'} {check}")
+
+def show_index(graph):
+    """Answer menu questions from the inverted index and update it in place."""
+    print("\n" + "="*70)
+    print("Inverted Index: Menus as Set Differences (with subclass ancestors)")
+    print("="*70)
+    
+    with span("build_index"):
+        index = MenuIndex(graph)
+    people = sorted(index.restrictions, key=lambda p: graph_name(graph, p))
+    for person in people:
+        print(f"  {graph_name(graph, person):<14} {', '.join(index.menu_names(person))}")
+    
+    print("\n  Adding 'Tofu Rice Bowl' (rice + carrot) to the menu...")
+    for t in [(DIET.TofuRiceBowl, RDF.type, DIET.Food),
+              (DIET.TofuRiceBowl, DIET.foodName, Literal("Tofu Rice Bowl")),
+              (DIET.TofuRiceBowl, DIET.containsIngredient, DIET.WhiteRice),
+              (DIET.TofuRiceBowl, DIET.containsIngredient, DIET.SlicedCarrot)]:
+        index.add(t)
+    print(f"  {graph_name(graph, DIET.Eve):<14} {', '.join(index.menu_names(DIET.Eve))}")
+    
+    # Put the graph back the way the other queries expect it
+    for t in list(graph.triples((DIET.TofuRiceBowl, None, None))):
+        index.remove(t)
+
+def graph_name(graph, person):
+    """Return a person's diet:hasName, or the IRI fragment."""
+    name = graph.value(person, DIET.hasName)
+    return str(name) if name else str(person).split('#')[-1]
+
 def main():
     """Main demo function."""
+    parser = argparse.ArgumentParser(description="Diet restrictions ontology demo")
+    parser.add_argument("--matrix", action="store_true",
+                        help="also compute compatibility with NumPy matrices")
+    parser.add_argument("--index", action="store_true",
+                        help="also answer menus from the inverted category index")
+    parser.add_argument("--stream", action="store_true",
+                        help="print query rows as they are produced")
+    parser.add_argument("--offset", type=int, default=0,
+                        help="with --stream: skip this many rows")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="with --stream: print at most this many rows")
+    parser.add_argument("--first-row-timeout", type=float, default=None,
+                        help="with --stream: give up if no row arrives in time (seconds)")
+    parser.add_argument("--store", choices=["memory", "array"], default="memory",
+                        help="rdflib's default store, or the compact array-backed store")
+    parser.add_argument("--result-cache", action="store_true",
+                        help="reuse SELECT answers until the graph changes (in memory)")
+    parser.add_argument("--result-cache-dir", metavar="DIR", nargs="?", const=DEFAULT_CACHE_DIR,
+                        help="also keep answers on disk, keyed by the graph content "
+                             f"(default DIR: {DEFAULT_CACHE_DIR}); implies --result-cache")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write per-phase timings as JSON (or set ONTOLOGY_TRACE)")
+    args = parser.parse_args()
+    
+    if args.trace:
+        trace.enable(args.trace)
+    
+    global STREAM_OPTIONS
+    if args.stream:
+        STREAM_OPTIONS = {"offset": args.offset, "limit": args.limit,
+                          "first_row_timeout": args.first_row_timeout}
+    
     print("\n" + "="*70)
     print("Diet Restrictions Ontology Demo")
     print("="*70)
@@ -111,9 +240,13 @@ def main():
     # Load ontology
     print("\n" + "-"*70)
     print("Loading ontology...")
-    g = load_ontology()
+    g = load_ontology(args.store)
     print(f"✓ Loaded {len(g)} triples")
     
+    global RESULTS
+    if args.result_cache or args.result_cache_dir:
+        RESULTS = ResultCache(g, directory=args.result_cache_dir)
+    
     # Show the data
     show_people(g)
     show_menu(g)
@@ -138,6 +271,22 @@ def main():
     run_query(g, "query_compatibility_matrix.sparql",
               "Query 5: Complete Compatibility Matrix")
     
+    # One prepared query, many people: only ?person changes
+    for person in (DIET.Carol, DIET.David, DIET.Eve):
+        name = graph_name(g, person)
+        run_query(g, "query_person_menu.sparql",
+                  f"Query 6: What can {name} eat? (prepared query, ?person bound)",
+                  person=person)
+    print(f"\n  Query files parsed: {QUERIES.parses}")
+    if RESULTS is not None:
+        print(f"  Result cache: {RESULTS.stats.describe()}")
+    
+    if args.matrix:
+        show_matrix(g)
+    
+    if args.index:
+        show_index(g)
+    
     # Summary
     print("\n" + "="*70)
     print("Summary")
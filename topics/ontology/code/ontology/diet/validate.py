@@ -5,10 +5,119 @@ SHACL Validation Demo for Diet Ontology
 Shows how to validate data quality using SHACL shapes.
 """
 
-from rdflib import Graph
+import argparse
+import sys
+from pathlib import Path
+
+from rdflib import Graph, Literal, Namespace
+from rdflib.namespace import RDF
 from pyshacl import validate
 
+# Shared helpers live in topics/ontology/code/common
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from common import trace
+from common.trace import span
+from common.shacl_report import Report
+from common.incremental_shacl import IncrementalValidator
+from common.parallel_shacl import validate_parallel
+from common.compiled_shacl import validate_compiled
+from common.shacl_stream import exit_status, stream_validation
+
+DIET = Namespace("http://example.org/diet#")
+
+def show_incremental(data_graph, shapes_graph, results_graph):
+    """Apply a few edits and re-check only the affected focus nodes."""
+    print("\n" + "="*70)
+    print("Incremental Re-Validation")
+    print("="*70)
+    
+    validator = IncrementalValidator(data_graph, shapes_graph,
+                                     report=Report.from_graph(results_graph))
+    stew = DIET.MysteryStew
+    alice_name = (DIET.Alice, DIET.hasName, Literal("Alice Johnson"))
+    edits = [
+        ("Add a food without ingredients",
+         [(stew, RDF.type, DIET.Food), (stew, DIET.foodName, Literal("Mystery Stew"))], []),
+        ("Remove Alice's name", [], [alice_name]),
+        ("Give the stew an ingredient and restore Alice's name",
+         [(stew, DIET.containsIngredient, DIET.BeefMeat), alice_name], []),
+    ]
+    for title, added, removed in edits:
+        with span("validate_incremental", edit=title) as timing:
+            delta = validator.apply(added=added, removed=removed)
+            timing.set(rechecked=delta.rechecked, conforms=validator.report.conforms)
+        print(f"\n• {title}")
+        print(f"  {delta.describe()}")
+        print(f"  Conforms: {validator.report.conforms} "
+              f"({len(validator.report)} violation(s))")
+        for result in validator.report.results():
+            print(f"    - {result.focus.n3(data_graph.namespace_manager)}: "
+                  f"{', '.join(result.messages)}")
+    
+    print(f"\n  Same report as a full run: {validator.matches_full()}")
+
+def show_stream(data_graph, shapes_graph, args, stdout):
+    """Write violations as JSON lines while validating; print only the counts.
+
+    Returns the stream summary.
+    """
+    print("\nStreaming violations...")
+    out = stdout if args.jsonl == "-" else open(args.jsonl, "w")
+    try:
+        with span("validate_stream", inference="rdfs") as timing:
+            summary = stream_validation(
+                data_graph, shapes_graph, out, inference='rdfs',
+                max_total=args.max_violations, max_per_shape=args.max_per_shape,
+                time_budget=args.time_budget)
+            timing.set(violations=summary["violations"], stopped=summary["stopped"])
+    finally:
+        if out is not stdout:
+            out.close()
+    
+    print("\n" + "="*70)
+    print("Validation Summary")
+    print("="*70)
+    print(f"\n  Violations: {summary['violations']}")
+    print(f"  Conforms: {summary['conforms']}")
+    if summary["stopped"]:
+        print(f"  Stopped early: {summary['stopped']}")
+    for shape, count in summary["by_shape"].items():
+        print(f"    {count:6d}  {shape}")
+    if args.jsonl != "-":
+        print(f"\n✓ Violations written to {args.jsonl}")
+    print()
+    return summary
+
 def main():
+    parser = argparse.ArgumentParser(description="SHACL validation demo")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write per-phase timings as JSON (or set ONTOLOGY_TRACE)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="also apply sample edits and re-validate only affected nodes")
+    parser.add_argument("--workers", type=int, metavar="N",
+                        help="validate focus-node shards in N worker processes")
+    parser.add_argument("--compiled", action="store_true",
+                        help="check simple constraints with direct graph lookups "
+                             "(pyshacl for the rest)")
+    parser.add_argument("--jsonl", metavar="FILE",
+                        help="stream violations as JSON lines to FILE ('-' for stdout) "
+                             "instead of building the full report")
+    parser.add_argument("--max-violations", type=int, metavar="N",
+                        help="with --jsonl: stop after N violations")
+    parser.add_argument("--max-per-shape", type=int, metavar="N",
+                        help="with --jsonl: stop checking a property shape after N violations")
+    parser.add_argument("--time-budget", type=float, metavar="SECONDS",
+                        help="with --jsonl: stop validating after SECONDS")
+    args = parser.parse_args()
+    
+    if args.trace:
+        trace.enable(args.trace)
+    
+    stdout = sys.stdout
+    if args.jsonl == "-":
+        # Keep stdout for the JSON lines; banners go to stderr
+        sys.stdout = sys.stderr
+    
     print("\n" + "="*70)
     print("SHACL Validation Demo")
     print("="*70)
@@ -16,22 +125,39 @@ def main():
     
     # Load data and shapes
     data_graph = Graph()
-    data_graph.parse("diet.ttl", format="turtle")
+    with span("parse", graph=data_graph, file="diet.ttl"):
+        data_graph.parse("diet.ttl", format="turtle")
     
     shapes_graph = Graph()
-    shapes_graph.parse("shacl_shapes.ttl", format="turtle")
+    with span("parse", graph=shapes_graph, file="shacl_shapes.ttl"):
+        shapes_graph.parse("shacl_shapes.ttl", format="turtle")
     
     print(f"✓ Loaded {len(data_graph)} data triples")
     print(f"✓ Loaded {len(shapes_graph)} shape triples")
     
+    if args.jsonl:
+        summary = show_stream(data_graph, shapes_graph, args, stdout)
+        # Non-zero on violations, so --jsonl can gate CI
+        sys.exit(exit_status(summary))
+    
     # Validate
     print("\nRunning validation...")
-    conforms, results_graph, results_text = validate(
-        data_graph,
-        shacl_graph=shapes_graph,
-        inference='rdfs',
-        abort_on_first=False
-    )
+    with span("validate", inference="rdfs", workers=args.workers or 1,
+              compiled=args.compiled) as timing:
+        if args.compiled:
+            conforms, results_graph, results_text = validate_compiled(
+                data_graph, shapes_graph, inference='rdfs')
+        elif args.workers:
+            conforms, results_graph, results_text = validate_parallel(
+                data_graph, shapes_graph, workers=args.workers, inference='rdfs')
+        else:
+            conforms, results_graph, results_text = validate(
+                data_graph,
+                shacl_graph=shapes_graph,
+                inference='rdfs',
+                abort_on_first=False
+            )
+        timing.set(conforms=conforms)
     
     # Display results
     print("\n" + "="*70)
@@ -48,6 +174,9 @@ def main():
         print("\nDetails:")
         print(results_text)
     
+    if args.incremental:
+        show_incremental(data_graph, shapes_graph, results_graph)
+    
     print()
 
 if __name__ == "__main__":
@@ -0,0 +1,288 @@
+"""
+Concurrent Wikidata Queries with asyncio
+
+The example functions each wait for one query before the next is sent, so a
+run takes the sum of all query times although the queries are independent.
+QueryExecutor sends them concurrently and keeps within the Wikidata Query
+Service limits (https://www.mediawiki.org/wiki/Wikidata_Query_Service/User_Manual#Query_limits):
+
+- a concurrency limit (default 5, the service's limit of parallel queries
+  per client) bounds the queries in flight
+- a token bucket spaces the requests: `rate` per second on average, with
+  bursts of up to `burst` back to back
+- 429 (too many requests) and 5xx answers and connection errors are retried
+  with exponential backoff and jitter; a Retry-After header is honoured
+
+Queries run on the shared SPARQLClient in worker threads (asyncio.to_thread),
+so they reuse its pooled connections and its cache. Cached queries answer
+without waiting for a token. With the defaults a handful of queries all start
+at once, so the wall time is close to that of the slowest query.
+
+The limits only help if every caller shares them: default_executor() is the
+process-wide executor of a client, and run_queries() (and with it the label
+and batch helpers) uses it unless given other options. Its bucket and
+concurrency limit are not tied to one event loop, so they also hold across
+run_queries() calls and threads.
+
+Usage:
+    results = run_queries([query1, query2, query3])
+    by_entity = run_for_entities(TEMPLATE, ["Q42", "Q5879"])   # "{entity}" in TEMPLATE
+
+    # inside a coroutine
+    results = await default_executor().gather(queries)
+
+Command line (birth dates of several people, one query each):
+    python async_queries.py Q42 Q5879 Q692 Q1035
+"""
+
+import argparse
+import asyncio
+import http.client
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from sparql_client import SPARQLError, default_client
+
+# Status codes worth retrying: rate limited, or a server-side hiccup
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, at most `burst` saved up."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()    # not asyncio.Lock: shared by every event loop
+
+    async def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Take the token now; a negative balance is the queue ahead of us
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class _Slots:
+    """Async semaphore that, unlike asyncio.Semaphore, works across event loops and threads."""
+
+    def __init__(self, size):
+        self.free = size
+        self.waiters = deque()          # (loop, future), first come first served
+        self.lock = threading.Lock()
+
+    async def __aenter__(self):
+        with self.lock:
+            if self.free and not self.waiters:
+                self.free -= 1
+                return
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            self.waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self.lock:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+            # Otherwise the slot was already handed over and _hand_over passes it on
+            raise
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+    def release(self):
+        with self.lock:
+            while self.waiters:
+                loop, future = self.waiters.popleft()
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(self._hand_over, future)
+                    return
+            self.free += 1
+
+    def _hand_over(self, future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+
+@dataclass
+class ExecutorStats:
+    queries: int = 0
+    cached: int = 0
+    retries: int = 0
+    failures: int = 0
+    seconds: list = field(default_factory=list)     # per fetched query, including retries
+    # A shared executor's stats cover every query it has run in this process
+
+    def describe(self, wall):
+        slowest = max(self.seconds, default=0.0)
+        return (f"{self.queries} queries ({self.cached} cached, {self.retries} retries, "
+                f"{self.failures} failed) in {wall:.2f}s; slowest single query {slowest:.2f}s")
+
+
+class QueryExecutor:
+    """Runs SPARQL queries concurrently within a rate limit."""
+
+    def __init__(self, client=None, concurrency=5, rate=2.0, burst=5, retries=4,
+                 backoff=1.0, max_backoff=30.0):
+        """
+        Args:
+            client: SPARQLClient (default: the shared default_client())
+            concurrency: queries in flight at most
+            rate, burst: token bucket (requests per second, bucket size)
+            retries: attempts after the first for 429/5xx and connection errors
+            backoff, max_backoff: first and largest retry delay in seconds
+        """
+        self.client = client or default_client()
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.semaphore = _Slots(concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = ExecutorStats()
+
+    def _delay(self, attempt, error):
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            return retry_after
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def run(self, query):
+        """Results of one query (from the cache, or fetched with retries)."""
+        self.stats.queries += 1
+        async with self.semaphore:
+            results = await asyncio.to_thread(self.client.cached, query)
+            if results is not None:
+                self.stats.cached += 1
+                return results
+
+            start = time.perf_counter()
+            for attempt in range(self.retries + 1):
+                await self.bucket.acquire()
+                try:
+                    results = await asyncio.to_thread(self.client.fetch_results, query)
+                    self.stats.seconds.append(time.perf_counter() - start)
+                    return results
+                except SPARQLError as e:
+                    if e.status not in RETRY_STATUSES or attempt == self.retries:
+                        self.stats.failures += 1
+                        raise
+                    error = e
+                except (OSError, http.client.HTTPException) as e:
+                    if attempt == self.retries:
+                        self.stats.failures += 1
+                        raise
+                    error = e
+                self.stats.retries += 1
+                await asyncio.sleep(self._delay(attempt, error))
+
+    async def gather(self, queries, return_exceptions=False):
+        """Results of all queries, in order."""
+        return await asyncio.gather(*(self.run(q) for q in queries),
+                                    return_exceptions=return_exceptions)
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def default_executor(client=None):
+    """The process-wide executor of a client (default: default_client()), with the default limits."""
+    client = client or default_client()
+    with _executors_lock:
+        if client not in _executors:
+            _executors[client] = QueryExecutor(client)
+        return _executors[client]
+
+
+def executor_for(**options):
+    """default_executor() of the client option, or a new QueryExecutor if other options are given."""
+    if set(options) <= {"client"}:
+        return default_executor(options.get("client"))
+    return QueryExecutor(**options)
+
+
+def run_queries(queries, return_exceptions=False, executor=None, **options):
+    """
+    Run queries concurrently from synchronous code.
+
+    Args:
+        queries: SPARQL query strings
+        return_exceptions: put a failed query's exception in its place
+            instead of raising it
+        executor: QueryExecutor to run them on (default: executor_for(**options))
+        **options: QueryExecutor options
+
+    Returns:
+        (results list in query order, QueryExecutor with its stats)
+    """
+    executor = executor or executor_for(**options)
+    results = asyncio.run(executor.gather(queries, return_exceptions))
+    return results, executor
+
+
+def run_for_entities(template, entities, **options):
+    """
+    Run one query per entity: template.format(entity=...) for each entity ID.
+
+    Returns:
+        ({entity: results}, QueryExecutor)
+    """
+    entities = list(entities)
+    results, executor = run_queries([template.format(entity=e) for e in entities], **options)
+    return dict(zip(entities, results)), executor
+
+
+BIRTH_DATE_TEMPLATE = """
+PREFIX wd: <http://www.wikidata.org/entity/>
+PREFIX wdt: <http://www.wikidata.org/prop/direct/>
+
+SELECT ?person ?birthDate
+WHERE {{
+    BIND(wd:{entity} AS ?person)
+    ?person wdt:P569 ?birthDate .
+}}
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the birth dates of several Wikidata entities concurrently")
+    parser.add_argument("entities", nargs="+", help="entity IDs, e.g. Q42")
+    parser.add_argument("--concurrency", type=int, help="queries in flight (default: 5)")
+    parser.add_argument("--rate", type=float, help="requests per second (default: 2.0)")
+    args = parser.parse_args()
+
+    # Without options the queries share default_executor() with the label lookups
+    options = {name: value for name, value in (("concurrency", args.concurrency), ("rate", args.rate))
+               if value is not None}
+    start = time.perf_counter()
+    by_entity, executor = run_for_entities(BIRTH_DATE_TEMPLATE, args.entities,
+                                           return_exceptions=True, **options)
+    # Imported here: labels.py itself sends its queries through this module
+    from labels import default_resolver
+    default_resolver().add_labels(*(r for r in by_entity.values() if not isinstance(r, Exception)))
+    wall = time.perf_counter() - start
+    for entity, results in by_entity.items():
+        if isinstance(results, Exception):
+            print(f"{entity}: error: {results}")
+            continue
+        for row in results["results"]["bindings"]:
+            print(f"{entity}: {row['personLabel']['value']} born {row['birthDate']['value'][:10]}")
+    print(executor.stats.describe(wall))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,32 +13,103 @@ Wikidata Concepts:
 - Values: human, writer, 1952-03-11, United Kingdom
 """
 
-from SPARQLWrapper import SPARQLWrapper, JSON
+import argparse
 import json
+import time
+
+from async_queries import run_queries
+from labels import default_resolver
+from sparql_client import default_client
 
 
 def query_wikidata(sparql_query):
     """
     Execute a SPARQL query against Wikidata endpoint
     
+    The shared client (sparql_client.py) reuses one keep-alive connection
+    for all queries and answers repeated queries from its on-disk cache.
+    Labels for the IDs in the results are added by the shared label
+    resolver (labels.py), as SERVICE wikibase:label would have done.
+    
     Args:
         sparql_query: SPARQL query string
     
     Returns:
         JSON results from the query
     """
-    endpoint = "https://query.wikidata.org/sparql"
-    sparql = SPARQLWrapper(endpoint)
-    sparql.setQuery(sparql_query)
-    sparql.setReturnFormat(JSON)
+    return default_resolver().add_labels(default_client().query(sparql_query))
+
+
+# Queries used by the functions below; main() sends them all at once.
+# They select IDs only: labels (?occupationLabel, ...) are added afterwards
+# from the label cache (labels.py) instead of by SERVICE wikibase:label.
+
+BASIC_INFO_QUERY = """
+PREFIX wd: <http://www.wikidata.org/entity/>
+PREFIX wdt: <http://www.wikidata.org/prop/direct/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+
+SELECT ?property ?value
+WHERE {
+    # Douglas Adams is Q42
+    wd:Q42 ?property ?value .
+    
+    # Filter for relevant properties
+    FILTER(?property IN (wdt:P31, wdt:P106, wdt:P569, wdt:P27))
+}
+"""
+
+
+OCCUPATIONS_QUERY = """
+PREFIX wd: <http://www.wikidata.org/entity/>
+PREFIX wdt: <http://www.wikidata.org/prop/direct/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+
+SELECT ?occupation
+WHERE {
+    # Douglas Adams (Q42) has occupation (P106)
+    wd:Q42 wdt:P106 ?occupation .
+}
+"""
+
+
+BIRTH_DETAILS_QUERY = """
+PREFIX wd: <http://www.wikidata.org/entity/>
+PREFIX wdt: <http://www.wikidata.org/prop/direct/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+
+SELECT ?birthDate ?birthPlace
+WHERE {
+    # Birth date
+    wd:Q42 wdt:P569 ?birthDate .
     
-    # Add user agent (required by Wikidata)
-    sparql.addCustomHttpHeader("User-Agent", "Educational Example/1.0")
+    # Birth place (optional)
+    OPTIONAL { 
+        wd:Q42 wdt:P19 ?birthPlace .
+    }
+}
+"""
+
+
+NOTABLE_WORKS_QUERY = """
+PREFIX wd: <http://www.wikidata.org/entity/>
+PREFIX wdt: <http://www.wikidata.org/prop/direct/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+
+SELECT ?work ?publicationDate
+WHERE {
+    # Works where Douglas Adams is the author
+    ?work wdt:P50 wd:Q42 .
     
-    return sparql.query().convert()
+    # Get publication date if available
+    OPTIONAL { ?work wdt:P577 ?publicationDate . }
+}
+ORDER BY ?publicationDate
+LIMIT 10
+"""
 
 
-def get_douglas_adams_basic_info():
+def get_douglas_adams_basic_info(results=None):
     """
     Query basic information about Douglas Adams
     
@@ -50,29 +121,12 @@ def get_douglas_adams_basic_info():
     - P106 = occupation (property)
     - P569 = date of birth (property)
     - P27 = country of citizenship (property)
+
+    results: already fetched results of BASIC_INFO_QUERY (default: query now)
     """
-    query = """
-    PREFIX wd: <http://www.wikidata.org/entity/>
-    PREFIX wdt: <http://www.wikidata.org/prop/direct/>
-    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-    
-    SELECT ?property ?propertyLabel ?value ?valueLabel
-    WHERE {
-        # Douglas Adams is Q42
-        wd:Q42 ?property ?value .
-        
-        # Filter for relevant properties
-        FILTER(?property IN (wdt:P31, wdt:P106, wdt:P569, wdt:P27))
-        
-        # Get human-readable labels
-        SERVICE wikibase:label { 
-            bd:serviceParam wikibase:language "en" .
-        }
-    }
-    """
-    
     print("=== Douglas Adams Basic Information ===\n")
-    results = query_wikidata(query)
+    if results is None:
+        results = query_wikidata(BASIC_INFO_QUERY)
     
     for result in results["results"]["bindings"]:
         prop = result["propertyLabel"]["value"]
@@ -82,69 +136,38 @@ def get_douglas_adams_basic_info():
     return results
 
 
-def get_douglas_adams_occupations():
+def get_douglas_adams_occupations(results=None):
     """
     Query all occupations of Douglas Adams
     
     Demonstrates: One entity can have multiple values for a property
+
+    results: already fetched results of OCCUPATIONS_QUERY (default: query now)
     """
-    query = """
-    PREFIX wd: <http://www.wikidata.org/entity/>
-    PREFIX wdt: <http://www.wikidata.org/prop/direct/>
-    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-    
-    SELECT ?occupation ?occupationLabel
-    WHERE {
-        # Douglas Adams (Q42) has occupation (P106)
-        wd:Q42 wdt:P106 ?occupation .
-        
-        # Get labels in English
-        SERVICE wikibase:label { 
-            bd:serviceParam wikibase:language "en" .
-        }
-    }
-    ORDER BY ?occupationLabel
-    """
-    
     print("\n=== Douglas Adams Occupations ===\n")
-    results = query_wikidata(query)
+    if results is None:
+        results = query_wikidata(OCCUPATIONS_QUERY)
     
-    for result in results["results"]["bindings"]:
+    # Sorted here: the labels are not known to the query's ORDER BY
+    bindings = sorted(results["results"]["bindings"], key=lambda r: r["occupationLabel"]["value"])
+    for result in bindings:
         occupation = result["occupationLabel"]["value"]
         print(f"- {occupation}")
     
     return results
 
 
-def get_birth_details():
+def get_birth_details(results=None):
     """
     Query detailed birth information
     
     Demonstrates: Different data types in Wikidata (date, place)
+
+    results: already fetched results of BIRTH_DETAILS_QUERY (default: query now)
     """
-    query = """
-    PREFIX wd: <http://www.wikidata.org/entity/>
-    PREFIX wdt: <http://www.wikidata.org/prop/direct/>
-    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-    
-    SELECT ?birthDate ?birthPlace ?birthPlaceLabel
-    WHERE {
-        # Birth date
-        wd:Q42 wdt:P569 ?birthDate .
-        
-        # Birth place (optional)
-        OPTIONAL { 
-            wd:Q42 wdt:P19 ?birthPlace .
-        }
-        
-        SERVICE wikibase:label { 
-            bd:serviceParam wikibase:language "en" .
-        }
-    }
-    """
-    
     print("\n=== Birth Details ===\n")
-    results = query_wikidata(query)
+    if results is None:
+        results = query_wikidata(BIRTH_DETAILS_QUERY)
     
     for result in results["results"]["bindings"]:
         birth_date = result["birthDate"]["value"]
@@ -155,35 +178,17 @@ def get_birth_details():
     return results
 
 
-def get_notable_works():
+def get_notable_works(results=None):
     """
     Query notable works by Douglas Adams
     
     Demonstrates: Relationships between entities
+
+    results: already fetched results of NOTABLE_WORKS_QUERY (default: query now)
     """
-    query = """
-    PREFIX wd: <http://www.wikidata.org/entity/>
-    PREFIX wdt: <http://www.wikidata.org/prop/direct/>
-    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-    
-    SELECT ?work ?workLabel ?publicationDate
-    WHERE {
-        # Works where Douglas Adams is the author
-        ?work wdt:P50 wd:Q42 .
-        
-        # Get publication date if available
-        OPTIONAL { ?work wdt:P577 ?publicationDate . }
-        
-        SERVICE wikibase:label { 
-            bd:serviceParam wikibase:language "en" .
-        }
-    }
-    ORDER BY ?publicationDate
-    LIMIT 10
-    """
-    
     print("\n=== Notable Works ===\n")
-    results = query_wikidata(query)
+    if results is None:
+        results = query_wikidata(NOTABLE_WORKS_QUERY)
     
     for result in results["results"]["bindings"]:
         work = result["workLabel"]["value"]
@@ -234,23 +239,46 @@ def main():
     """
     Main demonstration function
     """
+    parser = argparse.ArgumentParser(description="Wikidata example: Douglas Adams")
+    parser.add_argument("--sequential", action="store_true",
+                        help="send the queries one after another instead of concurrently")
+    parser.add_argument("--concurrency", type=int,
+                        help="queries in flight at once (default: 5, shared with the label lookups)")
+    args = parser.parse_args()
+
     print("=" * 70)
     print("WIKIDATA EXAMPLE: Douglas Adams")
     print("Modeling: 'Douglas Adams was an English writer, born in 1952'")
     print("=" * 70)
     
     try:
+        # The four queries are independent: send them concurrently, then print
+        start = time.perf_counter()
+        if args.sequential:
+            basic = occupations = birth = works = None
+        else:
+            (basic, occupations, birth, works), executor = run_queries(
+                [BASIC_INFO_QUERY, OCCUPATIONS_QUERY, BIRTH_DETAILS_QUERY, NOTABLE_WORKS_QUERY],
+                **({"concurrency": args.concurrency} if args.concurrency else {}))
+            default_resolver().add_labels(basic, occupations, birth, works)
+
         # 1. Basic information
-        get_douglas_adams_basic_info()
+        get_douglas_adams_basic_info(basic)
         
         # 2. All occupations (writer is one of them)
-        get_douglas_adams_occupations()
+        get_douglas_adams_occupations(occupations)
         
         # 3. Birth details
-        get_birth_details()
+        get_birth_details(birth)
         
         # 4. Notable works
-        get_notable_works()
+        get_notable_works(works)
+
+        wall = time.perf_counter() - start
+        if args.sequential:
+            print(f"\n(4 queries one after another in {wall:.2f}s)")
+        else:
+            print(f"\n({executor.stats.describe(wall)})")
         
         # 5. RDF triple structure
         demonstrate_rdf_triples()
@@ -266,8 +294,12 @@ def main():
         
     except Exception as e:
         print(f"\nError: {e}")
-        print("\nNote: Make sure you have installed the required package:")
-        print("  pip install SPARQLWrapper")
+        print("\nNote: Check your network connection, or point")
+        print("  WIKIDATA_SPARQL_ENDPOINT at a reachable SPARQL endpoint")
+    finally:
+        client = default_client()
+        print(f"\nQueries: {client.stats.describe()}")
+        client.close()
 
 
 if __name__ == "__main__":
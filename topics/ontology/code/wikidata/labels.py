@@ -0,0 +1,289 @@
+"""
+Client-Side Label Resolution for Wikidata Results
+
+SERVICE wikibase:label is one of the most expensive parts of a Wikidata
+query, and it looks up the same labels ("human", "writer", "United Kingdom")
+again on every call. LabelResolver takes that step out of the queries:
+
+1. queries select IDs only (no SERVICE wikibase:label)
+2. add_labels(results) collects the entity and property IDs in the bindings
+3. labels already known come from a bounded in-memory LRU, then from a
+   persistent SQLite cache, both per language
+4. the rest are fetched together, hundreds per request:
+
+       SELECT ?item ?label WHERE {
+           VALUES ?item { wd:Q5 wd:Q36180 wd:P106 ... }
+           ?item rdfs:label ?label . FILTER(LANG(?label) = "en")
+       }
+
+5. every ?x bound to an entity or property gets an ?xLabel binding, as the
+   label service would have added (the ID itself when there is no label)
+
+IDs without a label in the language are remembered as such, so they are
+not asked for again.
+
+Usage:
+    results = client.query(LABEL_FREE_QUERY)
+    default_resolver().add_labels(results)     # now has ?occupationLabel etc.
+
+    resolver.resolve(["Q5", "P106"])           # {"Q5": "human", "P106": "occupation"}
+
+Command line:
+    python labels.py Q5 Q36180 P106 --language de
+    python labels.py --info
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from async_queries import executor_for, run_queries
+from sparql_client import default_cache_path
+
+# URI prefixes whose last segment is an ID with a label (wd:Q42, wdt:P31, ...)
+ID_PREFIXES = (
+    "http://www.wikidata.org/entity/",
+    "http://www.wikidata.org/prop/direct/",
+    "http://www.wikidata.org/prop/",
+)
+
+_ID = re.compile(r"[QP][1-9][0-9]*")
+
+LABEL_TEMPLATE = """
+PREFIX wd: <http://www.wikidata.org/entity/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+
+SELECT ?item ?label
+WHERE {
+    VALUES ?item { %s }
+    ?item rdfs:label ?label .
+    FILTER(LANG(?label) = "%s")
+}
+"""
+
+# IDs per label query; 500 IDs keep the query text near 5,000 characters
+LABEL_BATCH_SIZE = 500
+DEFAULT_TTL = 30 * 24 * 3600    # labels rarely change
+
+
+def entity_id(uri):
+    """"Q42" for .../entity/Q42 or "P31" for .../prop/direct/P31, else None."""
+    for prefix in ID_PREFIXES:
+        if uri.startswith(prefix):
+            tail = uri[len(prefix):]
+            return tail if _ID.fullmatch(tail) else None
+    return None
+
+
+def default_label_path():
+    return default_cache_path().with_name("labels.sqlite")
+
+
+class LabelStore:
+    """SQLite table: (language, ID) -> label (NULL: the ID has no label)."""
+
+    def __init__(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(path), check_same_thread=False)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS labels (
+                               language TEXT,
+                               id TEXT,
+                               label TEXT,
+                               fetched REAL,
+                               PRIMARY KEY (language, id))""")
+        self.db.commit()
+
+    def get_many(self, language, ids, min_fetched=0.0):
+        """{id: label or None} for the IDs stored since min_fetched."""
+        found = {}
+        ids = list(ids)
+        with self.lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                found.update(self.db.execute(
+                    f"SELECT id, label FROM labels WHERE language = ? AND fetched >= ? "
+                    f"AND id IN ({marks})", [language, min_fetched, *chunk]))
+        return found
+
+    def put_many(self, language, labels):
+        now = time.time()
+        with self.lock:
+            self.db.executemany("INSERT OR REPLACE INTO labels VALUES (?, ?, ?, ?)",
+                                [(language, i, label, now) for i, label in labels.items()])
+            self.db.commit()
+
+    def info(self):
+        with self.lock:
+            rows = self.db.execute("SELECT language, COUNT(*), COUNT(label) FROM labels "
+                                   "GROUP BY language ORDER BY language").fetchall()
+        return {"path": str(self.path),
+                "languages": {lang: {"ids": n, "labelled": k} for lang, n, k in rows}}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class LabelResolver:
+    """ID -> label in one language, through an LRU, a SQLite cache and batched queries."""
+
+    def __init__(self, language="en", store=None, memory_size=10000, ttl=DEFAULT_TTL,
+                 batch_size=LABEL_BATCH_SIZE, **options):
+        """
+        Args:
+            language: label language code
+            store: LabelStore (default: labels.sqlite next to the response cache);
+                False for the in-memory LRU only
+            memory_size: IDs kept in the LRU
+            ttl: seconds a stored label is used before it is fetched again
+            batch_size: IDs per label query
+            **options: QueryExecutor options for the label queries (default:
+                the shared default_executor())
+        """
+        if not re.fullmatch(r"[a-z]{2,3}(-[a-z0-9]+)*", language):
+            raise ValueError(f"not a language code: {language!r}")
+        self.language = language
+        self.store = LabelStore(default_label_path()) if store is None else store or None
+        self.memory = OrderedDict()
+        self.memory_size = memory_size
+        self.ttl = ttl
+        self.batch_size = batch_size
+        # Built once so that every fetch shares one budget; None: the shared executor
+        self.executor = executor_for(**options) if options else None
+        self.lock = threading.Lock()
+        self.stats = {"memory": 0, "stored": 0, "fetched": 0, "queries": 0}
+
+    def _remember(self, labels):
+        with self.lock:
+            for i, label in labels.items():
+                self.memory[i] = label
+                self.memory.move_to_end(i)
+            while len(self.memory) > self.memory_size:
+                self.memory.popitem(last=False)
+
+    def resolve(self, ids):
+        """
+        {id: label} for Wikidata IDs ("Q5", "P106"); an ID without a label in
+        this language maps to None.
+        """
+        wanted = list(dict.fromkeys(i for i in ids if _ID.fullmatch(i)))
+        labels, missing = {}, []
+        with self.lock:
+            for i in wanted:
+                if i in self.memory:
+                    self.memory.move_to_end(i)
+                    labels[i] = self.memory[i]
+                else:
+                    missing.append(i)
+        self.stats["memory"] += len(labels)
+
+        if missing and self.store is not None:
+            stored = self.store.get_many(self.language, missing, time.time() - self.ttl)
+            self.stats["stored"] += len(stored)
+            self._remember(stored)
+            labels.update(stored)
+            missing = [i for i in missing if i not in stored]
+
+        if missing:
+            fetched = self._fetch(missing)
+            self.stats["fetched"] += len(fetched)
+            if self.store is not None:
+                self.store.put_many(self.language, fetched)
+            self._remember(fetched)
+            labels.update(fetched)
+        return labels
+
+    def _fetch(self, ids):
+        queries = []
+        for start in range(0, len(ids), self.batch_size):
+            values = " ".join(f"wd:{i}" for i in ids[start:start + self.batch_size])
+            queries.append(LABEL_TEMPLATE % (values, self.language))
+        answers, _ = run_queries(queries, executor=self.executor)
+        self.stats["queries"] += len(queries)
+        fetched = dict.fromkeys(ids)
+        for results in answers:
+            for row in results["results"]["bindings"]:
+                i = entity_id(row["item"]["value"])
+                if i in fetched:
+                    fetched[i] = row["label"]["value"]
+        return fetched
+
+    def label(self, i):
+        """The label of one ID, or the ID itself if it has none."""
+        return self.resolve([i]).get(i) or i
+
+    def add_labels(self, *results):
+        """
+        Add ?xLabel bindings to SPARQL JSON results, like SERVICE wikibase:label.
+
+        Every ?x bound to a Wikidata entity or property gets a literal ?xLabel
+        (its label, or its ID if it has none) unless the row already has one.
+        The missing labels of all given results are resolved in one go.
+
+        Returns:
+            the first results object (all are changed in place)
+        """
+        ids = {entity_id(value["value"]) for r in results for row in r["results"]["bindings"]
+               for value in row.values() if value.get("type") == "uri"}
+        ids.discard(None)
+        labels = self.resolve(ids)
+        for r in results:
+            new_vars = set()
+            for row in r["results"]["bindings"]:
+                for var, value in list(row.items()):
+                    if value.get("type") != "uri" or f"{var}Label" in row:
+                        continue
+                    i = entity_id(value["value"])
+                    if i is not None:
+                        row[f"{var}Label"] = {"type": "literal", "value": labels.get(i) or i,
+                                              "xml:lang": self.language}
+                        new_vars.add(f"{var}Label")
+            head = r.setdefault("head", {}).setdefault("vars", [])
+            head.extend(sorted(new_vars - set(head)))
+        return results[0] if results else None
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+
+_resolvers = {}
+_resolvers_lock = threading.Lock()
+
+
+def default_resolver(language="en"):
+    """The process-wide resolver for a language, shared by the example scripts."""
+    with _resolvers_lock:
+        if language not in _resolvers:
+            _resolvers[language] = LabelResolver(language)
+        return _resolvers[language]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve Wikidata IDs to labels through the label cache")
+    parser.add_argument("ids", nargs="*", help="entity or property IDs, e.g. Q5 P106")
+    parser.add_argument("--language", default="en", help="label language (default: %(default)s)")
+    parser.add_argument("--info", action="store_true", help="show the label cache contents per language")
+    args = parser.parse_args()
+
+    resolver = LabelResolver(args.language)
+    if args.info:
+        print(json.dumps(resolver.store.info(), indent=2))
+        return
+    start = time.perf_counter()
+    labels = resolver.resolve(args.ids)
+    for i in args.ids:
+        print(f"{i}: {labels.get(i)}")
+    print(f"\n{resolver.stats} in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,522 @@
+"""
+Offline Wikidata Mirror
+
+The examples need query.wikidata.org for every query, which costs hundreds
+of milliseconds each and fails without network access. This module builds a
+small local mirror from a Wikidata dump and answers the same SPARQL queries
+from it in milliseconds:
+
+1. import_dump() streams a dump line by line (constant memory), either
+   - the JSON dump (latest-all.json[.gz|.bz2]: one entity per line), or
+   - an N-Triples dump (latest-truthy.nt[.gz|.bz2])
+2. it keeps only the "truthy" wdt: statements of the configured properties
+   (default P31, P106, P569, P27, P19, P50, P577), optionally only for a
+   set of entities, plus the rdfs:label of every entity in the configured
+   languages (values such as wd:Q5 need their labels too)
+3. the triples go into an indexed SQLite table (SPO key plus POS and OSP
+   indexes), so every triple pattern is an index lookup
+4. MirrorStore exposes the table as a read-only rdflib Store; Mirror runs
+   SPARQL on it with the prefixes Wikidata predefines (wd:, wdt:, rdfs:, ...)
+
+The examples use the mirror when the endpoint is set to mirror:<file>:
+
+    python mirror.py import fixtures/dump-sample.json
+    WIKIDATA_SPARQL_ENDPOINT=mirror:$HOME/.cache/wikidata-examples/mirror.sqlite \\
+        python douglas_adams_example.py
+
+Queries against the mirror need rdflib; importing does not.
+
+Command line:
+    python mirror.py [--mirror FILE] import DUMP [--properties P31 P106 ...]
+                     [--entities FILE] [--languages en de]
+    python mirror.py query "SELECT ?o WHERE { wd:Q42 wdt:P106 ?o }"
+    python mirror.py info
+"""
+
+import argparse
+import bz2
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sparql_client import default_cache_path
+
+WD = "http://www.wikidata.org/entity/"
+WDT = "http://www.wikidata.org/prop/direct/"
+RDFS_LABEL = "http://www.w3.org/2000/01/rdf-schema#label"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+WKT_LITERAL = "http://www.opengis.net/ont/geosparql#wktLiteral"
+
+DEFAULT_PROPERTIES = ("P31", "P106", "P569", "P27", "P19", "P50", "P577")
+DEFAULT_LANGUAGES = ("en",)
+
+# Prefixes the Wikidata Query Service declares for every query
+WIKIDATA_PREFIXES = {
+    "wd": WD,
+    "wdt": WDT,
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "xsd": XSD,
+    "schema": "http://schema.org/",
+    "skos": "http://www.w3.org/2004/02/skos/core#",
+}
+
+# Rows per executemany() while importing
+INSERT_BATCH = 10000
+
+# Parsed queries kept by Mirror
+PREPARED_QUERIES = 256
+
+
+def default_mirror_path():
+    return default_cache_path().with_name("mirror.sqlite")
+
+
+# ----------------------------------------------------------------------
+# Term encoding: one TEXT column per position
+# ----------------------------------------------------------------------
+#
+# "U" + IRI, or "L" + lexical form, language and datatype separated by
+# \x1f (which cannot occur in IRIs or language tags). The same encoding is
+# produced from dump values and from rdflib terms, so lookups match.
+
+SEP = "\x1f"
+
+
+def encode_iri(value):
+    return "U" + value
+
+
+def encode_literal(value, language="", datatype=""):
+    return f"L{value}{SEP}{language}{SEP}{datatype}"
+
+
+def encode_term(term):
+    from rdflib import Literal, URIRef
+    if isinstance(term, URIRef):
+        return encode_iri(str(term))
+    if isinstance(term, Literal):
+        return encode_literal(str(term), term.language or "", term.datatype or "")
+    return None         # blank nodes never occur in the mirror
+
+
+def decode_term(data):
+    from rdflib import Literal, URIRef
+    if data[0] == "U":
+        return URIRef(data[1:])
+    value, language, datatype = data[1:].split(SEP)
+    # normalize=False keeps the lexical form ("1952-03-11T00:00:00Z") as imported
+    return Literal(value, lang=language or None, datatype=datatype or None, normalize=False)
+
+
+# ----------------------------------------------------------------------
+# Dump readers: each yields encoded (s, p, o) triples
+# ----------------------------------------------------------------------
+
+def open_dump(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def dump_format(path):
+    name = re.sub(r"\.(gz|bz2)$", "", path)
+    if name.endswith(".json"):
+        return "json"
+    if name.endswith(".nt"):
+        return "nt"
+    raise ValueError(f"cannot tell the dump format of {path} (expected .json or .nt)")
+
+
+_TIME = re.compile(r"^\+?(-?\d+)-(\d\d)-(\d\d)(T.*)$")
+
+
+def wikidata_time(value):
+    """"+1952-00-00T00:00:00Z" -> "1952-01-01T00:00:00Z", as in the RDF dumps."""
+    m = _TIME.match(value)
+    if not m:
+        return value.lstrip("+")
+    year, month, day, rest = m.groups()
+    return f"{year}-{month if month != '00' else '01'}-{day if day != '00' else '01'}{rest}"
+
+
+def snak_value(snak):
+    """Encoded object of a statement's main snak, or None (no value, unknown, unsupported)."""
+    if snak.get("snaktype") != "value":
+        return None
+    kind = snak["datavalue"]["type"]
+    value = snak["datavalue"]["value"]
+    if kind == "wikibase-entityid":
+        return encode_iri(WD + value["id"])
+    if kind == "time":
+        return encode_literal(wikidata_time(value["time"]), datatype=XSD + "dateTime")
+    if kind == "string":
+        return encode_literal(value)
+    if kind == "monolingualtext":
+        return encode_literal(value["text"], value["language"])
+    if kind == "quantity":
+        return encode_literal(value["amount"].lstrip("+"), datatype=XSD + "decimal")
+    if kind == "globecoordinate":
+        return encode_literal(f"Point({value['longitude']} {value['latitude']})",
+                              datatype=WKT_LITERAL)
+    return None
+
+
+def entity_triples(entity, properties, languages, entities=None):
+    """Triples of one JSON dump entity: labels, and truthy statements of `properties`."""
+    s = encode_iri(WD + entity["id"])
+    label = encode_iri(RDFS_LABEL)
+    for language in languages:
+        value = entity.get("labels", {}).get(language)
+        if value:
+            yield s, label, encode_literal(value["value"], language)
+    if entities is not None and entity["id"] not in entities:
+        return
+    claims = entity.get("claims", {})
+    for pid in properties:
+        statements = claims.get(pid, [])
+        # Truthy: the preferred statements if there are any, else the normal ones
+        best = [st for st in statements if st.get("rank") == "preferred"] or \
+               [st for st in statements if st.get("rank", "normal") == "normal"]
+        for st in best:
+            o = snak_value(st["mainsnak"])
+            if o is not None:
+                yield s, encode_iri(WDT + pid), o
+
+
+def iter_json_dump(lines, properties, languages, entities=None):
+    for line in lines:
+        line = line.strip().rstrip(",")
+        if line in ("", "[", "]"):
+            continue
+        yield from entity_triples(json.loads(line), properties, languages, entities)
+
+
+_NT_LINE = re.compile(r'^<([^>]*)>\s+<([^>]*)>\s+(.*?)\s*\.\s*$')
+_NT_LITERAL = re.compile(r'^"((?:[^"\\]|\\.)*)"(?:@([A-Za-z0-9-]+)|\^\^<([^>]*)>)?$')
+_NT_ESCAPE = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+_NT_CHARS = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f"}
+
+
+def _unescape(value):
+    def replace(m):
+        code = m.group(1)
+        if code[0] in "uU" and len(code) > 1:
+            return chr(int(code[1:], 16))
+        return _NT_CHARS.get(code, code)
+    return _NT_ESCAPE.sub(replace, value)
+
+
+def nt_object(text):
+    if text.startswith("<"):
+        return encode_iri(text[1:-1])
+    m = _NT_LITERAL.match(text)
+    if not m:
+        return None     # blank node or malformed
+    value, language, datatype = m.groups()
+    return encode_literal(_unescape(value), language or "", datatype or "")
+
+
+def iter_nt_dump(lines, properties, languages, entities=None):
+    predicates = {WDT + pid for pid in properties}
+    languages = set(languages)
+    for line in lines:
+        m = _NT_LINE.match(line)
+        if not m:
+            continue
+        s, p, o = m.groups()
+        if not s.startswith(WD):
+            continue
+        if p == RDFS_LABEL:
+            obj = nt_object(o)
+            if obj is None or obj.split(SEP)[1] not in languages:
+                continue
+        elif p in predicates:
+            if entities is not None and s[len(WD):] not in entities:
+                continue
+            obj = nt_object(o)
+            if obj is None:
+                continue
+        else:
+            continue
+        yield encode_iri(s), encode_iri(p), obj
+
+
+# ----------------------------------------------------------------------
+# Import
+# ----------------------------------------------------------------------
+
+def import_dump(path, out=None, properties=DEFAULT_PROPERTIES, languages=DEFAULT_LANGUAGES,
+                entities=None, progress=None):
+    """
+    Stream a dump into a mirror file.
+
+    The mirror is written to a temporary name and renamed, so readers never
+    see a partial file.
+
+    Args:
+        path: JSON or N-Triples dump, optionally .gz or .bz2
+        out: mirror file (default: ~/.cache/wikidata-examples/mirror.sqlite)
+        properties: property IDs whose truthy statements are kept
+        languages: label languages kept
+        entities: set of QIDs whose statements are kept (default: all)
+        progress: callable(lines read, triples kept so far, before removing
+            duplicates), called every INSERT_BATCH triples
+
+    Returns:
+        dict with lines, triples, seconds, path
+    """
+    out = str(out or default_mirror_path())
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    reader = iter_json_dump if dump_format(path) == "json" else iter_nt_dump
+    tmp = f"{out}.tmp{os.getpid()}"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    start = time.perf_counter()
+    db = sqlite3.connect(tmp)
+    db.execute("PRAGMA journal_mode=OFF")
+    db.execute("PRAGMA synchronous=OFF")
+    db.execute("CREATE TABLE triples (s TEXT, p TEXT, o TEXT, PRIMARY KEY (s, p, o)) WITHOUT ROWID")
+    db.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    lines = kept = 0
+
+    def counted(f):
+        nonlocal lines
+        for line in f:
+            lines += 1
+            yield line
+
+    batch = []
+    with open_dump(path) as f:
+        for triple in reader(counted(f), properties, languages, entities):
+            batch.append(triple)
+            if len(batch) >= INSERT_BATCH:
+                db.executemany("INSERT OR IGNORE INTO triples VALUES (?, ?, ?)", batch)
+                kept += len(batch)
+                batch.clear()
+                if progress:
+                    progress(lines, kept)
+    db.executemany("INSERT OR IGNORE INTO triples VALUES (?, ?, ?)", batch)
+
+    # Built after loading: one sorted pass instead of a B-tree insert per row
+    db.execute("CREATE INDEX pos ON triples (p, o, s)")
+    db.execute("CREATE INDEX osp ON triples (o, s, p)")
+    triples = db.execute("SELECT COUNT(*) FROM triples").fetchone()[0]
+    meta = {"source": os.path.abspath(path), "imported": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "properties": list(properties), "languages": list(languages),
+            "entities": len(entities) if entities is not None else None,
+            "triples": triples}
+    db.executemany("INSERT INTO meta VALUES (?, ?)",
+                   [(key, json.dumps(value)) for key, value in meta.items()])
+    db.commit()
+    db.execute("ANALYZE")
+    db.close()
+    os.replace(tmp, out)
+    return {"lines": lines, "triples": triples, "seconds": time.perf_counter() - start,
+            "path": out}
+
+
+# ----------------------------------------------------------------------
+# Querying
+# ----------------------------------------------------------------------
+
+class MirrorFile:
+    """Triple-pattern lookups on a mirror file (encoded terms)."""
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"no mirror at {path} (run: python mirror.py import DUMP)")
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    def meta(self):
+        with self.lock:
+            rows = self.db.execute("SELECT key, value FROM meta").fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM triples").fetchone()[0]
+
+    def triples(self, s=None, p=None, o=None):
+        """Encoded (s, p, o) rows matching the bound positions."""
+        where, params = [], []
+        for column, value in (("s", s), ("p", p), ("o", o)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        sql = "SELECT s, p, o FROM triples"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def _store_class():
+    from rdflib.store import Store
+
+    class MirrorStore(Store):
+        """Read-only rdflib Store over a MirrorFile."""
+
+        context_aware = False
+        formula_aware = False
+        transaction_aware = False
+        graph_aware = False
+
+        def __init__(self, configuration=None, identifier=None):
+            super().__init__(configuration)
+            self.identifier = identifier
+            self.mirror = None
+            self._namespace = {}
+            self._prefix = {}
+            if configuration:
+                self.open(configuration)
+
+        def open(self, configuration, create=False):
+            self.mirror = MirrorFile(configuration)
+
+        def close(self, commit_pending_transaction=False):
+            if self.mirror is not None:
+                self.mirror.close()
+                self.mirror = None
+
+        def add(self, triple, context=None, quoted=False):
+            raise TypeError("the Wikidata mirror is read-only")
+
+        def remove(self, triple_pattern, context=None):
+            raise TypeError("the Wikidata mirror is read-only")
+
+        def triples(self, triple_pattern, context=None):
+            pattern = []
+            for term in triple_pattern:
+                if term is None:
+                    pattern.append(None)
+                    continue
+                encoded = encode_term(term)
+                if encoded is None:
+                    return
+                pattern.append(encoded)
+            for row in self.mirror.triples(*pattern):
+                yield tuple(decode_term(x) for x in row), iter(())
+
+        def __len__(self, context=None):
+            return len(self.mirror)
+
+        def contexts(self, triple=None):
+            return iter(())
+
+        def bind(self, prefix, namespace, override=True):
+            if override or prefix not in self._namespace:
+                self._prefix.pop(self._namespace.get(prefix), None)
+                self._namespace[prefix] = namespace
+                self._prefix[namespace] = prefix
+
+        def namespace(self, prefix):
+            return self._namespace.get(prefix)
+
+        def prefix(self, namespace):
+            return self._prefix.get(namespace)
+
+        def namespaces(self):
+            return iter(list(self._namespace.items()))
+
+    return MirrorStore
+
+
+class Mirror:
+    """SPARQL over a mirror file, answering like the Wikidata Query Service."""
+
+    def __init__(self, path=None):
+        from rdflib import Graph, Namespace
+        self.path = str(path or default_mirror_path())
+        self.graph = Graph(store=_store_class()(self.path))
+        self.namespaces = {prefix: Namespace(uri) for prefix, uri in WIKIDATA_PREFIXES.items()}
+        for prefix, ns in self.namespaces.items():
+            self.graph.bind(prefix, ns)
+        # rdflib's SPARQL parser is not thread-safe
+        self.lock = threading.Lock()
+        # Parsing is most of the time of a small query; keep parsed queries
+        self.prepared = OrderedDict()
+
+    def _prepare(self, query):
+        from rdflib.plugins.sparql import prepareQuery
+        if query in self.prepared:
+            self.prepared.move_to_end(query)
+        else:
+            self.prepared[query] = prepareQuery(query, initNs=self.namespaces)
+            if len(self.prepared) > PREPARED_QUERIES:
+                self.prepared.popitem(last=False)
+        return self.prepared[query]
+
+    def query_json(self, query):
+        """SPARQL JSON results (bytes), as the endpoint would send them."""
+        with self.lock:
+            return self.graph.query(self._prepare(query)).serialize(format="json")
+
+    def query(self, query):
+        return json.loads(self.query_json(query))
+
+    def close(self):
+        self.graph.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query an offline Wikidata mirror")
+    parser.add_argument("--mirror", default=str(default_mirror_path()),
+                        help="mirror file (default: %(default)s)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="stream a JSON or N-Triples dump into the mirror")
+    imp.add_argument("dump", help="latest-all.json[.gz|.bz2] or *.nt[.gz|.bz2]")
+    imp.add_argument("--properties", nargs="+", default=list(DEFAULT_PROPERTIES),
+                     help="property IDs to keep (default: %(default)s)")
+    imp.add_argument("--languages", nargs="+", default=list(DEFAULT_LANGUAGES),
+                     help="label languages to keep (default: %(default)s)")
+    imp.add_argument("--entities", help="file of QIDs (one per line) whose statements are kept")
+    q = sub.add_parser("query", help="run a SPARQL query on the mirror")
+    q.add_argument("query", help="SPARQL query text, or @FILE")
+    sub.add_parser("info", help="show what the mirror holds")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        entities = None
+        if args.entities:
+            with open(args.entities) as f:
+                entities = {line.strip() for line in f if line.strip()}
+
+        def progress(lines, triples):
+            print(f"  {lines:,} lines read, {triples:,} triples kept", flush=True)
+
+        stats = import_dump(args.dump, args.mirror, args.properties, args.languages,
+                            entities, progress)
+        print(f"Imported {stats['triples']:,} triples from {stats['lines']:,} lines "
+              f"into {stats['path']} in {stats['seconds']:.2f}s")
+    elif args.command == "query":
+        text = open(args.query[1:]).read() if args.query.startswith("@") else args.query
+        mirror = Mirror(args.mirror)
+        start = time.perf_counter()
+        results = mirror.query(text)
+        elapsed = time.perf_counter() - start
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        print(f"{len(results['results']['bindings'])} row(s) in {elapsed * 1000:.1f} ms")
+    else:
+        mirror = MirrorFile(args.mirror)
+        print(json.dumps(dict(mirror.meta(), path=args.mirror,
+                              bytes=os.path.getsize(args.mirror)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
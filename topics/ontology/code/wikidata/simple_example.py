@@ -7,7 +7,7 @@ Start here before moving to douglas_adams_example.py
 Concept: "Douglas Adams was an English writer, born in 1952"
 """
 
-from SPARQLWrapper import SPARQLWrapper, JSON
+from sparql_client import default_client
 
 
 def simple_query():
@@ -21,10 +21,9 @@ def simple_query():
     - SERVICE: Get human-readable labels
     """
     
-    # Step 1: Create connection to Wikidata
-    endpoint = "https://query.wikidata.org/sparql"
-    sparql = SPARQLWrapper(endpoint)
-    sparql.addCustomHttpHeader("User-Agent", "Educational Example/1.0")
+    # Step 1: Get the shared connection to Wikidata
+    # (sparql_client.py keeps the connection open and caches answers on disk)
+    client = default_client()
     
     # Step 2: Write SPARQL query
     query = """
@@ -44,9 +43,7 @@ def simple_query():
     """
     
     # Step 3: Execute query
-    sparql.setQuery(query)
-    sparql.setReturnFormat(JSON)
-    results = sparql.query().convert()
+    results = client.query(query)
     
     # Step 4: Display results
     print("=== Simple Query Results ===\n")
@@ -166,7 +163,7 @@ def main():
         simple_query()
     except Exception as e:
         print(f"Query Error: {e}")
-        print("\nMake sure to install: pip install SPARQLWrapper")
+        print("\nCheck your network connection, or set WIKIDATA_SPARQL_ENDPOINT")
     
     print("=" * 70)
     print("Next Steps:")
@@ -0,0 +1,486 @@
+"""
+Shared SPARQL Client for the Wikidata Examples
+
+SPARQLWrapper opens a new connection for every query and keeps nothing, so
+each run of the examples pays the full TLS handshake and query time again.
+SPARQLClient keeps both:
+
+- connection pooling: HTTP/1.1 keep-alive connections are reused across
+  queries (and threads) instead of being opened per query
+- a persistent response cache (SQLite) keyed by the normalized query text,
+  so re-indenting a query or editing its comments does not miss the cache
+- TTL with stale-while-revalidate: a fresh entry is returned as is; an entry
+  older than `ttl` but within `stale` more seconds is returned at once and
+  refreshed in a background thread; anything older is fetched again
+
+The endpoint comes from the WIKIDATA_SPARQL_ENDPOINT environment variable
+(default: https://query.wikidata.org/sparql), so the examples can be run
+against a local stand-in endpoint:
+
+    WIKIDATA_SPARQL_ENDPOINT=http://localhost:8000/sparql python simple_example.py
+
+An endpoint of the form mirror:<file> answers from an offline mirror built
+by mirror.py instead (no HTTP, no response cache).
+
+Usage:
+    client = default_client()
+    results = client.query("SELECT ...")     # parsed SPARQL JSON results
+    print(client.stats.describe())
+
+Command line:
+    python sparql_client.py query "SELECT * WHERE { wd:Q42 ?p ?o } LIMIT 3"
+    python sparql_client.py info
+    python sparql_client.py clear
+"""
+
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+WIKIDATA_ENDPOINT = "https://query.wikidata.org/sparql"
+
+# Wikidata rejects requests without a descriptive User-Agent
+USER_AGENT = "Educational Example/1.0"
+
+# Queries whose encoded form is longer than this are sent as POST
+MAX_GET_LENGTH = 2000
+
+DEFAULT_TTL = 24 * 3600         # seconds an entry is fresh
+DEFAULT_STALE = 7 * 24 * 3600   # further seconds it may be served while refreshing
+
+
+class SPARQLError(Exception):
+    """The endpoint answered with an error status."""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.retry_after = retry_after      # seconds, from a Retry-After header
+
+
+def parse_retry_after(value, now=None):
+    """
+    Seconds to wait from a Retry-After header: delay-seconds ("120") or an
+    HTTP-date ("Wed, 21 Oct 2015 07:28:00 GMT"). None if absent or invalid.
+    """
+    value = (value or "").strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:         # RFC 9110 dates are always GMT
+        when = when.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (when - now).total_seconds())
+
+
+def default_cache_path():
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "wikidata-examples" / "sparql-cache.sqlite"
+
+
+# ----------------------------------------------------------------------
+# Query normalization
+# ----------------------------------------------------------------------
+
+_IRI = re.compile(r'<[^<>"{}|^`\\\s]*>')
+_STRING = re.compile(r'"""(?:[^\\]|\\.)*?"""|\'\'\'(?:[^\\]|\\.)*?\'\'\''
+                     r'|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'', re.S)
+
+
+def normalize_query(query):
+    """
+    The query text without comments and with whitespace runs collapsed.
+
+    IRIs and string literals are copied unchanged, so a '#' inside
+    <http://...#x> or "a # b" is not mistaken for a comment.
+    """
+    out = []
+    i, n = 0, len(query)
+    while i < n:
+        ch = query[i]
+        if ch == "#":
+            end = query.find("\n", i)
+            i = n if end < 0 else end
+            continue
+        if ch.isspace():
+            while i < n and query[i].isspace():
+                i += 1
+            if out and out[-1] != " ":
+                out.append(" ")
+            continue
+        match = (ch == "<" and _IRI.match(query, i)) or \
+                (ch in "\"'" and _STRING.match(query, i))
+        if match:
+            out.append(match.group())
+            i = match.end()
+            continue
+        out.append(ch)
+        i += 1
+    return "".join(out).strip()
+
+
+def cache_key(endpoint, query):
+    text = endpoint + "\n" + normalize_query(query)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Connection pool
+# ----------------------------------------------------------------------
+
+class ConnectionPool:
+    """Idle keep-alive connections to one host, shared between threads."""
+
+    def __init__(self, endpoint, size=5, timeout=60):
+        parts = urlsplit(endpoint)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"unsupported endpoint: {endpoint}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path or "/"
+        self.size = size
+        self.timeout = timeout
+        self.idle = []
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        self.opened += 1
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def acquire(self):
+        """(connection, reused)"""
+        with self.lock:
+            if self.idle:
+                return self.idle.pop(), True
+        return self._connect(), False
+
+    def release(self, conn):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, method, url, body=None, headers=None):
+        """
+        Send one request and read the whole response.
+
+        A reused connection the server has meanwhile closed fails on first
+        use; the request is then retried once on a new connection.
+
+        Returns:
+            (status, headers, body bytes)
+        """
+        conn, reused = self.acquire()
+        try:
+            try:
+                conn.request(method, url, body=body, headers=headers or {})
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if not reused:
+                    raise
+                conn.close()
+                conn = self._connect()
+                conn.request(method, url, body=body, headers=headers or {})
+                response = conn.getresponse()
+            data = response.read()
+        except BaseException:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self.release(conn)
+        return response.status, response.headers, data
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+
+# ----------------------------------------------------------------------
+# Persistent response cache
+# ----------------------------------------------------------------------
+
+class ResponseCache:
+    """SQLite table: cache key -> (fetched time, response body)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                               key TEXT PRIMARY KEY,
+                               endpoint TEXT,
+                               query TEXT,
+                               fetched REAL,
+                               body BLOB)""")
+        self.db.commit()
+
+    def get(self, key):
+        """(fetched time, body) or None"""
+        with self.lock:
+            return self.db.execute("SELECT fetched, body FROM responses WHERE key = ?",
+                                   (key,)).fetchone()
+
+    def put(self, key, endpoint, query, body, fetched=None):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                            (key, endpoint, normalize_query(query),
+                             time.time() if fetched is None else fetched, body))
+            self.db.commit()
+
+    def info(self):
+        with self.lock:
+            count, size, oldest = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0), MIN(fetched) "
+                "FROM responses").fetchone()
+        return {"path": str(self.path), "entries": count, "bytes": size,
+                "oldest": oldest}
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM responses")
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+# ----------------------------------------------------------------------
+# Client
+# ----------------------------------------------------------------------
+
+@dataclass
+class ClientStats:
+    fresh: int = 0          # answered from a fresh cache entry
+    stale: int = 0          # answered from a stale entry, refreshed in the background
+    misses: int = 0         # fetched before answering
+    requests: int = 0       # HTTP requests sent (including refreshes)
+    fetch_seconds: float = 0.0
+
+    def describe(self):
+        return (f"{self.fresh} fresh / {self.stale} stale / {self.misses} miss(es), "
+                f"{self.requests} HTTP request(s) in {self.fetch_seconds:.2f}s")
+
+
+class SPARQLClient:
+    """SPARQL SELECT/ASK queries with pooled connections and a response cache."""
+
+    def __init__(self, endpoint=None, cache_path=None, ttl=DEFAULT_TTL,
+                 stale=DEFAULT_STALE, use_cache=True, pool_size=5, timeout=60,
+                 user_agent=USER_AGENT):
+        """
+        Args:
+            endpoint: SPARQL endpoint URL (default: $WIKIDATA_SPARQL_ENDPOINT or Wikidata)
+            cache_path: SQLite file (default: ~/.cache/wikidata-examples/sparql-cache.sqlite)
+            ttl, stale: seconds an entry is fresh / may be served stale afterwards
+            use_cache: False to always fetch (nothing is read or written)
+        """
+        self.endpoint = endpoint or os.environ.get("WIKIDATA_SPARQL_ENDPOINT") or WIKIDATA_ENDPOINT
+        if self.endpoint.startswith("mirror:"):
+            # Local answers take milliseconds; caching them would only go stale
+            from mirror import Mirror
+            self.mirror = Mirror(self.endpoint[len("mirror:"):])
+            self.pool = None
+            use_cache = False
+        else:
+            self.mirror = None
+            self.pool = ConnectionPool(self.endpoint, size=pool_size, timeout=timeout)
+        self.cache = ResponseCache(cache_path or default_cache_path()) if use_cache else None
+        self.ttl = ttl
+        self.stale = stale
+        self.user_agent = user_agent
+        self.stats = ClientStats()
+        self.refreshing = {}            # cache key -> background refresh thread
+        self.lock = threading.Lock()
+
+    def fetch(self, query):
+        """Send the query to the endpoint; returns the raw response body."""
+        if self.mirror is not None:
+            start = time.perf_counter()
+            data = self.mirror.query_json(query)
+            with self.lock:
+                self.stats.requests += 1
+                self.stats.fetch_seconds += time.perf_counter() - start
+            return data
+
+        params = urlencode({"query": query})
+        headers = {"Accept": "application/sparql-results+json",
+                   "User-Agent": self.user_agent}
+        if len(params) <= MAX_GET_LENGTH:
+            method, url, body = "GET", f"{self.pool.path}?{params}", None
+        else:
+            method, url, body = "POST", self.pool.path, params.encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        start = time.perf_counter()
+        status, response_headers, data = self.pool.request(method, url, body, headers)
+        with self.lock:
+            self.stats.requests += 1
+            self.stats.fetch_seconds += time.perf_counter() - start
+        if status != 200:
+            raise SPARQLError(status, data.decode("utf-8", "replace").strip()[:200],
+                              parse_retry_after(response_headers.get("Retry-After")))
+        return data
+
+    def _fetch_and_store(self, key, query):
+        data = self.fetch(query)
+        # Only cache what parses, so a broken body is not served for a day
+        results = json.loads(data)
+        if self.cache is not None:
+            self.cache.put(key, self.endpoint, query, data)
+        return results
+
+    def _refresh(self, key, query):
+        try:
+            self._fetch_and_store(key, query)
+        except (OSError, ValueError, http.client.HTTPException, SPARQLError):
+            pass        # keep serving the stale entry; the next query retries
+        finally:
+            with self.lock:
+                self.refreshing.pop(key, None)
+
+    def _revalidate(self, key, query):
+        with self.lock:
+            if key in self.refreshing:
+                return
+            thread = threading.Thread(target=self._refresh, args=(key, query), daemon=True)
+            self.refreshing[key] = thread
+        thread.start()
+
+    def cached(self, query):
+        """
+        The cached results of a query, or None if it has to be fetched.
+
+        A stale entry is returned and refreshed in the background.
+        """
+        entry = None
+        if self.cache is not None:
+            key = cache_key(self.endpoint, query)
+            entry = self.cache.get(key)
+        if entry is None:
+            with self.lock:
+                self.stats.misses += 1
+            return None
+        fetched, data = entry
+        age = time.time() - fetched
+        if age < self.ttl:
+            with self.lock:
+                self.stats.fresh += 1
+            return json.loads(data)
+        if age < self.ttl + self.stale:
+            with self.lock:
+                self.stats.stale += 1
+            self._revalidate(key, query)
+            return json.loads(data)
+        with self.lock:
+            self.stats.misses += 1
+        return None
+
+    def fetch_results(self, query):
+        """Fetch the query's results (ignoring the cache) and cache them."""
+        return self._fetch_and_store(cache_key(self.endpoint, query), query)
+
+    def query(self, query):
+        """
+        Run a SPARQL query; returns the parsed JSON results.
+
+        Raises:
+            SPARQLError: the endpoint answered with an error status
+            OSError: the endpoint could not be reached
+        """
+        results = self.cached(query)
+        if results is None:
+            results = self.fetch_results(query)
+        return results
+
+    def close(self, wait=5.0):
+        """Let background refreshes finish (up to `wait` seconds), then close."""
+        deadline = time.monotonic() + wait
+        while True:
+            with self.lock:
+                threads = list(self.refreshing.values())
+            if not threads:
+                break
+            threads[0].join(max(0.0, deadline - time.monotonic()))
+            if time.monotonic() >= deadline:
+                break
+        if self.pool is not None:
+            self.pool.close()
+        if self.mirror is not None:
+            self.mirror.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_client():
+    """The process-wide client shared by the example scripts."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = SPARQLClient()
+        return _default
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached SPARQL client for the Wikidata examples")
+    parser.add_argument("--endpoint", help="SPARQL endpoint URL (default: $WIKIDATA_SPARQL_ENDPOINT or Wikidata)")
+    parser.add_argument("--cache", help="cache file (default: %(default)s)", default=str(default_cache_path()))
+    sub = parser.add_subparsers(dest="command", required=True)
+    q = sub.add_parser("query", help="run a query and print the JSON results")
+    q.add_argument("query", help="SPARQL query text, or @FILE")
+    q.add_argument("--no-cache", action="store_true", help="always fetch, do not touch the cache")
+    sub.add_parser("info", help="show the cache size")
+    sub.add_parser("clear", help="delete all cache entries")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        print(json.dumps(ResponseCache(args.cache).info(), indent=2))
+        return
+    if args.command == "clear":
+        ResponseCache(args.cache).clear()
+        print(f"Cleared {args.cache}")
+        return
+
+    text = Path(args.query[1:]).read_text() if args.query.startswith("@") else args.query
+    with SPARQLClient(args.endpoint, args.cache, use_cache=not args.no_cache) as client:
+        print(json.dumps(client.query(text), indent=2, ensure_ascii=False))
+        print(client.stats.describe(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
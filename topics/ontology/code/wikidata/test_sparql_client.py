@@ -0,0 +1,217 @@
+"""
+Checks for sparql_client.py against a stand-in SPARQL endpoint
+
+The stand-in is an http.server on an ephemeral port that answers every
+query with SPARQL JSON results naming the query it saw, and records each
+request (method, query, connection), so the checks run without network.
+
+Run:
+    python -m pytest test_sparql_client.py
+    python -m unittest test_sparql_client
+"""
+
+import json
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from sparql_client import (MAX_GET_LENGTH, SPARQLClient, SPARQLError, cache_key,
+                           parse_retry_after)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _answer(self, query):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.command, query, self.client_address))
+            failure = server.failures.pop(0) if server.failures else None
+        if failure is not None:
+            status, retry_after = failure
+            body = b"busy"
+            self.send_response(status)
+            self.send_header("Retry-After", retry_after)
+        else:
+            server.answered += 1
+            body = json.dumps({
+                "head": {"vars": ["query", "n"]},
+                "results": {"bindings": [{
+                    "query": {"type": "literal", "value": query},
+                    "n": {"type": "literal", "value": str(server.answered)},
+                }]},
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/sparql-results+json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._answer(parse_qs(urlsplit(self.path).query)["query"][0])
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+        self._answer(parse_qs(body)["query"][0])
+
+
+class StandInServer(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.requests = []      # (method, query, client address)
+        self.failures = []      # (status, Retry-After) answered before any results
+        self.answered = 0
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/sparql"
+
+
+def answer_number(results):
+    return int(results["results"]["bindings"][0]["n"]["value"])
+
+
+class SPARQLClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def client(self, **options):
+        client = SPARQLClient(self.server.endpoint,
+                              cache_path=Path(self.tmp.name) / "cache.sqlite", **options)
+        self.clients.append(client)
+        return client
+
+    def test_connections_are_reused(self):
+        client = self.client(use_cache=False)
+        for i in range(5):
+            client.query(f"SELECT * WHERE {{ ?s ?p {i} }}")
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(client.pool.opened, 1)
+        self.assertEqual(len({address for _, _, address in self.server.requests}), 1)
+
+    def test_fresh_entries_are_served_from_the_cache(self):
+        client = self.client()
+        first = client.query("SELECT * WHERE { ?s ?p ?o }")
+        # Re-indented and commented: the same normalized query
+        again = client.query("SELECT *   # everything\nWHERE {\n  ?s ?p ?o\n}")
+        self.assertEqual(again, first)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual((client.stats.fresh, client.stats.misses), (1, 1))
+
+    def test_stale_entries_are_served_and_refreshed_in_the_background(self):
+        query = "SELECT * WHERE { ?s ?p ?o }"
+        client = self.client(ttl=60, stale=3600)
+        client.query(query)
+        key = cache_key(client.endpoint, query)
+        fetched, body = client.cache.get(key)
+        client.cache.put(key, client.endpoint, query, body, fetched=fetched - 120)
+
+        stale = client.query(query)
+        self.assertEqual(answer_number(stale), 1)       # the old answer, at once
+        self.assertEqual(client.stats.stale, 1)
+        with client.lock:
+            refreshes = list(client.refreshing.values())
+        for thread in refreshes:
+            thread.join(5)
+        refreshed, _ = client.cache.get(key)
+        self.assertGreater(refreshed, fetched - 60)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(answer_number(self.client(ttl=60, stale=3600).query(query)), 2)
+
+    def test_failed_refresh_keeps_the_stale_entry(self):
+        query = "SELECT * WHERE { ?s ?p ?o }"
+        client = self.client(ttl=60, stale=3600)
+        client.query(query)
+        key = cache_key(client.endpoint, query)
+        fetched, body = client.cache.get(key)
+        client.cache.put(key, client.endpoint, query, body, fetched=fetched - 120)
+
+        errors = []
+        previous_hook = threading.excepthook
+        threading.excepthook = errors.append
+        try:
+            self.server.failures = [(503, "30")]
+            self.assertEqual(answer_number(client.query(query)), 1)
+            with client.lock:
+                refreshes = list(client.refreshing.values())
+            for thread in refreshes:
+                thread.join(5)
+        finally:
+            threading.excepthook = previous_hook
+        self.assertEqual(errors, [])
+        self.assertEqual(client.refreshing, {})
+        self.assertEqual(client.cache.get(key)[0], fetched - 120)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_expired_entries_are_fetched_again(self):
+        query = "SELECT * WHERE { ?s ?p ?o }"
+        client = self.client(ttl=60, stale=60)
+        client.query(query)
+        key = cache_key(client.endpoint, query)
+        _, body = client.cache.get(key)
+        client.cache.put(key, client.endpoint, query, body, fetched=time.time() - 300)
+
+        results = client.query(query)
+        self.assertEqual(answer_number(results), 2)
+        self.assertEqual((client.stats.stale, client.stats.misses), (0, 2))
+
+    def test_long_queries_are_posted(self):
+        client = self.client(use_cache=False)
+        values = " ".join(f"wd:Q{i}" for i in range(MAX_GET_LENGTH // 5))
+        query = f"SELECT * WHERE {{ VALUES ?item {{ {values} }} }}"
+        results = client.query(query)
+        method, seen, _ = self.server.requests[-1]
+        self.assertEqual(method, "POST")
+        self.assertEqual(seen, query)
+        self.assertEqual(results["results"]["bindings"][0]["query"]["value"], query)
+
+        client.query("ASK {}")
+        self.assertEqual(self.server.requests[-1][0], "GET")
+
+    def test_error_status_carries_retry_after(self):
+        client = self.client(use_cache=False)
+        later = datetime.now(timezone.utc) + timedelta(seconds=90)
+        self.server.failures = [(429, "7"), (503, format_datetime(later, usegmt=True))]
+        with self.assertRaises(SPARQLError) as seconds:
+            client.query("ASK {}")
+        self.assertEqual((seconds.exception.status, seconds.exception.retry_after), (429, 7.0))
+        with self.assertRaises(SPARQLError) as date:
+            client.query("ASK {}")
+        self.assertEqual(date.exception.status, 503)
+        self.assertAlmostEqual(date.exception.retry_after, 90, delta=5)
+
+
+class RetryAfterTest(unittest.TestCase):
+    def test_forms(self):
+        now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self.assertEqual(parse_retry_after("120"), 120.0)
+        self.assertEqual(parse_retry_after("Thu, 01 Jan 2026 00:00:30 GMT", now), 30.0)
+        self.assertEqual(parse_retry_after("Wed, 31 Dec 2025 23:00:00 GMT", now), 0.0)
+        for value in (None, "", "soon", "-5"):
+            self.assertIsNone(parse_retry_after(value))
+
+
+if __name__ == "__main__":
+    unittest.main()
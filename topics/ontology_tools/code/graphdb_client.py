@@ -0,0 +1,430 @@
+"""
+Streaming GraphDB Repository Client
+
+run.py used to send one requests.get() per query and call response.json()
+on the whole answer, so a large SELECT was buffered and decoded in one
+piece before the first row could be printed. GraphDBClient instead:
+
+- keeps a requests.Session whose pooled keep-alive connections are reused
+  across queries
+- sends short queries as GET and long ones (over MAX_GET_LENGTH characters
+  once URL-encoded) as a form-encoded POST
+- retries connection errors and 429/5xx answers with exponential backoff,
+  honouring Retry-After (urllib3 Retry on the session's adapter)
+- parses the answer while it is downloaded and yields one binding at a
+  time, in any of the three SPARQL result formats:
+
+      json  application/sparql-results+json
+      tsv   text/tab-separated-values
+      csv   text/csv
+
+Rows are dicts in the shape of the JSON format's bindings whatever the
+format: {"person": {"type": "uri", "value": "http://..."}}. TSV carries the
+same term information as JSON; CSV carries none, so its bindings have only
+a "value". Unbound variables are left out of the row.
+
+Only the rows not yet consumed are held in memory, so memory stays flat
+however many rows the answer has. Retries happen before the first row; an
+answer broken off mid-stream raises instead of being retried, as its
+earlier rows have already been handed out.
+
+Usage:
+    with GraphDBClient("http://localhost:7200/repositories/food") as client:
+        for row in client.select(query, format="tsv"):
+            print(row["person"]["value"])
+
+Command line:
+    python graphdb_client.py "SELECT * WHERE { ?s ?p ?o } LIMIT 10"
+    python graphdb_client.py @big.rq --format tsv --count
+"""
+
+import argparse
+import codecs
+import csv
+import json
+import re
+import sys
+import time
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_ENDPOINT = "http://mini23:7200/repositories/food"
+
+FORMATS = {
+    "json": "application/sparql-results+json",
+    "tsv": "text/tab-separated-values",
+    "csv": "text/csv",
+}
+
+# Rate limited, or a server-side hiccup
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Longer queries are POSTed: many servers and proxies cap URLs near 8 KB
+MAX_GET_LENGTH = 2000
+
+CHUNK_SIZE = 64 * 1024
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+
+class GraphDBError(Exception):
+    """The repository answered with an HTTP error status (after retries)."""
+
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+
+
+# ----------------------------------------------------------------------
+# Incremental text input
+# ----------------------------------------------------------------------
+
+def _iter_text(response, chunk_size=CHUNK_SIZE):
+    """The body as text chunks; SPARQL result formats are always UTF-8."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in response.iter_content(chunk_size):
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+def _iter_lines(chunks):
+    """Lines (with their line ends) from text chunks."""
+    rest = ""
+    for chunk in chunks:
+        lines = (rest + chunk).split("\n")
+        rest = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if rest:
+        yield rest
+
+
+# ----------------------------------------------------------------------
+# application/sparql-results+json
+# ----------------------------------------------------------------------
+
+_WS = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class _JSONReader:
+    """Reads one JSON document value by value from text chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _more(self, want=1):
+        """Append chunks until at least `want` more characters are buffered."""
+        # Drop the text already consumed so the buffer stays chunk-sized
+        pieces = [self.buf[self.pos:]]
+        added = 0
+        while added < want:
+            try:
+                chunk = next(self.chunks)
+            except StopIteration:
+                self.eof = True
+                break
+            pieces.append(chunk)
+            added += len(chunk)
+        self.buf = "".join(pieces)
+        self.pos = 0
+        return added > 0
+
+    def peek(self):
+        """The next non-whitespace character without consuming it ("" at the end)."""
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"malformed SPARQL JSON results: expected {char!r} "
+                             f"near {self.buf[self.pos:self.pos + 40]!r}")
+        self.pos += 1
+
+    def skip(self, char):
+        """Consume char if it comes next."""
+        if self.peek() == char:
+            self.pos += 1
+
+    def value(self):
+        """The next complete JSON value (an object, string, ...)."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+                # A value ending at the buffer end may continue in the next
+                # chunk (a number), so it only counts once more text follows
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # At least double the unread text before decoding again, so a
+            # value spanning many chunks (a long literal) is re-decoded only
+            # O(log n) times instead of once per chunk
+            self._more(max(1, len(self.buf) - self.pos))
+
+
+def _parse_json(stream, chunks):
+    """Yield the bindings of a JSON answer; stream.vars is set from its head."""
+    reader = _JSONReader(chunks)
+    reader.expect("{")
+    while reader.peek() != "}":
+        key = reader.value()
+        reader.expect(":")
+        if key == "results":
+            reader.expect("{")
+            while reader.peek() != "}":
+                member = reader.value()
+                reader.expect(":")
+                if member == "bindings":
+                    reader.expect("[")
+                    while reader.peek() != "]":
+                        yield reader.value()
+                        reader.skip(",")
+                    reader.expect("]")
+                else:
+                    reader.value()
+                reader.skip(",")
+            reader.expect("}")
+        elif key == "head":
+            stream.vars = reader.value().get("vars", [])
+        else:
+            reader.value()
+        reader.skip(",")
+
+
+# ----------------------------------------------------------------------
+# text/tab-separated-values
+# ----------------------------------------------------------------------
+
+_TSV_TERM = re.compile(
+    r'<([^>]*)>'                                    # IRI
+    r'|_:(\S+)'                                     # blank node
+    r'|"((?:[^"\\]|\\.)*)"(?:@([A-Za-z0-9-]+)|\^\^<([^>]*)>)?'   # literal
+    r'|(true|false)'
+    r'|([+-]?[0-9]+)'
+    r'|([+-]?[0-9]*\.[0-9]+)'
+    r'|([+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)[eE][+-]?[0-9]+)')
+
+_ESCAPE = re.compile(r'\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))')
+_ESCAPES = {"t": "\t", "n": "\n", "r": "\r", "b": "\b", "f": "\f",
+            '"': '"', "'": "'", "\\": "\\"}
+
+
+def _unescape(text):
+    if "\\" not in text:
+        return text
+    return _ESCAPE.sub(lambda m: chr(int(m.group(1) or m.group(2), 16)) if m.group(3) is None
+                       else _ESCAPES.get(m.group(3), m.group(0)), text)
+
+
+def tsv_term(text):
+    """A TSV field (Turtle term syntax) as a SPARQL JSON binding value."""
+    m = _TSV_TERM.fullmatch(text)
+    if m is None:
+        raise ValueError(f"malformed SPARQL TSV term: {text[:60]!r}")
+    iri, bnode, lexical, lang, datatype, boolean, integer, decimal, double = m.groups()
+    if iri is not None:
+        return {"type": "uri", "value": _unescape(iri)}
+    if bnode is not None:
+        return {"type": "bnode", "value": bnode}
+    if lexical is not None:
+        term = {"type": "literal", "value": _unescape(lexical)}
+        if lang:
+            term["xml:lang"] = lang
+        elif datatype:
+            term["datatype"] = datatype
+        return term
+    # Turtle shorthand for booleans and numbers
+    for value, name in ((boolean, "boolean"), (integer, "integer"),
+                        (decimal, "decimal"), (double, "double")):
+        if value is not None:
+            return {"type": "literal", "value": value, "datatype": XSD + name}
+
+
+def _parse_tsv(stream, chunks):
+    lines = _iter_lines(chunks)
+    header = next(lines, "").rstrip("\r\n")
+    stream.vars = [name.lstrip("?$") for name in header.split("\t")] if header else []
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line and len(stream.vars) != 1:
+            continue
+        yield {var: tsv_term(field)
+               for var, field in zip(stream.vars, line.split("\t")) if field}
+
+
+# ----------------------------------------------------------------------
+# text/csv
+# ----------------------------------------------------------------------
+
+def _parse_csv(stream, chunks):
+    # csv.reader joins quoted fields that span lines itself
+    reader = csv.reader(_iter_lines(chunks))
+    stream.vars = next(reader, [])
+    for fields in reader:
+        yield {var: {"value": field} for var, field in zip(stream.vars, fields) if field}
+
+
+PARSERS = {"json": _parse_json, "tsv": _parse_tsv, "csv": _parse_csv}
+
+
+# ----------------------------------------------------------------------
+# Client
+# ----------------------------------------------------------------------
+
+class ResultStream:
+    """
+    The bindings of one SELECT answer, parsed while it downloads.
+
+    Iterate once. `vars` is set as soon as the header has been read: by
+    the time the first row is yielded for TSV, CSV and JSON that puts
+    "head" first (GraphDB does), only at the end for JSON that puts it
+    last (rdflib's serializer does). The connection goes back to the
+    pool once all rows have been read; closing the stream early (or
+    breaking out of the loop) closes the connection instead, since the rest
+    of the answer would have to be downloaded first.
+    """
+
+    def __init__(self, response, format, chunk_size=CHUNK_SIZE):
+        self.response = response
+        self.format = format
+        self.vars = None
+        self._text = _iter_text(response, chunk_size)
+        self._rows = PARSERS[format](self, self._text)
+
+    def __iter__(self):
+        try:
+            yield from self._rows
+            # Read what follows the document (whitespace, the chunked
+            # terminator) so that the connection can be reused
+            for _ in self._text:
+                pass
+        finally:
+            self.close()
+
+    def close(self):
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GraphDBClient:
+    """SELECT queries against one GraphDB (or any SPARQL 1.1) repository."""
+
+    def __init__(self, endpoint=DEFAULT_ENDPOINT, timeout=30, retries=3, backoff=0.5,
+                 pool_size=4, max_get_length=MAX_GET_LENGTH, session=None):
+        """
+        Args:
+            endpoint: repository URL, e.g. http://localhost:7200/repositories/food
+            timeout: seconds to connect, and at most between two received chunks
+            retries: attempts after the first for connection errors and 429/5xx
+            backoff: first retry delay in seconds, doubled per attempt
+            pool_size: keep-alive connections kept open to the repository
+            max_get_length: URL-encoded query length above which POST is used
+            session: requests.Session to use as is (default: a new pooled one)
+        """
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.max_get_length = max_get_length
+        if session is None:
+            session = requests.Session()
+            retry = Retry(total=retries, backoff_factor=backoff,
+                          status_forcelist=RETRY_STATUSES,
+                          allowed_methods=frozenset({"GET", "POST"}),   # queries are read-only
+                          respect_retry_after_header=True, raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+    def _send(self, query, accept):
+        headers = {"Accept": accept}
+        params = {"query": query}
+        if len(urlencode(params)) <= self.max_get_length:
+            response = self.session.get(self.endpoint, params=params, headers=headers,
+                                        timeout=self.timeout, stream=True)
+        else:
+            response = self.session.post(self.endpoint, data=params, headers=headers,
+                                         timeout=self.timeout, stream=True)
+        if response.status_code >= 400:
+            try:
+                message = response.text[:500].strip() or response.reason
+            finally:
+                response.close()
+            raise GraphDBError(response.status_code, message)
+        return response
+
+    def select(self, query, format="json", chunk_size=CHUNK_SIZE):
+        """
+        Run a SELECT query.
+
+        Args:
+            query: SPARQL query text
+            format: "json", "tsv" or "csv" (see the module docstring)
+            chunk_size: bytes read from the connection at a time
+
+        Returns:
+            ResultStream yielding one binding dict per row
+        """
+        if format not in FORMATS:
+            raise ValueError(f"unknown result format: {format!r} (expected one of {', '.join(FORMATS)})")
+        return ResultStream(self._send(query, FORMATS[format]), format, chunk_size)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream the rows of a SELECT query from a GraphDB repository")
+    parser.add_argument("query", help="SPARQL query text, or @FILE")
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT, help="repository URL (default: %(default)s)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="json",
+                        help="result format requested (default: %(default)s)")
+    parser.add_argument("--count", action="store_true", help="only count the rows")
+    args = parser.parse_args()
+
+    query = args.query
+    if query.startswith("@"):
+        with open(query[1:]) as f:
+            query = f.read()
+
+    start = time.perf_counter()
+    count = 0
+    with GraphDBClient(args.endpoint) as client:
+        rows = client.select(query, format=args.format)
+        for row in rows:
+            count += 1
+            if not args.count:
+                print("\t".join(row[var]["value"] if var in row else "" for var in rows.vars))
+    print(f"{count:,} row(s) in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,68 @@
+import argparse
+import sys
+from pathlib import Path
+
 from pyshacl import validate
 from rdflib import Graph
 
+# 공용 헬퍼: topics/ontology/code/common
+sys.path.insert(0, str(Path(__file__).resolve().parents[4] / "ontology" / "code"))
+from common import trace
+from common.trace import span
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--trace", metavar="FILE",
+                    help="단계별 시간 측정 결과를 JSON으로 FILE에 기록 (또는 ONTOLOGY_TRACE 설정)")
+parser.add_argument("--workers", type=int, metavar="N",
+                    help="focus node 샤드를 N개 프로세스에서 병렬 검증")
+parser.add_argument("--jsonl", metavar="FILE",
+                    help="위반 사항을 찾는 즉시 JSON lines로 FILE에 기록 ('-'는 stdout); "
+                         "종료 코드 0=적합, 1=위반, 2=위반 없이 중단")
+parser.add_argument("--max-violations", type=int, metavar="N",
+                    help="--jsonl: 위반 N개 후 중단")
+parser.add_argument("--max-per-shape", type=int, metavar="N",
+                    help="--jsonl: property shape별 위반 N개 후 해당 shape 검사 중단")
+parser.add_argument("--time-budget", type=float, metavar="SECONDS",
+                    help="--jsonl: SECONDS초 후 검증 중단")
+args = parser.parse_args()
+
+if args.trace:
+    trace.enable(args.trace)
+
 # 1. 데이터 + Shape 로드
 data_graph = Graph()
-data_graph.parse("food-safety-shacl.ttl", format="turtle")
+with span("parse", graph=data_graph, file="food-safety-shacl.ttl"):
+    data_graph.parse("food-safety-shacl.ttl", format="turtle")
 
 # 2. SHACL 검증 실행
-conforms, results_graph, results_text = validate(
-    data_graph,
-    shacl_graph=data_graph,  # 같은 파일에 Shape 포함
-    inference='rdfs',
-    abort_on_first=False,
-)
+if args.jsonl:
+    from common.shacl_stream import exit_status, stream_validation
+    out = sys.stdout if args.jsonl == "-" else open(args.jsonl, "w")
+    with span("validate_stream", inference="rdfs") as timing:
+        summary = stream_validation(
+            data_graph, data_graph, out, inference='rdfs',
+            max_total=args.max_violations, max_per_shape=args.max_per_shape,
+            time_budget=args.time_budget)
+        timing.set(violations=summary["violations"], stopped=summary["stopped"])
+    if out is not sys.stdout:
+        out.close()
+        print(f"Conforms: {summary['conforms']} ({summary['violations']} violation(s) → {args.jsonl})")
+    # 위반이 있으면 1, 위반 없이 예산 초과로 중단되면 2 (CI 게이트용)
+    sys.exit(exit_status(summary))
+
+with span("validate", inference="rdfs", workers=args.workers or 1) as timing:
+    if args.workers:
+        from common.parallel_shacl import validate_parallel
+        conforms, results_graph, results_text = validate_parallel(
+            data_graph, data_graph, workers=args.workers, inference='rdfs')
+    else:
+        conforms, results_graph, results_text = validate(
+            data_graph,
+            shacl_graph=data_graph,  # 같은 파일에 Shape 포함
+            inference='rdfs',
+            abort_on_first=False,
+        )
+    timing.set(conforms=conforms)
 
 # 3. 결과 출력
 print("=" * 50)
@@ -1,4 +1,13 @@
-import requests
+import argparse
+import sys
+from pathlib import Path
+
+from graphdb_client import GraphDBClient
+
+# 공용 헬퍼: topics/ontology/code/common
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "ontology" / "code"))
+from common import trace
+from common.trace import span
 
 endpoint = "http://mini23:7200/repositories/food"
 
@@ -10,16 +19,23 @@ SELECT ?person WHERE {
 }
 """
 
-response = requests.get(
-    endpoint,
-    headers={"Accept": "application/sparql-results+json"},
-    params={"query": query},
-    timeout=30,
-)
-
-response.raise_for_status()
+parser = argparse.ArgumentParser()
+parser.add_argument("--trace", metavar="FILE",
+                    help="단계별 시간 측정 결과를 JSON으로 FILE에 기록 (또는 ONTOLOGY_TRACE 설정)")
+parser.add_argument("--endpoint", default=endpoint,
+                    help="GraphDB repository URL (기본값: %(default)s)")
+parser.add_argument("--format", choices=["json", "tsv", "csv"], default="json",
+                    help="결과 형식; 어느 형식이든 받는 즉시 한 행씩 처리")
+args = parser.parse_args()
 
-data = response.json()
+if args.trace:
+    trace.enable(args.trace)
 
-for row in data["results"]["bindings"]:
-    print(row["person"]["value"])
\ No newline at end of file
+# 세션의 keep-alive 연결을 재사용하고, 응답 전체를 버퍼링하지 않고 스트리밍
+with GraphDBClient(args.endpoint, timeout=30) as client:
+    with span("query", endpoint=args.endpoint, format=args.format) as timing:
+        rows = 0
+        for row in client.select(query, format=args.format):
+            print(row["person"]["value"])
+            rows += 1
+        timing.rows = rows
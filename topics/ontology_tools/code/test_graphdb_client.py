@@ -0,0 +1,193 @@
+"""
+Checks for graphdb_client.py against a stand-in repository
+
+The stand-in is an http.server on an ephemeral port that answers SELECT
+queries with chunked responses in JSON, TSV or CSV (by the Accept header),
+like GraphDB does, and can be told to fail the next requests with 503.
+
+Run:
+    python -m pytest test_graphdb_client.py
+    python -m unittest test_graphdb_client
+"""
+
+import json
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from graphdb_client import MAX_GET_LENGTH, GraphDBClient, GraphDBError
+
+FOOD = "http://www.semanticweb.org/smcho/ontologies/2026/0/food-ontology#"
+XSD_INTEGER = "http://www.w3.org/2001/XMLSchema#integer"
+VARS = ["person", "name", "age"]
+
+
+def expected_rows(n):
+    """Rows as SPARQL JSON bindings; every third row leaves ?age unbound."""
+    rows = []
+    for i in range(n):
+        row = {"person": {"type": "uri", "value": f"{FOOD}Person{i}"},
+               "name": {"type": "literal", "value": f'Name "{i}"\ttab,\u00e9\nline',
+                        "xml:lang": "en"}}
+        if i % 3:
+            row["age"] = {"type": "literal", "value": str(i % 90), "datatype": XSD_INTEGER}
+        rows.append(row)
+    return rows
+
+
+def tsv_field(term):
+    if term is None:
+        return ""
+    if term["type"] == "uri":
+        return f"<{term['value']}>"
+    if term.get("datatype") == XSD_INTEGER:
+        return term["value"]
+    value = (term["value"].replace("\\", "\\\\").replace('"', '\\"')
+             .replace("\t", "\\t").replace("\n", "\\n"))
+    return f'"{value}"@{term["xml:lang"]}' if "xml:lang" in term else f'"{value}"'
+
+
+def csv_field(term):
+    if term is None:
+        return ""
+    value = term["value"]
+    if any(c in value for c in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def render(accept, rows):
+    """The answer as a list of text pieces, each sent as its own chunk."""
+    if "json" in accept:
+        pieces = ['{"head": {"vars": %s},\n "results": {"bindings": [' % json.dumps(VARS)]
+        pieces += [("," if i else "") + json.dumps(row, indent=1) for i, row in enumerate(rows)]
+        return pieces + ["]}}\n"]
+    if "tab-separated" in accept:
+        return ["\t".join("?" + v for v in VARS) + "\n"] + \
+            ["\t".join(tsv_field(row.get(v)) for v in VARS) + "\n" for row in rows]
+    return [",".join(VARS) + "\r\n"] + \
+        [",".join(csv_field(row.get(v)) for v in VARS) + "\r\n" for row in rows]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _answer(self, query):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.command, query, self.client_address))
+            fail = server.failures > 0
+            server.failures -= fail
+        if fail:
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "4")
+            self.end_headers()
+            self.wfile.write(b"busy")
+            return
+        n = int(query.rsplit("LIMIT", 1)[1]) if "LIMIT" in query else 3
+        rows = server.rows if server.rows is not None else expected_rows(n)
+        accept = self.headers.get("Accept", "")
+        self.send_response(200)
+        self.send_header("Content-Type", accept)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for piece in render(accept, rows):
+            data = piece.encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        self._answer(parse_qs(urlsplit(self.path).query)["query"][0])
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8")
+        self._answer(parse_qs(body)["query"][0])
+
+
+class StandInServer(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.requests = []      # (method, query, client address)
+        self.failures = 0       # next requests answered with 503
+        self.rows = None        # fixed rows instead of expected_rows(LIMIT)
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/repositories/food"
+
+
+QUERY = "SELECT ?person ?name ?age WHERE { ?person ?p ?o } LIMIT %d"
+
+
+class GraphDBClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = GraphDBClient(self.server.endpoint, timeout=10, backoff=0)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_formats_give_the_same_rows(self):
+        expected = expected_rows(250)
+        for chunk_size in (7, 4096):
+            with self.subTest(chunk_size=chunk_size):
+                json_rows = self.client.select(QUERY % 250, "json", chunk_size)
+                tsv_rows = self.client.select(QUERY % 250, "tsv", chunk_size)
+                csv_rows = self.client.select(QUERY % 250, "csv", chunk_size)
+                self.assertEqual(list(json_rows), expected)
+                self.assertEqual(list(tsv_rows), expected)
+                # CSV has no term types: only the values
+                self.assertEqual(list(csv_rows),
+                                 [{v: {"value": t["value"]} for v, t in row.items()}
+                                  for row in expected])
+                for rows in (json_rows, tsv_rows, csv_rows):
+                    self.assertEqual(rows.vars, VARS)
+
+    def test_connection_is_reused_after_a_complete_answer(self):
+        for format in ("json", "tsv", "csv"):
+            list(self.client.select(QUERY % 5, format))
+        self.assertEqual(len({address for _, _, address in self.server.requests}), 1)
+
+    def test_retries_before_the_first_row(self):
+        self.server.failures = 2
+        self.assertEqual(len(list(self.client.select(QUERY % 4))), 4)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_error_after_the_last_retry(self):
+        self.server.failures = 10
+        with self.assertRaises(GraphDBError) as error:
+            self.client.select(QUERY % 4)
+        self.assertEqual(error.exception.status, 503)
+        self.assertEqual(len(self.server.requests), 4)       # 1 + retries=3
+
+    def test_long_queries_are_posted(self):
+        padding = "#" + "x" * MAX_GET_LENGTH + "\n"
+        rows = list(self.client.select(padding + QUERY % 2, "tsv"))
+        self.assertEqual(rows, expected_rows(2))
+        self.assertEqual(self.server.requests[-1][0], "POST")
+        list(self.client.select(QUERY % 2))
+        self.assertEqual(self.server.requests[-1][0], "GET")
+
+    def test_long_literal_across_many_chunks(self):
+        big = "x" * (4 * 1024 * 1024)
+        self.server.rows = [{"name": {"type": "literal", "value": "a"}},
+                            {"name": {"type": "literal", "value": big}},
+                            {"name": {"type": "literal", "value": "b"}}]
+        rows = list(self.client.select(QUERY % 3, "json", chunk_size=1024))
+        self.assertEqual([row["name"]["value"] for row in rows], ["a", big, "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()